@@ -0,0 +1,225 @@
+# core/http_client.py
+import logging
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Per-provider connection settings. Timeouts are (connect, read) in seconds.
+HTTP_CLIENT_DEFAULTS = {
+    'timeout': (5, 30),
+    'pool_connections': 4,   # Number of hosts kept in the pool
+    'pool_maxsize': 10,      # Keep-alive connections per host
+    'retries': 3,
+    'backoff_factor': 0.5,
+    'status_forcelist': (500, 502, 503, 504),
+    'allowed_methods': ('GET',),
+    'requests_per_second': None,  # Shared client-side rate limit; None for no limit
+}
+
+HTTP_CLIENT_PROVIDERS = {
+    'alpha_vantage': {
+        'timeout': (5, 15),
+        # Every call must pass the shared rate limiter, so urllib3 may not re-send on its own
+        'retries': 0,
+    },
+    'microsoft': {
+        # Graph throttles with 429 and sends Retry-After, which Retry honours.
+        # PATCH bodies carry the full task, so replaying them is safe. POST is
+        # never replayed: MSAL redeems single-use authorization codes with it,
+        # and a re-sent task create would duplicate the task.
+        'status_forcelist': (429, 500, 502, 503, 504),
+        'allowed_methods': ('GET', 'PATCH'),
+        'requests_per_second': 4,
+    },
+    'google_tasks': {
+        # Only the rate limit applies; the Google API client brings its own transport
+        'requests_per_second': 10,
+    },
+}
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that applies a default timeout when the caller doesn't pass one"""
+
+    def __init__(self, *args, timeout=None, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def get_client_config(provider):
+    """Merge the defaults, the provider entry and any HTTP_CLIENT_OPTIONS setting override"""
+    config = dict(HTTP_CLIENT_DEFAULTS)
+    config.update(HTTP_CLIENT_PROVIDERS.get(provider, {}))
+    config.update(getattr(settings, 'HTTP_CLIENT_OPTIONS', {}).get(provider, {}))
+    return config
+
+
+def _build_session(provider):
+    config = get_client_config(provider)
+    retry = Retry(
+        total=config['retries'],
+        backoff_factor=config['backoff_factor'],
+        status_forcelist=config['status_forcelist'],
+        allowed_methods=frozenset(config['allowed_methods']),
+        respect_retry_after_header=True,
+        raise_on_status=False,  # Hand the last response back so callers' raise_for_status() still applies
+    )
+    adapter = TimeoutHTTPAdapter(
+        timeout=config['timeout'],
+        max_retries=retry,
+        pool_connections=config['pool_connections'],
+        pool_maxsize=config['pool_maxsize'],
+    )
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    logger.info(f"Created pooled HTTP session for {provider}")
+    return session
+
+
+def get_session(provider):
+    """
+    Get the shared keep-alive session for an outbound provider
+    One session per provider per process, so repeated calls to the same host
+    reuse pooled connections instead of opening a new TLS connection each time
+    """
+    session = _sessions.get(provider)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(provider)
+            if session is None:
+                session = _build_session(provider)
+                _sessions[provider] = session
+    return session
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter
+    Holds up to `capacity` tokens and refills `rate` tokens per second;
+    acquire() blocks until a token is available or its timeout passes
+    """
+    
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+    
+    def try_acquire(self):
+        """Take one token if available; returns 0, or the seconds until one will be"""
+        with self.lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+    
+    def acquire(self, timeout=None):
+        """
+        Take one token, sleeping only as long as needed for the bucket to refill
+        Returns False, without sleeping, if no token is due within timeout seconds
+        """
+        return _acquire(self.try_acquire, timeout)
+
+
+def _acquire(try_acquire, timeout):
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        wait = try_acquire()
+        if not wait:
+            return True
+        if deadline is not None and time.monotonic() + wait > deadline:
+            return False
+        time.sleep(wait)
+
+
+class RedisTokenBucket:
+    """
+    Token bucket kept in Redis, so every thread, worker and instance shares one budget
+    Falls back to a per-process TokenBucket while Redis is unreachable
+    """
+    
+    # Refill from the Redis clock, take a token if there is one, and return the wait
+    # as a string (Lua numbers come back truncated to integers)
+    _SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local clock = redis.call('time')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('hmget', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('hset', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('expire', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+    
+    def __init__(self, name, rate, capacity):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.fallback = TokenBucket(rate=rate, capacity=capacity)
+    
+    def try_acquire(self):
+        """Take one token if available; returns 0, or the seconds until one will be"""
+        from django.core.cache import cache
+        from django_redis import get_redis_connection
+        
+        try:
+            connection = get_redis_connection('default')
+            key = cache.make_key(f"rate_limit:{self.name}")
+            return float(connection.eval(self._SCRIPT, 1, key, self.rate, self.capacity))
+        except Exception as e:
+            logger.warning(f"Redis rate limiter for {self.name} unavailable, limiting per process: {str(e)}")
+            return self.fallback.try_acquire()
+    
+    def acquire(self, timeout=None):
+        """
+        Take one token, sleeping only as long as needed for the bucket to refill
+        Returns False, without sleeping, if no token is due within timeout seconds
+        """
+        return _acquire(self.try_acquire, timeout)
+
+
+def get_rate_limiter(provider):
+    """
+    Get the shared rate limiter for an outbound provider, or None if it has no limit
+    One limiter per provider per process, so concurrent workers share the budget
+    """
+    with _limiters_lock:
+        if provider not in _limiters:
+            rate = get_client_config(provider)['requests_per_second']
+            _limiters[provider] = TokenBucket(rate=rate, capacity=max(1, int(rate))) if rate else None
+            if rate:
+                logger.info(f"Rate limiting {provider} to {rate} requests per second")
+        return _limiters[provider]
@@ -2,7 +2,7 @@ from django.contrib import admin
 
 # Register your models here.
 from django.contrib import admin
-from .models import Portfolio, Stock, Transaction
+from .models import Portfolio, Stock, Transaction, Position, ImportJob
 
 
 @admin.register(Portfolio)
@@ -21,16 +21,13 @@ class StockAdmin(admin.ModelAdmin):
     actions = ['refresh_stock_data']
     
     def refresh_stock_data(self, request, queryset):
-        """Admin action to refresh stock data for selected stocks"""
-        from .services import StockDataService
+        """Admin action to queue a data refresh for selected stocks"""
+        from .quote_refresh import enqueue_quote_refresh
         
-        stock_service = StockDataService()
         symbols = [stock.symbol for stock in queryset]
-        results = stock_service.refresh_multiple_stocks(symbols)
+        enqueue_quote_refresh(symbols)
         
-        updated = sum(1 for result in results.values() if result)
-        
-        self.message_user(request, f"Successfully updated {updated} out of {queryset.count()} stocks.")
+        self.message_user(request, f"Queued a refresh of {len(symbols)} stocks.")
     
     refresh_stock_data.short_description = "Refresh stock data from API"
 
@@ -47,4 +44,36 @@ class TransactionAdmin(admin.ModelAdmin):
         """Calculate and display the total value of the transaction"""
         return f"${obj.total_value:.2f}"
     
-    total_value.short_description = "Total Value"
\ No newline at end of file
+    total_value.short_description = "Total Value"
+
+
+@admin.register(Position)
+class PositionAdmin(admin.ModelAdmin):
+    list_display = ('symbol', 'portfolio', 'quantity', 'cost_basis', 'last_transaction_id', 'updated_at')
+    list_filter = ('portfolio',)
+    search_fields = ('symbol', 'portfolio__name')
+    readonly_fields = ('portfolio', 'symbol', 'quantity', 'cost_basis', 'last_transaction_id', 'updated_at')
+    
+    actions = ['rebuild_positions']
+    
+    def rebuild_positions(self, request, queryset):
+        """Admin action to rebuild the positions of the selected rows' portfolios from the ledger"""
+        from .holdings import rebuild_positions
+        
+        portfolios = {position.portfolio for position in queryset.select_related('portfolio')}
+        for portfolio in portfolios:
+            rebuild_positions(portfolio)
+        
+        self.message_user(request, f"Rebuilt positions for {len(portfolios)} portfolios.")
+    
+    rebuild_positions.short_description = "Rebuild positions from transactions"
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('original_name', 'portfolio', 'status', 'rows_processed', 'success_count', 'error_count', 'created_at')
+    list_filter = ('status',)
+    search_fields = ('original_name', 'portfolio__name')
+    readonly_fields = ('total_rows', 'rows_processed', 'total_bytes', 'bytes_processed', 'success_count',
+                       'error_count', 'errors', 'message', 'created_at', 'started_at', 'finished_at')
+    date_hierarchy = 'created_at'
@@ -2,6 +2,8 @@ import requests
 import logging
 import json
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from decimal import Decimal
 from django.conf import settings
 from django.utils import timezone
@@ -10,6 +12,7 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from datetime import timedelta
 
+from core.http_client import get_session, RedisTokenBucket
 from .models import Stock
 
 logger = logging.getLogger(__name__)
@@ -23,6 +26,26 @@ class StockAPIError(Exception):
     pass
 
 
+class RateLimitDeadlineError(StockAPIError):
+    """No request slot was free before the caller's deadline; nothing was sent"""
+    pass
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Get the limiter that enforces ALPHA_VANTAGE_CALLS_PER_MINUTE across all processes"""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            calls_per_minute = getattr(settings, 'ALPHA_VANTAGE_CALLS_PER_MINUTE', 5)
+            _rate_limiter = RedisTokenBucket('alpha_vantage', rate=calls_per_minute / 60.0, capacity=calls_per_minute)
+            logger.info(f"Alpha Vantage rate limiter set to {calls_per_minute} calls per minute")
+        return _rate_limiter
+
+
 def get_api_key():
     """Get the Alpha Vantage API key from settings"""
     api_key = getattr(settings, 'ALPHA_VANTAGE_API_KEY', None)
@@ -36,86 +59,103 @@ def get_api_key():
     return api_key
 
 
-def fetch_stock_data(symbol):
+def _request_alpha_vantage(function, symbol, deadline=None):
     """
-    Fetch current stock data from Alpha Vantage API
-    Returns a tuple (price, company_name, additional_data)
-    where additional_data is a dictionary containing extended stock information
+    Make one rate-limited Alpha Vantage request and return the parsed JSON
+    With a deadline (a time.monotonic() value) the request is only sent if the
+    rate limiter frees a slot before it, otherwise RateLimitDeadlineError is raised
+    Raises StockAPIError for transport, HTTP, JSON and API-level errors
     """
-    logger.info(f"Fetching stock data for symbol: {symbol}")
-    
     try:
         api_key = get_api_key()
-        logger.info(f"Using API key: {api_key[:4]}...{api_key[-4:] if len(api_key) > 8 else ''}")
     except Exception as e:
         logger.error(f"Failed to get API key: {str(e)}")
         raise StockAPIError(f"API key error: {str(e)}")
     
-    # First, get the quote
-    quote_params = {
-        'function': 'GLOBAL_QUOTE',
+    params = {
+        'function': function,
         'symbol': symbol,
         'apikey': api_key
     }
     
-    logger.debug(f"Request parameters for quote: {json.dumps({k: v if k != 'apikey' else '***' for k, v in quote_params.items()})}")
+    logger.debug(f"Request parameters for {function}: {json.dumps({k: v if k != 'apikey' else '***' for k, v in params.items()})}")
+    logger.info(f"Making {function} request to Alpha Vantage for {symbol}")
+    
+    # Print the full URL for debugging (hide the API key)
+    full_url = ALPHA_VANTAGE_BASE_URL + "?" + "&".join([f"{k}={'***' if k == 'apikey' else v}" for k, v in params.items()])
+    logger.debug(f"Request URL: {full_url}")
     
+    # Wait for the shared rate limiter instead of sleeping a fixed interval
+    timeout = None if deadline is None else max(0, deadline - time.monotonic())
+    if not get_rate_limiter().acquire(timeout=timeout):
+        logger.warning(f"No Alpha Vantage rate limit slot for {symbol} before the deadline")
+        raise RateLimitDeadlineError(f"Rate limit budget exhausted before the deadline for {symbol}")
+    
+    response = None
     try:
-        logger.info(f"Making request to Alpha Vantage for {symbol} quote data")
-        
-        # Print the full URL for debugging (hide the API key)
-        full_url = ALPHA_VANTAGE_BASE_URL + "?" + "&".join([f"{k}={'***' if k == 'apikey' else v}" for k, v in quote_params.items()])
-        logger.debug(f"Request URL: {full_url}")
-        
-        response = None
-        try:
-            response = requests.get(ALPHA_VANTAGE_BASE_URL, params=quote_params, timeout=15)
-            logger.info(f"Response status code: {response.status_code}")
-        except requests.exceptions.Timeout:
-            logger.error(f"Request timeout for {symbol}")
-            raise StockAPIError(f"Request timeout for {symbol}")
-        except requests.exceptions.ConnectionError as ce:
-            logger.error(f"Connection error for {symbol}: {str(ce)}")
-            raise StockAPIError(f"Connection error: {str(ce)}")
-        
-        if response is None:
-            logger.error(f"No response received for {symbol}")
-            raise StockAPIError(f"No response received for {symbol}")
-        
-        # Log detailed response info
-        logger.debug(f"Response headers: {dict(response.headers)}")
-        
-        # Log raw response text before trying to parse as JSON
-        try:
-            raw_text = response.text[:500]  # First 500 chars in case it's huge
-            logger.debug(f"Raw response text: {raw_text}")
-        except Exception as e:
-            logger.warning(f"Could not get raw response text: {str(e)}")
-        
-        try:
-            response.raise_for_status()  # Raises an exception for HTTP errors
-        except requests.exceptions.HTTPError as he:
-            logger.error(f"HTTP error for {symbol}: {str(he)}")
-            raise StockAPIError(f"HTTP error: {str(he)}")
-        
-        # Parse JSON response
-        try:
-            data = response.json()
-        except ValueError as ve:
-            logger.error(f"Invalid JSON response for {symbol}: {str(ve)}")
-            raise StockAPIError(f"Invalid JSON response: {str(ve)}")
-        
-        logger.debug(f"Quote response data: {json.dumps(data)}")
-        
-        # Check for API error messages
-        if "Error Message" in data:
-            error_msg = f"API Error for {symbol}: {data['Error Message']}"
-            logger.error(error_msg)
-            raise StockAPIError(error_msg)
-        
-        # Check for API rate limit messages
-        if "Note" in data and "API call frequency" in data["Note"]:
-            logger.warning(f"Alpha Vantage rate limit warning: {data['Note']}")
+        response = get_session('alpha_vantage').get(ALPHA_VANTAGE_BASE_URL, params=params, timeout=15)
+        logger.info(f"{function} response status code: {response.status_code}")
+    except requests.exceptions.Timeout:
+        logger.error(f"Request timeout for {symbol}")
+        raise StockAPIError(f"Request timeout for {symbol}")
+    except requests.exceptions.ConnectionError as ce:
+        logger.error(f"Connection error for {symbol}: {str(ce)}")
+        raise StockAPIError(f"Connection error: {str(ce)}")
+    except requests.exceptions.RequestException as e:
+        logger.error(f"API request error for {symbol}: {str(e)}")
+        raise StockAPIError(f"API request error for {symbol}: {str(e)}")
+    
+    if response is None:
+        logger.error(f"No response received for {symbol}")
+        raise StockAPIError(f"No response received for {symbol}")
+    
+    # Log detailed response info
+    logger.debug(f"Response headers: {dict(response.headers)}")
+    
+    # Log raw response text before trying to parse as JSON
+    try:
+        raw_text = response.text[:500]  # First 500 chars in case it's huge
+        logger.debug(f"Raw response text: {raw_text}")
+    except Exception as e:
+        logger.warning(f"Could not get raw response text: {str(e)}")
+    
+    try:
+        response.raise_for_status()  # Raises an exception for HTTP errors
+    except requests.exceptions.HTTPError as he:
+        logger.error(f"HTTP error for {symbol}: {str(he)}")
+        raise StockAPIError(f"HTTP error: {str(he)}")
+    
+    # Parse JSON response
+    try:
+        data = response.json()
+    except ValueError as ve:
+        logger.error(f"Invalid JSON response for {symbol}: {str(ve)}")
+        raise StockAPIError(f"Invalid JSON response: {str(ve)}")
+    
+    logger.debug(f"{function} response data: {json.dumps(data)}")
+    
+    # Check for API error messages
+    if isinstance(data, dict) and "Error Message" in data:
+        error_msg = f"API Error for {symbol}: {data['Error Message']}"
+        logger.error(error_msg)
+        raise StockAPIError(error_msg)
+    
+    # Check for API rate limit messages
+    if isinstance(data, dict) and "Note" in data and "API call frequency" in data["Note"]:
+        logger.warning(f"Alpha Vantage rate limit warning: {data['Note']}")
+    
+    return data
+
+
+def fetch_stock_quote(symbol, deadline=None):
+    """
+    Fetch the current price from Alpha Vantage (GLOBAL_QUOTE, one API call)
+    Returns a tuple (price, quote_data) where quote_data holds the day change fields
+    """
+    logger.info(f"Fetching stock quote for symbol: {symbol}")
+    
+    try:
+        data = _request_alpha_vantage('GLOBAL_QUOTE', symbol, deadline)
         
         # Extract price information
         if "Global Quote" in data and data["Global Quote"]:
@@ -124,7 +164,7 @@ def fetch_stock_data(symbol):
             # Check if quote data is empty (sometimes happens with valid requests but invalid symbols)
             if not quote_data or all(not v for v in quote_data.values()):
                 logger.warning(f"Empty quote data received for {symbol}")
-                return Decimal("0.00"), symbol, {}
+                return Decimal("0.00"), {'day_change': Decimal("0.00"), 'day_change_percentage': Decimal("0.00")}
                 
             price_str = quote_data.get("05. price", "0.00")
             logger.info(f"Retrieved price for {symbol}: {price_str}")
@@ -145,131 +185,130 @@ def fetch_stock_data(symbol):
             day_change = Decimal("0.00")
             day_change_percentage = Decimal("0.00")
         
-        # Now get company overview for the name
-        # To prevent hitting API rate limits, sleep briefly
-        time.sleep(1.0)  # Increased sleep time to be safer with rate limits
-        
-        overview_params = {
-            'function': 'OVERVIEW',
-            'symbol': symbol,
-            'apikey': api_key
-        }
-        
-        logger.debug(f"Request parameters for overview: {json.dumps({k: v if k != 'apikey' else '***' for k, v in overview_params.items()})}")
-        
-        logger.info(f"Making request to Alpha Vantage for {symbol} company overview")
-        response = requests.get(ALPHA_VANTAGE_BASE_URL, params=overview_params)
-        
-        # Log response info
-        logger.info(f"Overview response status code: {response.status_code}")
-        
-        response.raise_for_status()
-        
-        overview_data = response.json()
-        logger.debug(f"Overview response data: {json.dumps(overview_data)}")
-        
-        # Initialize additional data dictionary
-        additional_data = {
+        return price, {
             'day_change': day_change,
             'day_change_percentage': day_change_percentage,
-            'fifty_two_week_high': None,
-            'fifty_two_week_low': None,
-            'pe_ratio': None,
-            'dividend_yield': None,
         }
-        
-        # Check if overview data is empty (happens with valid API key but invalid symbol)
-        if not overview_data or (isinstance(overview_data, dict) and not overview_data):
-            logger.warning(f"Empty overview data received for {symbol}")
-            company_name = symbol
-        else:
-            # Extract company name
-            if "Name" in overview_data:
-                company_name = overview_data["Name"]
-                logger.info(f"Retrieved company name for {symbol}: {company_name}")
-            else:
-                logger.warning(f"No company name found for {symbol}. Using symbol as fallback.")
-                company_name = symbol  # Use symbol as fallback
-            
-            # Extract additional data
-            try:
-                if "52WeekHigh" in overview_data:
-                    additional_data['fifty_two_week_high'] = Decimal(overview_data["52WeekHigh"])
-                
-                if "52WeekLow" in overview_data:
-                    additional_data['fifty_two_week_low'] = Decimal(overview_data["52WeekLow"])
-                
-                if "PERatio" in overview_data and overview_data["PERatio"] != "None":
-                    additional_data['pe_ratio'] = Decimal(overview_data["PERatio"])
-                
-                if "DividendYield" in overview_data and overview_data["DividendYield"] != "None":
-                    # DividendYield is often given as a decimal (e.g., 0.0291 for 2.91%)
-                    dividend_yield = Decimal(overview_data["DividendYield"])
-                    additional_data['dividend_yield'] = dividend_yield * 100  # Convert to percentage
-                
-                logger.info(f"Retrieved additional data for {symbol}: {additional_data}")
-            except (ValueError, TypeError, KeyError) as e:
-                logger.warning(f"Error parsing additional data for {symbol}: {str(e)}")
-        
-        return price, company_name, additional_data
     
-    except requests.exceptions.RequestException as e:
-        error_msg = f"API request error for {symbol}: {str(e)}"
-        logger.error(error_msg)
-        # For connection issues, provide more details
-        if isinstance(e, requests.exceptions.ConnectionError):
-            logger.error(f"Connection error details: {str(e)}")
-        raise StockAPIError(error_msg)
-    except (KeyError, ValueError) as e:
-        error_msg = f"Error parsing data for {symbol}: {str(e)}"
+    except StockAPIError:
+        raise
+    except (KeyError, ValueError, ArithmeticError) as e:
+        error_msg = f"Error parsing quote for {symbol}: {str(e)}"
         logger.error(error_msg)
         raise StockAPIError(error_msg)
     except Exception as e:
-        error_msg = f"Unexpected error fetching data for {symbol}: {str(e)}"
+        error_msg = f"Unexpected error fetching quote for {symbol}: {str(e)}"
         logger.error(error_msg, exc_info=True)  # Include stack trace
         raise StockAPIError(error_msg)
 
 
-def update_stock_info(stock):
+def fetch_company_overview(symbol, deadline=None):
     """
-    Update stock information from the API
-    Returns True if successful, False otherwise
+    Fetch company fundamentals from Alpha Vantage (OVERVIEW, one API call)
+    Returns a tuple (company_name, fundamentals) where fundamentals holds the
+    52-week range, P/E ratio and dividend yield (None when unavailable)
     """
-    logger.info(f"Updating stock info for {stock.symbol}")
+    logger.info(f"Fetching company overview for symbol: {symbol}")
+    
+    fundamentals = {
+        'fifty_two_week_high': None,
+        'fifty_two_week_low': None,
+        'pe_ratio': None,
+        'dividend_yield': None,
+    }
+    
     try:
-        price, company_name, additional_data = fetch_stock_data(stock.symbol)
-        
-        # Update only core data
-        if not stock.name and company_name:
-            stock.name = company_name
+        overview_data = _request_alpha_vantage('OVERVIEW', symbol, deadline)
         
-        # Update day change
-        stock.day_change = additional_data.get('day_change', Decimal('0.00'))
-        stock.day_change_percentage = additional_data.get('day_change_percentage', Decimal('0.00'))
-        
-        # Update additional stock data
-        if 'fifty_two_week_high' in additional_data and additional_data['fifty_two_week_high']:
-            stock.fifty_two_week_high = additional_data['fifty_two_week_high']
-        
-        if 'fifty_two_week_low' in additional_data and additional_data['fifty_two_week_low']:
-            stock.fifty_two_week_low = additional_data['fifty_two_week_low']
-        
-        if 'pe_ratio' in additional_data and additional_data['pe_ratio']:
-            stock.pe_ratio = additional_data['pe_ratio']
-        
-        if 'dividend_yield' in additional_data and additional_data['dividend_yield']:
-            stock.dividend_yield = additional_data['dividend_yield']
+        # Check if overview data is empty (happens with valid API key but invalid symbol)
+        if not overview_data or not isinstance(overview_data, dict):
+            logger.warning(f"Empty overview data received for {symbol}")
+            return symbol, fundamentals
         
-        # Update price
-        stock.update_price(price)
+        # Extract company name
+        if "Name" in overview_data:
+            company_name = overview_data["Name"]
+            logger.info(f"Retrieved company name for {symbol}: {company_name}")
+        else:
+            logger.warning(f"No company name found for {symbol}. Using symbol as fallback.")
+            company_name = symbol  # Use symbol as fallback
         
-        # Return full additional data
-        return True, additional_data
+        # Extract additional data
+        try:
+            if "52WeekHigh" in overview_data:
+                fundamentals['fifty_two_week_high'] = Decimal(overview_data["52WeekHigh"])
+            
+            if "52WeekLow" in overview_data:
+                fundamentals['fifty_two_week_low'] = Decimal(overview_data["52WeekLow"])
+            
+            if "PERatio" in overview_data and overview_data["PERatio"] != "None":
+                fundamentals['pe_ratio'] = Decimal(overview_data["PERatio"])
+            
+            if "DividendYield" in overview_data and overview_data["DividendYield"] != "None":
+                # DividendYield is often given as a decimal (e.g., 0.0291 for 2.91%)
+                dividend_yield = Decimal(overview_data["DividendYield"])
+                fundamentals['dividend_yield'] = dividend_yield * 100  # Convert to percentage
+            
+            logger.info(f"Retrieved fundamentals for {symbol}: {fundamentals}")
+        except (ValueError, TypeError, KeyError, ArithmeticError) as e:
+            logger.warning(f"Error parsing additional data for {symbol}: {str(e)}")
         
+        return company_name, fundamentals
+    
+    except StockAPIError:
+        raise
     except Exception as e:
-        # Error handling
-        logger.error(f"Error updating stock {stock.symbol}: {str(e)}")
-        return False, {}
+        error_msg = f"Unexpected error fetching overview for {symbol}: {str(e)}"
+        logger.error(error_msg, exc_info=True)  # Include stack trace
+        raise StockAPIError(error_msg)
+
+
+def fetch_stock_data(symbol):
+    """
+    Fetch current stock data from Alpha Vantage API
+    Returns a tuple (price, company_name, additional_data)
+    where additional_data is a dictionary containing extended stock information
+    This costs two API calls; use fetch_stock_quote when only the price is needed
+    """
+    logger.info(f"Fetching stock data for symbol: {symbol}")
+    
+    price, additional_data = fetch_stock_quote(symbol)
+    company_name, fundamentals = fetch_company_overview(symbol)
+    additional_data.update(fundamentals)
+    
+    return price, company_name, additional_data
+
+
+def fetch_many(fetch_func, symbols, max_workers=None, deadline=None):
+    """
+    Run a fetch function for several symbols concurrently on a bounded thread pool
+    All workers share the rate limiter, so the pool keeps the configured
+    calls-per-minute budget saturated without exceeding it. With a deadline,
+    symbols that can't get a request slot before it fail with RateLimitDeadlineError
+    Returns a dictionary mapping each symbol to either the fetch result
+    or the StockAPIError raised
+    """
+    results = {}
+    if not symbols:
+        return results
+    
+    if max_workers is None:
+        max_workers = getattr(settings, 'ALPHA_VANTAGE_MAX_WORKERS', 4)
+    max_workers = max(1, min(max_workers, len(symbols)))
+    
+    logger.info(f"Running {fetch_func.__name__} for {len(symbols)} symbols with {max_workers} workers")
+    
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='alpha-vantage') as executor:
+        futures = {executor.submit(fetch_func, symbol, deadline=deadline): symbol for symbol in symbols}
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                results[symbol] = future.result()
+            except StockAPIError as e:
+                results[symbol] = e
+    
+    return results
+
 
 # New Cloud Tasks handler endpoints
 
@@ -283,24 +322,19 @@ def refresh_stocks(request):
         # Parse the request body
         data = json.loads(request.body)
         symbols = data.get('symbols', None)
+        refresh_id = data.get('refresh_id')
         
         logger.info(f"Processing refresh-stocks task: {symbols if symbols else 'all stale'}")
         
-        from .services import StockDataService
-        stock_service = StockDataService()
-        
-        if symbols:
-            # Update specific symbols
-            results = stock_service.refresh_multiple_stocks(symbols)
-            updated_count = sum(1 for result in results.values() if result)
-            error_count = len(results) - updated_count
-        else:
-            # Update all stocks with stale data (not updated in the last 15 minutes)
+        if not symbols:
+            # Update all stocks with stale data
             from .models import Stock
             symbols = list(Stock.objects.values_list('symbol', flat=True))
-            results = stock_service.refresh_multiple_stocks(symbols)
-            updated_count = sum(1 for result in results.values() if result)
-            error_count = len(results) - updated_count
+        
+        from .quote_refresh import run_quote_refresh
+        results = run_quote_refresh(symbols, refresh_id)
+        updated_count = sum(1 for result in results.values() if result)
+        error_count = len(results) - updated_count
         
         logger.info(f"Stock refresh complete. Updated: {updated_count}, Errors: {error_count}")
         return JsonResponse({
@@ -316,6 +350,7 @@ def refresh_stocks(request):
             'message': str(e)
         }, status=500)
 
+
 @csrf_exempt
 @require_POST
 def refresh_all_stocks(request):
@@ -348,4 +383,63 @@ def refresh_all_stocks(request):
         return JsonResponse({
             'status': 'error',
             'message': str(e)
-        }, status=500)
\ No newline at end of file
+        }, status=500)
+
+
+@csrf_exempt
+@require_POST
+def flush_quote_refreshes(request):
+    """
+    API endpoint to flush the batched quote refreshes from Cloud Tasks
+    """
+    try:
+        data = json.loads(request.body)
+        batch_id = data['batch_id']
+        
+        logger.info(f"Processing quote refresh flush {batch_id}")
+        
+        from .quote_refresh import flush_quote_refreshes as flush
+        results = flush(batch_id)
+        updated_count = sum(1 for result in results.values() if result)
+        
+        return JsonResponse({
+            'status': 'success',
+            'updated': updated_count,
+            'errors': len(results) - updated_count
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in flush_quote_refreshes endpoint: {str(e)}")
+        return JsonResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status=500)
+
+
+@csrf_exempt
+@require_POST
+def process_import_job(request):
+    """
+    API endpoint to process an uploaded transaction import from Cloud Tasks
+    """
+    try:
+        data = json.loads(request.body)
+        job_id = data['job_id']
+        
+        logger.info(f"Processing import job {job_id}")
+        
+        from .importer import run_import_job
+        result = run_import_job(job_id)
+        
+        return JsonResponse({
+            'status': 'success',
+            'imported': result.success_count if result else 0,
+            'errors': result.error_count if result else 0
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in process_import_job endpoint: {str(e)}")
+        return JsonResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status=500)
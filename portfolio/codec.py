@@ -0,0 +1,101 @@
+import math
+import struct
+
+# Compact binary encoding of the cached stock records
+# Every payload starts with a version byte so the layout can change without
+# misreading entries written by older code: unknown versions decode as a miss.
+CODEC_VERSION = 1
+
+# version, current_price, day_change, day_change_percentage, last_updated
+_PRICE = struct.Struct('>Bdddq')
+# version, 52w high, 52w low, P/E, dividend yield, fundamentals_updated, symbol length, name length
+_FUNDAMENTALS = struct.Struct('>Bddddq BH')
+
+_OPTIONAL_FIELDS = ('fifty_two_week_high', 'fifty_two_week_low', 'pe_ratio', 'dividend_yield')
+
+
+class CodecError(ValueError):
+    """Raised when a payload can't be decoded"""
+    pass
+
+
+def _optional(value):
+    # None is stored as NaN so optional fields keep a fixed width
+    return math.nan if value is None else float(value)
+
+
+def _from_optional(value):
+    return None if math.isnan(value) else value
+
+
+def _check_version(payload):
+    if not payload or payload[0] != CODEC_VERSION:
+        raise CodecError(f"Unsupported payload version: {payload[:1]!r}")
+
+
+def encode_price(record):
+    """Pack a price record into 33 bytes"""
+    return _PRICE.pack(
+        CODEC_VERSION,
+        float(record.get('current_price') or 0.0),
+        float(record.get('day_change') or 0.0),
+        float(record.get('day_change_percentage') or 0.0),
+        int(record.get('last_updated') or 0),
+    )
+
+
+def decode_price(payload):
+    """Unpack a price record"""
+    _check_version(payload)
+    try:
+        _, current_price, day_change, day_change_percentage, last_updated = _PRICE.unpack(payload)
+    except struct.error as e:
+        raise CodecError(str(e))
+    return {
+        'current_price': current_price,
+        'day_change': day_change,
+        'day_change_percentage': day_change_percentage,
+        'last_updated': str(last_updated),
+    }
+
+
+def encode_fundamentals(record):
+    """Pack a fundamentals record: fixed-width numbers followed by the symbol and company name"""
+    symbol = (record.get('symbol') or '').encode('utf-8')
+    company_name = (record.get('company_name') or '').encode('utf-8')
+    header = _FUNDAMENTALS.pack(
+        CODEC_VERSION,
+        *(_optional(record.get(field)) for field in _OPTIONAL_FIELDS),
+        int(record.get('fundamentals_updated') or 0),
+        len(symbol),
+        len(company_name),
+    )
+    return header + symbol + company_name
+
+
+def decode_fundamentals(payload):
+    """Unpack a fundamentals record"""
+    _check_version(payload)
+    try:
+        values = _FUNDAMENTALS.unpack_from(payload)
+    except struct.error as e:
+        raise CodecError(str(e))
+
+    symbol_length, name_length = values[-2:]
+    start = _FUNDAMENTALS.size
+    if len(payload) != start + symbol_length + name_length:
+        raise CodecError("Truncated fundamentals payload")
+
+    record = {
+        'symbol': payload[start:start + symbol_length].decode('utf-8'),
+        'company_name': payload[start + symbol_length:].decode('utf-8'),
+    }
+    for field, value in zip(_OPTIONAL_FIELDS, values[1:5]):
+        record[field] = _from_optional(value)
+    record['fundamentals_updated'] = str(values[5])
+    return record
+
+
+def record_timestamp(record):
+    """Epoch seconds at which a decoded record was fetched"""
+    return int(record.get('last_updated') or record.get('fundamentals_updated') or 0)
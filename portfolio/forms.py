@@ -1,6 +1,7 @@
 from django import forms
 from django.utils import timezone
 from .models import Portfolio, Transaction
+from .importer import IMPORT_MAX_CSV_SIZE, IMPORT_MAX_EXCEL_SIZE
 from django.core.validators import FileExtensionValidator
 
 
@@ -74,7 +75,10 @@ class TransactionImportForm(forms.Form):
     """Form for importing transactions from a CSV or Excel file"""
     file = forms.FileField(
         label='Select a file',
-        help_text='Max. 5 megabytes - CSV or Excel (.xlsx) files only',
+        help_text=(
+            f'CSV (max. {IMPORT_MAX_CSV_SIZE // (1024 * 1024)}MB) or Excel (.xlsx, max. '
+            f'{IMPORT_MAX_EXCEL_SIZE // (1024 * 1024)}MB) files only. Split larger files into several uploads.'
+        ),
         validators=[
             FileExtensionValidator(allowed_extensions=['csv', 'xlsx', 'xls'])
         ]
@@ -0,0 +1,81 @@
+import logging
+import time
+from django.core.cache import cache
+import redis
+
+from .memory_cache import LocalCache
+
+logger = logging.getLogger(__name__)
+
+# Refresh times when Redis is unavailable; bounded like any other local cache
+_local_refresh_times = LocalCache(max_entries=4096, default_ttl=60 * 60 * 24)
+
+
+class FreshnessTracker:
+    """
+    Records when each symbol's data was last fetched from the API
+    Times are kept per (symbol, tier) in Redis, so every worker agrees on what
+    is fresh regardless of how refresh requests group or order their symbols.
+    Falls back to a per-process table when Redis is unavailable.
+    """
+
+    def __init__(self, use_redis=True, retention=60 * 60 * 24):
+        self.use_redis = use_redis
+        self.retention = retention  # How long a refresh time is remembered
+
+    def get_key(self, symbol, tier):
+        """Generate the key holding a symbol's last refresh time"""
+        return f"stock:{symbol.upper()}:{tier}:refreshed"
+
+    def mark_fresh(self, symbols, tier, refreshed_at=None):
+        """Record that the tier of these symbols was just fetched"""
+        refreshed_at = time.time() if refreshed_at is None else refreshed_at
+        mapping = {self.get_key(symbol, tier): refreshed_at for symbol in symbols}
+        if not mapping:
+            return
+
+        _local_refresh_times.set_many(mapping, self.retention)
+        if self.use_redis:
+            try:
+                cache.set_many(mapping, self.retention)
+            except (redis.exceptions.RedisError, Exception) as e:
+                logger.warning(f"Redis error recording refresh times: {str(e)}")
+
+    def last_refreshed(self, symbols, tier):
+        """Return {symbol: epoch seconds of the last refresh, or None}"""
+        keys = {self.get_key(symbol, tier): symbol for symbol in symbols}
+        times = {symbol: None for symbol in symbols}
+
+        if self.use_redis and keys:
+            try:
+                for key, refreshed_at in cache.get_many(list(keys)).items():
+                    times[keys[key]] = refreshed_at
+                return times
+            except (redis.exceptions.RedisError, Exception) as e:
+                logger.warning(f"Redis error reading refresh times: {str(e)}")
+
+        for key, symbol in keys.items():
+            times[symbol] = _local_refresh_times.get(key)
+        return times
+
+    def stale_symbols(self, symbols, tier, max_age):
+        """Return the symbols whose tier was refreshed more than max_age seconds ago (or never)"""
+        cutoff = time.time() - max_age
+        return [
+            symbol for symbol, refreshed_at in self.last_refreshed(symbols, tier).items()
+            if refreshed_at is None or refreshed_at < cutoff
+        ]
+
+    def clear(self, symbols, tiers):
+        """Forget the refresh times of these symbols so the next refresh re-fetches them"""
+        keys = [self.get_key(symbol, tier) for symbol in symbols for tier in tiers]
+        _local_refresh_times.delete_many(keys)
+        if self.use_redis:
+            try:
+                cache.delete_many(keys)
+            except (redis.exceptions.RedisError, Exception) as e:
+                logger.warning(f"Redis error clearing refresh times: {str(e)}")
+
+    def clear_local(self):
+        """Forget every refresh time held in this process"""
+        _local_refresh_times.clear()
@@ -0,0 +1,456 @@
+import logging
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction as db_transaction
+
+logger = logging.getLogger(__name__)
+
+# Transactions are replayed oldest first; id breaks ties between same-day trades
+LEDGER_ORDERING = ('transaction_date', 'id')
+
+# Precision of the stored Position columns
+QUANTITY_PRECISION = Decimal('0.0001')
+COST_BASIS_PRECISION = Decimal('0.000001')
+VERIFY_TOLERANCE = Decimal('0.01')
+
+# Cached quote floats with at most this many places become Decimals through int64, not str()
+QUOTE_DECIMAL_PLACES = 6
+_QUOTE_SCALE = 10 ** QUOTE_DECIMAL_PLACES
+_QUOTE_UNIT = Decimal(1).scaleb(-QUOTE_DECIMAL_PLACES)
+# Quotes from here up can have more digits than float64 holds unambiguously
+MAX_SCALED_QUOTE = 10 ** (15 - QUOTE_DECIMAL_PLACES)
+
+
+def _to_decimal(value, default=None):
+    """Convert a cached float value to Decimal, keeping None as the default"""
+    if value is None:
+        return default
+    return Decimal(str(value))
+
+
+def apply_transaction(position, transaction):
+    """
+    Apply a single transaction to a position dictionary in place
+    The position holds 'quantity' and 'cost_basis' as Decimals
+    """
+    if transaction.transaction_type == 'BUY':
+        # Add shares and cost
+        position['quantity'] += transaction.quantity
+        position['cost_basis'] += transaction.quantity * transaction.price_per_share
+
+    elif transaction.transaction_type == 'SELL':
+        # Reduce shares (cost basis will be adjusted proportionally)
+        if position['quantity'] > 0:
+            sell_ratio = transaction.quantity / position['quantity']
+            if sell_ratio > 1:
+                sell_ratio = 1  # Can't sell more than 100% of holdings
+
+            position['cost_basis'] -= position['cost_basis'] * sell_ratio
+            position['quantity'] -= transaction.quantity
+
+    return position
+
+
+def replay_transactions(transactions):
+    """
+    Replay a ledger of transactions into per-symbol positions
+    Transactions should be given in chronological order (see LEDGER_ORDERING)
+    Returns a dictionary mapping symbol to {'quantity', 'cost_basis'}
+    """
+    positions = {}
+
+    for transaction in transactions:
+        position = positions.setdefault(transaction.stock_symbol, {
+            'quantity': Decimal('0.00'),
+            'cost_basis': Decimal('0.00'),
+        })
+        apply_transaction(position, transaction)
+
+    return positions
+
+
+def quantize_position(quantity, cost_basis):
+    """Round a replayed position to the precision stored on the Position model"""
+    return quantity.quantize(QUANTITY_PRECISION), cost_basis.quantize(COST_BASIS_PRECISION)
+
+
+def _ledger(portfolio_id, symbol=None):
+    from portfolio.models import Transaction
+
+    transactions = Transaction.objects.filter(portfolio_id=portfolio_id)
+    if symbol is not None:
+        transactions = transactions.filter(stock_symbol=symbol)
+    return transactions.order_by(*LEDGER_ORDERING)
+
+
+def rebuild_symbol_position(portfolio_id, symbol):
+    """
+    Recompute one symbol's position from its slice of the ledger
+    Used when a write can't be applied incrementally (edits, deletes, back-dated trades)
+    """
+    from portfolio.models import Position
+
+    transactions = list(_ledger(portfolio_id, symbol))
+    if not transactions:
+        Position.objects.filter(portfolio_id=portfolio_id, symbol=symbol).delete()
+        return None
+
+    data = replay_transactions(transactions)[symbol]
+    quantity, cost_basis = quantize_position(data['quantity'], data['cost_basis'])
+    position, _ = Position.objects.update_or_create(
+        portfolio_id=portfolio_id,
+        symbol=symbol,
+        defaults={
+            'quantity': quantity,
+            'cost_basis': cost_basis,
+            'last_transaction_id': transactions[-1].pk,
+        }
+    )
+    return position
+
+
+def record_transaction(transaction):
+    """
+    Fold a newly saved transaction into its position
+    Appends (the common case) are applied in O(1); a back-dated transaction
+    falls back to replaying that symbol's ledger so ordering stays correct
+    """
+    from django.db.models import Q
+    from portfolio.models import Position
+
+    later_exists = _ledger(transaction.portfolio_id, transaction.stock_symbol).filter(
+        Q(transaction_date__gt=transaction.transaction_date) |
+        Q(transaction_date=transaction.transaction_date, pk__gt=transaction.pk)
+    ).exists()
+    if later_exists:
+        return rebuild_symbol_position(transaction.portfolio_id, transaction.stock_symbol)
+
+    with db_transaction.atomic():
+        position = Position.objects.select_for_update().filter(
+            portfolio_id=transaction.portfolio_id,
+            symbol=transaction.stock_symbol
+        ).first()
+        if position is None:
+            return rebuild_symbol_position(transaction.portfolio_id, transaction.stock_symbol)
+
+        data = apply_transaction(
+            {'quantity': position.quantity, 'cost_basis': position.cost_basis},
+            transaction
+        )
+        position.quantity, position.cost_basis = quantize_position(data['quantity'], data['cost_basis'])
+        position.last_transaction_id = transaction.pk
+        position.save(update_fields=['quantity', 'cost_basis', 'last_transaction_id', 'updated_at'])
+        return position
+
+
+def rebuild_positions(portfolio):
+    """
+    Rebuild every position for a portfolio from its full ledger
+    Returns the list of Position rows now stored
+    """
+    from portfolio.models import Position
+
+    transactions = list(_ledger(portfolio.pk))
+    last_ids = {transaction.stock_symbol: transaction.pk for transaction in transactions}
+
+    positions = []
+    for symbol, data in replay_transactions(transactions).items():
+        quantity, cost_basis = quantize_position(data['quantity'], data['cost_basis'])
+        positions.append(Position(
+            portfolio=portfolio,
+            symbol=symbol,
+            quantity=quantity,
+            cost_basis=cost_basis,
+            last_transaction_id=last_ids[symbol],
+        ))
+
+    with db_transaction.atomic():
+        Position.objects.filter(portfolio=portfolio).delete()
+        Position.objects.bulk_create(positions)
+
+    portfolio.clear_holdings_snapshot()
+    return positions
+
+
+def verify_positions(portfolio):
+    """
+    Compare stored positions with a fresh ledger replay
+    Returns a list of (symbol, stored, expected) tuples for every mismatch,
+    where stored/expected are (quantity, cost_basis) or None when missing
+    """
+    expected = {}
+    for symbol, data in replay_transactions(_ledger(portfolio.pk)).items():
+        expected[symbol] = quantize_position(data['quantity'], data['cost_basis'])
+    stored = {
+        position.symbol: (position.quantity, position.cost_basis)
+        for position in portfolio.positions.all()
+    }
+
+    mismatches = []
+    for symbol in sorted(set(expected) | set(stored)):
+        stored_value = stored.get(symbol)
+        expected_value = expected.get(symbol)
+        if stored_value is None or expected_value is None:
+            mismatches.append((symbol, stored_value, expected_value))
+            continue
+        # Incremental updates round at every step, so compare at display precision
+        if any(
+            abs(actual - wanted) >= VERIFY_TOLERANCE
+            for actual, wanted in zip(stored_value, expected_value)
+        ):
+            mismatches.append((symbol, stored_value, expected_value))
+
+    return mismatches
+
+
+def _float_column(values):
+    """Column of optional numbers as float64, with NaN for missing values"""
+    return np.array(list(values), dtype=np.float64)
+
+
+def _quote_decimals(column):
+    """
+    A float64 column of cached quotes as the Decimals _to_decimal would give, NaN as None
+    Quotes with at most QUOTE_DECIMAL_PLACES places (and few enough digits to have
+    one shortest form) are scaled to int64; the rest go through str()
+    """
+    missing = np.isnan(column)
+    large = ~missing & (np.abs(column) >= MAX_SCALED_QUOTE)
+    scaled = np.rint(np.where(missing | large, 0.0, column) * _QUOTE_SCALE)
+    decimals = list(map(_QUOTE_UNIT.__mul__, map(Decimal, scaled.astype(np.int64).tolist())))
+    irregular = large | (~missing & (scaled / _QUOTE_SCALE != column))
+    for row in np.flatnonzero(irregular).tolist():
+        decimals[row] = _to_decimal(column[row].item())
+    for row in np.flatnonzero(missing).tolist():
+        decimals[row] = None
+    return decimals
+
+
+def _where(mask, op, columns, default):
+    """Apply op element-wise over columns on the rows where mask is set, default elsewhere"""
+    result = [default] * len(mask)
+    rows = np.flatnonzero(mask).tolist()
+    values = map(op, *([column[row] for row in rows] for column in columns))
+    for row, value in zip(rows, values):
+        result[row] = value
+    return result
+
+
+def compute_holdings_table(quantity, cost_basis, price, day_change, high, low):
+    """
+    Columnar holdings kernel (one row per open position)
+    Quantities and cost bases are lists of Decimals; quotes are float64 columns
+    with NaN for missing 52-week values. Quotes are converted to Decimals once,
+    then every column is computed a whole column at a time in exact Decimal
+    arithmetic, so values match the per-position loop digit for digit.
+    Returns a dict of Decimal columns, None where a value doesn't apply
+    """
+    prices, day_changes, highs, lows = map(_quote_decimals, (price, day_change, high, low))
+
+    current_value = list(map(Decimal.__mul__, quantity, prices))
+    gain_loss = list(map(Decimal.__sub__, current_value, cost_basis))
+    total_value = sum(current_value, Decimal('0.00'))
+
+    gain_loss_percentage = _where(
+        np.array([cost > 0 for cost in cost_basis]),
+        lambda gain, cost: (gain / cost) * 100,
+        (gain_loss, cost_basis),
+        Decimal('0.00'),
+    )
+    portfolio_percentage = [
+        (value / total_value) * 100 if total_value > 0 else Decimal('0.00') for value in current_value
+    ]
+
+    # The Decimal version skipped a zero 52-week value as well as a missing one
+    quoted = price > 0
+    delta_from_52w_low = _where(quoted & (low != 0) & ~np.isnan(low), Decimal.__sub__, (prices, lows), None)
+    delta_from_52w_high = _where(quoted & (high != 0) & ~np.isnan(high), Decimal.__sub__, (highs, prices), None)
+
+    return {
+        'current_price': prices,
+        'day_change': day_changes,
+        'fifty_two_week_high': highs,
+        'fifty_two_week_low': lows,
+        'avg_cost': list(map(Decimal.__truediv__, cost_basis, quantity)),
+        'current_value': current_value,
+        'gain_loss': gain_loss,
+        'gain_loss_percentage': gain_loss_percentage,
+        'portfolio_percentage': portfolio_percentage,
+        'day_gain': list(map(Decimal.__mul__, day_changes, quantity)),
+        'delta_from_52w_low': delta_from_52w_low,
+        'delta_from_52w_high': delta_from_52w_high,
+    }
+
+
+def build_holdings(positions, stock_data_by_symbol):
+    """
+    Build holding rows from positions and the stock data for each symbol
+    Quotes are gathered into float64 columns and the table is computed by the
+    columnar kernel above; quantities and cost bases are passed through as stored.
+    Positions with zero shares are skipped; rows are sorted by value (descending)
+    """
+    open_positions = {symbol: data for symbol, data in positions.items() if data['quantity'] > 0}
+    if not open_positions:
+        return []
+
+    symbols = list(open_positions)
+    stock_data = [stock_data_by_symbol.get(symbol, {}) for symbol in symbols]
+    quantities = [open_positions[symbol]['quantity'] for symbol in symbols]
+    cost_bases = [open_positions[symbol]['cost_basis'] for symbol in symbols]
+
+    # One pass over the quote dicts; None becomes NaN
+    quotes = _float_column(
+        (
+            data.get('current_price') or 0.0,
+            data.get('day_change') or 0.0,
+            data.get('fifty_two_week_high'),
+            data.get('fifty_two_week_low'),
+            data.get('day_change_percentage') or 0.0,
+        )
+        for data in stock_data
+    )
+    price, day_change, high, low, day_change_percentage = quotes.T
+
+    table = compute_holdings_table(quantities, cost_bases, price, day_change, high, low)
+    day_change_percentage = _quote_decimals(day_change_percentage)
+
+    result = [
+        {
+            'symbol': symbol,
+            'quantity': quantity,
+            'avg_cost': avg_cost,
+            'cost_basis': cost_basis,
+            'current_price': current_price,
+            'current_value': current_value,
+            'gain_loss': gain_loss,
+            'gain_loss_percentage': gain_loss_percentage,
+            'company_name': data.get('company_name', symbol),
+            'day_change_percentage': day_change_percentage,
+            'day_change': day_change,
+            # Day's gain $ (day's change x quantity)
+            'day_gain': day_gain,
+            'fifty_two_week_high': fifty_two_week_high,
+            'fifty_two_week_low': fifty_two_week_low,
+            'delta_from_52w_low': delta_from_52w_low,
+            'delta_from_52w_high': delta_from_52w_high,
+            'pe_ratio': _to_decimal(data.get('pe_ratio')),
+            'dividend_yield': _to_decimal(data.get('dividend_yield')),
+            'portfolio_percentage': portfolio_percentage,
+            'total_gain': gain_loss
+        }
+        for (
+            symbol, data, quantity, cost_basis, day_change_percentage, avg_cost, current_price, current_value,
+            gain_loss, gain_loss_percentage, day_change, day_gain, fifty_two_week_high, fifty_two_week_low,
+            delta_from_52w_low, delta_from_52w_high, portfolio_percentage,
+        ) in zip(
+            symbols, stock_data, quantities, cost_bases, day_change_percentage, table['avg_cost'],
+            table['current_price'], table['current_value'], table['gain_loss'], table['gain_loss_percentage'],
+            table['day_change'], table['day_gain'], table['fifty_two_week_high'], table['fifty_two_week_low'],
+            table['delta_from_52w_low'], table['delta_from_52w_high'], table['portfolio_percentage'],
+        )
+    ]
+
+    # Sort holdings by value (descending)
+    result.sort(key=lambda x: x['current_value'], reverse=True)
+    return result
+
+
+class HoldingsSnapshot:
+    """
+    Point-in-time view of a portfolio's holdings and summary totals
+    Built once per request so every summary reads the same numbers
+    """
+
+    def __init__(self, holdings):
+        self.holdings = holdings
+        self.total_value = sum((holding['current_value'] for holding in holdings), Decimal('0.00'))
+        self.total_cost = sum((holding['cost_basis'] for holding in holdings), Decimal('0.00'))
+        self.total_gain_loss = self.total_value - self.total_cost
+        self.total_gain_loss_percentage = _gain_loss_percentage(self.total_gain_loss, self.total_cost)
+
+    @property
+    def symbols(self):
+        """Symbols with an open position"""
+        return [holding['symbol'] for holding in self.holdings]
+
+    @classmethod
+    def for_portfolio(cls, portfolio):
+        """Load the portfolio's positions once and price every open position"""
+        from portfolio.services import StockDataService
+
+        # Positions are maintained from Transaction writes, so this is O(symbols)
+        positions = _positions_by_symbol(portfolio.positions.all())
+        open_symbols = [symbol for symbol, data in positions.items() if data['quantity'] > 0]
+        stock_data_by_symbol = StockDataService().get_stock_data_many(open_symbols)
+
+        logger.debug(f"Built holdings snapshot for portfolio {portfolio.pk} with {len(open_symbols)} positions")
+        return cls(build_holdings(positions, stock_data_by_symbol))
+
+
+def _gain_loss_percentage(gain_loss, cost):
+    if cost == 0:
+        return Decimal('0.00')
+    return (gain_loss / cost) * 100
+
+
+def _positions_by_symbol(positions):
+    return {
+        position.symbol: {'quantity': position.quantity, 'cost_basis': position.cost_basis}
+        for position in positions
+    }
+
+
+def prime_holdings_snapshots(portfolios):
+    """
+    Build and memoize holdings snapshots for several portfolios at once
+    Positions are loaded in one query and quotes for the union of symbols in
+    one batched lookup, instead of one round of each per portfolio
+    """
+    from portfolio.models import Position
+    from portfolio.services import StockDataService
+
+    portfolios = list(portfolios)
+    positions_by_portfolio = {portfolio.pk: [] for portfolio in portfolios}
+    for position in Position.objects.filter(portfolio__in=portfolios, quantity__gt=0):
+        positions_by_portfolio[position.portfolio_id].append(position)
+
+    symbols = {position.symbol for positions in positions_by_portfolio.values() for position in positions}
+    stock_data_by_symbol = StockDataService().get_stock_data_many(sorted(symbols)) if symbols else {}
+
+    for portfolio in portfolios:
+        positions = _positions_by_symbol(positions_by_portfolio[portfolio.pk])
+        portfolio._holdings_snapshot = HoldingsSnapshot(build_holdings(positions, stock_data_by_symbol))
+
+    return portfolios
+
+
+class UserHoldingsSummary:
+    """
+    Every portfolio of a user priced together, with per-portfolio and grand totals
+    Positions for all portfolios come from one query and quotes for the union of
+    their symbols from one batched lookup (see prime_holdings_snapshots)
+    """
+
+    def __init__(self, portfolios):
+        self.portfolios = portfolios
+        snapshots = [portfolio.get_holdings_snapshot() for portfolio in portfolios]
+
+        self.total_value = sum((snapshot.total_value for snapshot in snapshots), Decimal('0.00'))
+        self.total_cost = sum((snapshot.total_cost for snapshot in snapshots), Decimal('0.00'))
+        self.total_gain_loss = self.total_value - self.total_cost
+        self.total_gain_loss_percentage = _gain_loss_percentage(self.total_gain_loss, self.total_cost)
+
+    @property
+    def symbols(self):
+        """Union of the symbols held across all portfolios"""
+        return sorted({
+            symbol for portfolio in self.portfolios for symbol in portfolio.get_holdings_snapshot().symbols
+        })
+
+    @classmethod
+    def for_user(cls, user):
+        """Load and price all of a user's portfolios at once"""
+        from portfolio.models import Portfolio
+
+        return cls(prime_holdings_snapshots(Portfolio.objects.filter(user=user)))
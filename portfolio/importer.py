@@ -0,0 +1,337 @@
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+import pandas as pd
+from django.conf import settings
+from django.db import close_old_connections, transaction as db_transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ['symbol', 'quantity', 'price_per_share']
+TRANSACTION_TYPES = ('BUY', 'SELL')
+SYMBOL_MAX_LENGTH = 10
+# Largest values that fit Transaction.quantity (15, 4) and price_per_share (15, 2)
+MAX_QUANTITY = 10 ** 11
+MAX_PRICE = 10 ** 13
+
+# Background import jobs
+IMPORT_CHUNK_SIZE = getattr(settings, 'IMPORT_CHUNK_SIZE', 5000)  # Rows per bulk insert
+IMPORT_MAX_CSV_SIZE = getattr(settings, 'IMPORT_MAX_CSV_SIZE', 30 * 1024 * 1024)
+IMPORT_MAX_EXCEL_SIZE = getattr(settings, 'IMPORT_MAX_EXCEL_SIZE', 20 * 1024 * 1024)
+IMPORT_JOB_TIMEOUT = getattr(settings, 'IMPORT_JOB_TIMEOUT', 60 * 30)
+MAX_STORED_IMPORT_ERRORS = 100
+
+_local_executor = None
+_local_executor_lock = threading.Lock()
+
+
+class ImportResult:
+    """Outcome of importing one frame (or chunk) of transactions"""
+
+    def __init__(self):
+        self.success_count = 0
+        self.errors = []
+        self.symbols = set()
+
+    @property
+    def error_count(self):
+        return len(self.errors)
+
+    def update(self, other):
+        """Fold in the result of another chunk"""
+        self.success_count += other.success_count
+        self.errors.extend(other.errors)
+        self.symbols.update(other.symbols)
+
+
+def missing_columns(columns):
+    """Return the required columns absent from a frame's columns"""
+    return [column for column in REQUIRED_COLUMNS if column not in columns]
+
+
+def _parse_dates(values):
+    dates = pd.to_datetime(values, errors='coerce')
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        # Mixed UTC offsets parse to objects; normalise them all to UTC
+        dates = pd.to_datetime(values, errors='coerce', utc=True)
+    if dates.dt.tz is None:
+        dates = dates.dt.tz_localize(timezone.get_current_timezone(), ambiguous='NaT', nonexistent='NaT')
+    return dates
+
+
+def validate_frame(df, row_offset=0):
+    """
+    Validate and normalise a whole frame of transactions at once
+    Returns (clean, errors): a frame of the valid rows with normalised columns
+    and a list of error messages for the rejected rows. Row numbers in the
+    messages count from 1, shifted by row_offset for later chunks
+    """
+    symbol = df['symbol'].astype('string').str.strip().str.upper()
+    quantity = pd.to_numeric(df['quantity'], errors='coerce')
+    price = pd.to_numeric(df['price_per_share'], errors='coerce')
+
+    if 'transaction_type' in df.columns:
+        transaction_type = df['transaction_type'].astype('string').str.strip().str.upper()
+    else:
+        transaction_type = pd.Series('BUY', index=df.index, dtype='string')  # Default to BUY
+
+    if 'transaction_date' in df.columns:
+        transaction_date = _parse_dates(df['transaction_date'])
+    else:
+        transaction_date = pd.Series(timezone.now(), index=df.index)
+
+    checks = [
+        (symbol.isna() | (symbol == ''), "Missing symbol."),
+        (symbol.str.len() > SYMBOL_MAX_LENGTH, f"Symbol longer than {SYMBOL_MAX_LENGTH} characters."),
+        (~transaction_type.isin(TRANSACTION_TYPES).fillna(False), "Invalid transaction type. Must be 'BUY' or 'SELL'."),
+        (quantity.isna() | (quantity <= 0), "Quantity must be a positive number."),
+        (quantity >= MAX_QUANTITY, "Quantity is too large."),
+        (price.isna() | (price < 0), "Price per share must be a non-negative number."),
+        (price >= MAX_PRICE, "Price per share is too large."),
+        (transaction_date.isna(), "Invalid transaction date."),
+    ]
+
+    invalid = pd.Series(False, index=df.index)
+    errors = {}
+    for mask, message in checks:
+        mask = mask.fillna(True).astype(bool)
+        # Report only the first problem of each row, like the row-by-row importer did
+        for position in (mask & ~invalid).to_numpy().nonzero()[0]:
+            errors[position] = f"Row {row_offset + position + 1}: {message}"
+        invalid |= mask
+
+    clean = pd.DataFrame({
+        'symbol': symbol,
+        'transaction_type': transaction_type,
+        'quantity': quantity,
+        'price_per_share': price,
+        'transaction_date': transaction_date,
+    })[~invalid]
+    return clean, [errors[position] for position in sorted(errors)]
+
+
+def import_frame(portfolio, df, row_offset=0):
+    """
+    Validate a frame and insert its valid rows in one atomic bulk write
+    Stock rows for new symbols are created in the same transaction. Positions
+    are not touched; call finish_import once every chunk is in
+    """
+    from portfolio.models import Stock, Transaction
+
+    result = ImportResult()
+    clean, result.errors = validate_frame(df, row_offset)
+    if clean.empty:
+        return result
+
+    transactions = [
+        Transaction(
+            portfolio=portfolio,
+            stock_symbol=symbol,
+            transaction_type=transaction_type,
+            # Round at the boundary so the model's decimal places hold exactly
+            quantity=Decimal(f"{quantity:.4f}"),
+            price_per_share=Decimal(f"{price:.2f}"),
+            transaction_date=transaction_date.to_pydatetime(),
+        )
+        for symbol, transaction_type, quantity, price, transaction_date in zip(
+            clean['symbol'], clean['transaction_type'], clean['quantity'],
+            clean['price_per_share'], clean['transaction_date']
+        )
+    ]
+    symbols = set(clean['symbol'])
+
+    with db_transaction.atomic():
+        # bulk_create skips the Transaction signals; finish_import rebuilds positions instead
+        Transaction.objects.bulk_create(transactions, batch_size=1000)
+        Stock.objects.bulk_create(
+            [Stock(symbol=symbol) for symbol in sorted(symbols)],
+            ignore_conflicts=True
+        )
+
+    result.success_count = len(transactions)
+    result.symbols = symbols
+    logger.info(f"Imported {len(transactions)} transactions into portfolio {portfolio.pk}")
+    return result
+
+
+def finish_import(portfolio, symbols):
+    """
+    Bring positions up to date after an import and queue quote warm-up
+    Quotes are fetched by a background refresh rather than inside the import
+    """
+    from portfolio.holdings import rebuild_positions
+    from portfolio.quote_refresh import enqueue_quote_refresh
+
+    rebuild_positions(portfolio)
+
+    if symbols:
+        enqueue_quote_refresh(symbols, user=portfolio.user)
+
+
+def _file_size(handle):
+    """Size of an open file in bytes, leaving it rewound"""
+    size = handle.seek(0, io.SEEK_END)
+    handle.seek(0)
+    return size
+
+
+def _read_chunks(name, handle):
+    """Yield the file as frames of at most IMPORT_CHUNK_SIZE rows"""
+    if name.lower().endswith('.csv'):
+        # Only one chunk is in memory at a time
+        yield from pd.read_csv(handle, chunksize=IMPORT_CHUNK_SIZE)
+        return
+
+    # Excel can't be streamed, but rows are still inserted chunk by chunk
+    df = pd.read_excel(handle)
+    for start in range(0, len(df), IMPORT_CHUNK_SIZE):
+        yield df.iloc[start:start + IMPORT_CHUNK_SIZE]
+
+
+def _save_progress(job, result, rows_processed, bytes_processed):
+    job.rows_processed = rows_processed
+    job.bytes_processed = bytes_processed
+    job.success_count = result.success_count
+    job.error_count = result.error_count
+    job.errors = result.errors[:MAX_STORED_IMPORT_ERRORS]
+    job.save(update_fields=['rows_processed', 'bytes_processed', 'success_count', 'error_count', 'errors'])
+
+
+def fail_stale_job(job_id):
+    """
+    Mark a job failed if it has been running past IMPORT_JOB_TIMEOUT, e.g. because
+    its worker was killed. Chunks it committed stay, so it is not re-run from the start
+    Returns True if the job was marked failed
+    """
+    from portfolio.models import ImportJob
+
+    cutoff = timezone.now() - timedelta(seconds=IMPORT_JOB_TIMEOUT)
+    failed = ImportJob.objects.filter(
+        pk=job_id, status=ImportJob.STATUS_RUNNING, started_at__lt=cutoff
+    ).update(
+        status=ImportJob.STATUS_FAILED,
+        message="Import stopped before finishing. Rows processed so far were imported.",
+        finished_at=timezone.now(),
+    )
+    if failed:
+        logger.warning(f"Import job {job_id} ran past {IMPORT_JOB_TIMEOUT}s, marked it failed")
+        job = ImportJob.objects.select_related('portfolio').get(pk=job_id)
+        try:
+            finish_import(job.portfolio, set())
+        except Exception as e:
+            logger.error(f"Error finishing import job {job_id}: {str(e)}")
+        _delete_file(job)
+    return bool(failed)
+
+
+def _delete_file(job):
+    try:
+        job.file.delete(save=False)
+    except Exception as e:
+        logger.warning(f"Could not delete the file of import job {job.pk}: {str(e)}")
+
+
+def run_import_job(job_id):
+    """
+    Process a pending ImportJob chunk by chunk, recording progress as it goes
+    Each chunk is inserted in its own atomic block, and the uploaded file is
+    deleted once the job finishes. A job that is not pending (e.g. a redelivered
+    task) is left alone, unless it has been running past IMPORT_JOB_TIMEOUT
+    """
+    from portfolio.models import ImportJob
+
+    claimed = ImportJob.objects.filter(pk=job_id, status=ImportJob.STATUS_PENDING).update(
+        status=ImportJob.STATUS_RUNNING, started_at=timezone.now()
+    )
+    if not claimed:
+        if not fail_stale_job(job_id):
+            logger.info(f"Import job {job_id} is not pending, skipping")
+        return None
+
+    job = ImportJob.objects.select_related('portfolio').get(pk=job_id)
+    result = ImportResult()
+    rows_processed = 0
+
+    try:
+        try:
+            with job.file.open('rb') as handle:
+                # Rows can span lines, so CSV progress is the share of the file the parser has read
+                if job.original_name.lower().endswith('.csv'):
+                    job.total_bytes = _file_size(handle)
+                    job.save(update_fields=['total_bytes'])
+
+                for chunk in _read_chunks(job.original_name, handle):
+                    if rows_processed == 0:
+                        missing = missing_columns(chunk.columns)
+                        if missing:
+                            raise ValueError(
+                                f"Missing required columns: {', '.join(missing)}. "
+                                f"Required columns are: {', '.join(REQUIRED_COLUMNS)}."
+                            )
+
+                    result.update(import_frame(job.portfolio, chunk, rows_processed))
+                    rows_processed += len(chunk)
+                    _save_progress(job, result, rows_processed, handle.tell())
+
+            job.status = ImportJob.STATUS_COMPLETED
+            job.message = f"Imported {result.success_count} transactions."
+        except Exception as e:
+            logger.error(f"Import job {job_id} failed after {rows_processed} rows: {str(e)}")
+            job.status = ImportJob.STATUS_FAILED
+            job.message = f"Error processing file: {str(e)}"
+            if result.success_count:
+                job.message += f" {result.success_count} transactions from earlier rows were imported."
+
+        # Chunks that made it in are committed, so positions must reflect them either way
+        if result.success_count:
+            try:
+                finish_import(job.portfolio, result.symbols)
+            except Exception as e:
+                logger.error(f"Error finishing import job {job_id}: {str(e)}")
+
+        job.total_rows = rows_processed if job.status == ImportJob.STATUS_COMPLETED else job.total_rows
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'message', 'total_rows', 'finished_at'])
+    finally:
+        if job.status in (ImportJob.STATUS_COMPLETED, ImportJob.STATUS_FAILED):
+            _delete_file(job)
+    return result
+
+
+def _get_local_executor():
+    global _local_executor
+    with _local_executor_lock:
+        if _local_executor is None:
+            _local_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='import-jobs')
+        return _local_executor
+
+
+def _run_import_job_locally(job_id):
+    try:
+        run_import_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def dispatch_import_job(job):
+    """
+    Hand an ImportJob to a worker
+    Uses Cloud Tasks when IMPORT_JOB_BACKEND is 'cloud_tasks' (the default when
+    a project is configured), otherwise an in-process executor for development
+    Returns the backend used
+    """
+    from portfolio.tasks import process_import_job, CLOUD_TASKS_PROJECT
+
+    backend = getattr(settings, 'IMPORT_JOB_BACKEND', None) or ('cloud_tasks' if CLOUD_TASKS_PROJECT else 'local')
+    if backend == 'cloud_tasks':
+        if process_import_job(job.pk):
+            return backend
+        logger.warning(f"Could not queue import job {job.pk} as a Cloud Task, running it locally")
+
+    _get_local_executor().submit(_run_import_job_locally, job.pk)
+    return 'local'
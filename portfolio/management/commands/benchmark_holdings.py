@@ -0,0 +1,199 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from django.core.management.base import BaseCommand, CommandError
+from portfolio.holdings import replay_transactions, build_holdings
+
+# Holding fields compared between the two implementations, at display precision
+COMPARED_FIELDS = (
+    'avg_cost', 'current_price', 'current_value', 'gain_loss', 'gain_loss_percentage',
+    'day_change', 'day_gain', 'fifty_two_week_high', 'fifty_two_week_low',
+    'delta_from_52w_low', 'delta_from_52w_high', 'portfolio_percentage',
+)
+DISPLAY_PRECISION = Decimal('0.01')
+
+
+def to_decimal(value, default=None):
+    """Convert a cached float value to Decimal, keeping None as the default"""
+    if value is None:
+        return default
+    return Decimal(str(value))
+
+
+def build_holdings_exact(positions, stock_data_by_symbol):
+    """Decimal implementation of build_holdings, one position at a time, as the reference"""
+    open_positions = {symbol: data for symbol, data in positions.items() if data['quantity'] > 0}
+
+    # Resolve prices once so the portfolio total and each row share the same quote
+    prices = {
+        symbol: to_decimal(stock_data_by_symbol.get(symbol, {}).get('current_price', 0.0), Decimal('0.0'))
+        for symbol in open_positions
+    }
+    total_portfolio_value = sum(
+        (data['quantity'] * prices[symbol] for symbol, data in open_positions.items()),
+        Decimal('0.00')
+    )
+
+    result = []
+    for symbol, data in open_positions.items():
+        stock_data = stock_data_by_symbol.get(symbol, {})
+        current_price = prices[symbol]
+        quantity = data['quantity']
+        cost_basis = data['cost_basis']
+
+        # Calculate average cost per share
+        avg_cost = cost_basis / quantity
+
+        # Calculate current value and gain/loss
+        current_value = quantity * current_price
+        gain_loss = current_value - cost_basis
+        gain_loss_percentage = Decimal('0.00')
+        if cost_basis > 0:
+            gain_loss_percentage = (gain_loss / cost_basis) * 100
+
+        # Calculate portfolio percentage
+        portfolio_percentage = Decimal('0.00')
+        if total_portfolio_value > 0:
+            portfolio_percentage = (current_value / total_portfolio_value) * 100
+
+        # Get other stock data, converting floats to Decimals
+        day_change = to_decimal(stock_data.get('day_change', 0.0), Decimal('0.0'))
+        day_change_percentage = to_decimal(stock_data.get('day_change_percentage', 0.0), Decimal('0.0'))
+        fifty_two_week_high = to_decimal(stock_data.get('fifty_two_week_high'))
+        fifty_two_week_low = to_decimal(stock_data.get('fifty_two_week_low'))
+
+        # Calculate 52-week range deltas if available
+        delta_from_52w_low = None
+        delta_from_52w_high = None
+        if fifty_two_week_low and current_price > 0:
+            delta_from_52w_low = current_price - fifty_two_week_low
+        if fifty_two_week_high and current_price > 0:
+            delta_from_52w_high = fifty_two_week_high - current_price
+
+        result.append({
+            'symbol': symbol,
+            'quantity': quantity,
+            'avg_cost': avg_cost,
+            'cost_basis': cost_basis,
+            'current_price': current_price,
+            'current_value': current_value,
+            'gain_loss': gain_loss,
+            'gain_loss_percentage': gain_loss_percentage,
+            'company_name': stock_data.get('company_name', symbol),
+            'day_change_percentage': day_change_percentage,
+            'day_change': day_change,
+            # Day's gain $ (day's change x quantity)
+            'day_gain': day_change * quantity,
+            'fifty_two_week_high': fifty_two_week_high,
+            'fifty_two_week_low': fifty_two_week_low,
+            'delta_from_52w_low': delta_from_52w_low,
+            'delta_from_52w_high': delta_from_52w_high,
+            'pe_ratio': to_decimal(stock_data.get('pe_ratio')),
+            'dividend_yield': to_decimal(stock_data.get('dividend_yield')),
+            'portfolio_percentage': portfolio_percentage,
+            'total_gain': gain_loss
+        })
+
+    # Sort holdings by value (descending)
+    result.sort(key=lambda x: x['current_value'], reverse=True)
+    return result
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the vectorized holdings kernel against the Decimal implementation on synthetic data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transactions', type=int, default=10000, help='Synthetic transactions to replay')
+        parser.add_argument('--symbols', type=int, default=1000, help='Distinct symbols across the transactions')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per implementation (best is reported)')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        symbols = [f"S{i:04d}" for i in range(options['symbols'])]
+        transactions = self._make_transactions(rng, symbols, options['transactions'])
+        stock_data = self._make_stock_data(rng, symbols)
+
+        start = time.perf_counter()
+        positions = replay_transactions(transactions)
+        replay_time = time.perf_counter() - start
+        self.stdout.write(
+            f"Replayed {len(transactions)} transactions into {len(positions)} positions in {replay_time * 1000:.1f} ms"
+        )
+
+        (exact_time, exact), (kernel_time, vectorized) = self._best_of(
+            (build_holdings_exact, build_holdings), positions, stock_data, options['repeat']
+        )
+        self.stdout.write(f"  Decimal loop:      {exact_time * 1000:.1f} ms")
+        self.stdout.write(f"  Vectorized kernel: {kernel_time * 1000:.1f} ms ({exact_time / kernel_time:.1f}x)")
+
+        mismatches = self._compare(exact, vectorized)
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f"❌ {len(mismatches)} values differ at 2-dp display precision"))
+            for symbol, field, expected, actual in mismatches[:20]:
+                self.stdout.write(f"  {symbol}.{field}: {expected} != {actual}")
+            raise CommandError(f"{len(mismatches)} holding values differ from the Decimal implementation")
+        self.stdout.write(self.style.SUCCESS(f"✅ All {len(exact)} holdings match at 2-dp display precision"))
+
+    def _make_transactions(self, rng, symbols, count):
+        start_date = date(2015, 1, 1)
+        transactions = []
+        for i in range(count):
+            # Mostly buys so most positions stay open
+            transactions.append(SimpleNamespace(
+                id=i + 1,
+                stock_symbol=rng.choice(symbols),
+                transaction_type='SELL' if rng.random() < 0.2 else 'BUY',
+                quantity=Decimal(rng.randint(1, 500000)).scaleb(-4),
+                price_per_share=Decimal(rng.randint(100, 50000000)).scaleb(-4),
+                transaction_date=start_date + timedelta(days=i // 10),
+            ))
+        return transactions
+
+    def _make_stock_data(self, rng, symbols):
+        stock_data = {}
+        for symbol in symbols:
+            price = round(rng.uniform(1, 5000), 2)
+            stock_data[symbol] = {
+                'symbol': symbol,
+                'company_name': symbol,
+                'current_price': price,
+                'day_change': round(rng.uniform(-50, 50), 2),
+                'day_change_percentage': round(rng.uniform(-5, 5), 4),
+                'fifty_two_week_high': round(price * rng.uniform(1, 1.5), 2) if rng.random() > 0.1 else None,
+                'fifty_two_week_low': round(price * rng.uniform(0.5, 1), 2) if rng.random() > 0.1 else None,
+                'pe_ratio': round(rng.uniform(5, 60), 2),
+                'dividend_yield': None,
+            }
+        return stock_data
+
+    def _best_of(self, builds, positions, stock_data, repeat):
+        """Best time and last result of each build; runs alternate so both see the same load"""
+        best = [None] * len(builds)
+        results = [None] * len(builds)
+        for _ in range(max(repeat, 1)):
+            for i, build in enumerate(builds):
+                start = time.perf_counter()
+                results[i] = build(positions, stock_data)
+                elapsed = time.perf_counter() - start
+                best[i] = elapsed if best[i] is None else min(best[i], elapsed)
+        return list(zip(best, results))
+
+    def _compare(self, exact, vectorized):
+        def display(value):
+            return None if value is None else Decimal(value).quantize(DISPLAY_PRECISION)
+
+        vectorized_by_symbol = {holding['symbol']: holding for holding in vectorized}
+        mismatches = []
+        for holding in exact:
+            other = vectorized_by_symbol.get(holding['symbol'])
+            if other is None:
+                mismatches.append((holding['symbol'], 'row', 'present', 'missing'))
+                continue
+            for field in COMPARED_FIELDS:
+                expected, actual = display(holding[field]), display(other[field])
+                if expected != actual:
+                    mismatches.append((holding['symbol'], field, expected, actual))
+        return mismatches
@@ -0,0 +1,99 @@
+import json
+import pickle
+import time
+from django.core.management.base import BaseCommand
+from django.core.cache import cache
+from portfolio.codec import encode_price, decode_price, encode_fundamentals, decode_fundamentals
+
+SAMPLE_RECORDS = {
+    'price': (
+        {
+            'current_price': 189.84,
+            'day_change': -1.27,
+            'day_change_percentage': -0.6646,
+            'last_updated': '1760800000',
+        },
+        encode_price,
+        decode_price,
+    ),
+    'full': (
+        {
+            'symbol': 'AAPL',
+            'company_name': 'Apple Inc',
+            'fifty_two_week_high': 237.23,
+            'fifty_two_week_low': 164.08,
+            'pe_ratio': 29.61,
+            'dividend_yield': 0.0044,
+            'fundamentals_updated': '1760800000',
+        },
+        encode_fundamentals,
+        decode_fundamentals,
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = 'Compare the packed stock cache encoding with the previous pickled JSON strings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=100000, help='Decodes timed per format')
+        parser.add_argument('--redis', action='store_true', help='Also measure MEMORY USAGE of real keys in Redis')
+        parser.add_argument('--keys', type=int, default=1000, help='Keys written per format with --redis')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+
+        for tier, (record, encode, decode) in SAMPLE_RECORDS.items():
+            # What django-redis stored before: a JSON string, pickled again by the cache backend
+            legacy = pickle.dumps(json.dumps(record), pickle.HIGHEST_PROTOCOL)
+            packed = encode(record)
+
+            legacy_time = self._time_decodes(lambda: json.loads(pickle.loads(legacy)), iterations)
+            packed_time = self._time_decodes(lambda: decode(packed), iterations)
+
+            self.stdout.write(f"\n{tier} record:")
+            self.stdout.write(f"  pickled JSON: {len(legacy)} bytes, {legacy_time:.2f} µs per read")
+            self.stdout.write(f"  packed:       {len(packed)} bytes, {packed_time:.2f} µs per read")
+            self.stdout.write(self.style.SUCCESS(
+                f"  ✅ {len(legacy) / len(packed):.1f}x smaller, {legacy_time / packed_time:.1f}x faster to decode"
+            ))
+
+            if options['redis']:
+                self._measure_redis(tier, legacy, packed, options['keys'])
+
+    def _time_decodes(self, decode, iterations):
+        """Return the CPU time of one decode in microseconds"""
+        start = time.process_time()
+        for _ in range(iterations):
+            decode()
+        return (time.process_time() - start) / iterations * 1e6
+
+    def _measure_redis(self, tier, legacy, packed, count):
+        from django_redis import get_redis_connection
+
+        connection = get_redis_connection('default')
+        prefix = cache.make_key(f"benchmark:{tier}")
+        legacy_keys = [f"{prefix}:legacy:{i}" for i in range(count)]
+        hash_keys = [f"{prefix}:hash:{i}" for i in range(count)]
+
+        try:
+            pipeline = connection.pipeline(transaction=False)
+            for legacy_key, hash_key in zip(legacy_keys, hash_keys):
+                pipeline.set(legacy_key, legacy)
+                pipeline.hset(hash_key, tier, packed)
+            pipeline.execute()
+
+            legacy_memory = self._memory_usage(connection, legacy_keys)
+            packed_memory = self._memory_usage(connection, hash_keys)
+            self.stdout.write(f"  Redis memory per key: {legacy_memory:.0f} bytes (pickled JSON) vs {packed_memory:.0f} bytes (packed hash)")
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"  ❌ Redis measurement failed: {str(e)}"))
+        finally:
+            connection.delete(*legacy_keys, *hash_keys)
+
+    def _memory_usage(self, connection, keys):
+        pipeline = connection.pipeline(transaction=False)
+        for key in keys:
+            pipeline.memory_usage(key)
+        usages = [usage or 0 for usage in pipeline.execute()]
+        return sum(usages) / len(usages)
@@ -0,0 +1,49 @@
+import logging
+from django.core.management.base import BaseCommand
+from portfolio.models import Portfolio
+from portfolio.holdings import rebuild_positions, verify_positions
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized Position table from the transaction ledger and verify it'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--portfolio',
+            type=int,
+            action='append',
+            help='Only process the portfolio with this id (can be given more than once)'
+        )
+        parser.add_argument(
+            '--verify-only',
+            action='store_true',
+            help='Compare stored positions with the ledger without rewriting them'
+        )
+
+    def handle(self, *args, **options):
+        portfolios = Portfolio.objects.all().order_by('pk')
+        if options['portfolio']:
+            portfolios = portfolios.filter(pk__in=options['portfolio'])
+
+        verify_only = options['verify_only']
+        self.stdout.write(f"{'Verifying' if verify_only else 'Rebuilding'} positions for {portfolios.count()} portfolios...")
+
+        mismatch_count = 0
+        for portfolio in portfolios:
+            if not verify_only:
+                positions = rebuild_positions(portfolio)
+                self.stdout.write(f"  {portfolio}: {len(positions)} positions rebuilt")
+
+            mismatches = verify_positions(portfolio)
+            for symbol, stored, expected in mismatches:
+                mismatch_count += 1
+                self.stdout.write(self.style.ERROR(
+                    f"  ❌ {portfolio} {symbol}: stored {stored}, ledger {expected}"
+                ))
+
+        if mismatch_count:
+            logger.warning(f"Position verification found {mismatch_count} mismatches")
+            self.stdout.write(self.style.ERROR(f"❌ Found {mismatch_count} position mismatches"))
+        else:
+            self.stdout.write(self.style.SUCCESS("✅ All positions match the transaction ledger"))
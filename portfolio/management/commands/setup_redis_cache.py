@@ -86,4 +86,11 @@ class Command(BaseCommand):
         except Exception as e:
             self.stdout.write(self.style.WARNING(f"Unable to retrieve cache statistics: {str(e)}"))
         
+        local_stats = stock_service.get_cache_stats()
+        self.stdout.write("\nLocal Cache Statistics:")
+        self.stdout.write(f"  Entries: {local_stats['size']}/{local_stats['max_entries']}")
+        self.stdout.write(f"  Hits: {local_stats['hits']} (stale: {local_stats['stale_hits']})")
+        self.stdout.write(f"  Misses: {local_stats['misses']}")
+        self.stdout.write(f"  Evictions: {local_stats['evictions']}")
+        
         self.stdout.write(self.style.SUCCESS("\nRedis cache setup completed!")) 
\ No newline at end of file
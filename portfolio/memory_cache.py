@@ -0,0 +1,107 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Entry states returned by LocalCache.lookup()
+FRESH = 'fresh'
+STALE = 'stale'
+
+
+class LocalCache:
+    """
+    Bounded, thread-safe in-process LRU cache with per-entry TTL
+    Entries past their TTL are kept for a further stale_ttl seconds so callers
+    can serve them while a refresh runs (stale-while-revalidate). When the cache
+    is full the least recently used entry is evicted.
+    """
+
+    def __init__(self, max_entries=1024, default_ttl=60, stale_ttl=0):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self._entries = OrderedDict()  # key -> (value, fresh_until, stale_until)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+    def lookup(self, key):
+        """
+        Look up a key, returning (value, state)
+        state is FRESH, STALE (past its TTL but inside the stale window) or None on a miss
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None, None
+
+            value, fresh_until, stale_until = entry
+            if now >= stale_until:
+                del self._entries[key]
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return None, None
+
+            self._entries.move_to_end(key)
+            if now < fresh_until:
+                self._stats['hits'] += 1
+                return value, FRESH
+            self._stats['stale_hits'] += 1
+            return value, STALE
+
+    def get(self, key, allow_stale=False):
+        """Get a fresh value (or a stale one if allow_stale), else None"""
+        value, state = self.lookup(key)
+        if state == FRESH or (allow_stale and state == STALE):
+            return value
+        return None
+
+    def set(self, key, value, ttl=None):
+        """Store a value, evicting the least recently used entries beyond max_entries"""
+        ttl = self.default_ttl if ttl is None else ttl
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (value, now + ttl, now + ttl + self.stale_ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted_key, _ = self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+                logger.debug(f"Evicted {evicted_key} from local cache")
+
+    def set_many(self, mapping, ttl=None):
+        """Store several values with the same TTL"""
+        for key, value in mapping.items():
+            self.set(key, value, ttl)
+
+    def delete(self, key):
+        """Remove a key if present"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_many(self, keys):
+        """Remove several keys"""
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove every entry (statistics are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit/miss/eviction counters along with the current size"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        stats['max_entries'] = self.max_entries
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] + stats['stale_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,79 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:12
+
+from decimal import Decimal
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Frozen copy of the replay in portfolio.holdings at the time of this migration,
+# so later changes there don't change what this migration does
+QUANTITY_PRECISION = Decimal('0.0001')
+COST_BASIS_PRECISION = Decimal('0.000001')
+
+
+def replay_transactions(transactions):
+    """Replay a chronological ledger into {symbol: (quantity, cost_basis)}"""
+    positions = {}
+
+    for transaction in transactions:
+        quantity, cost_basis = positions.get(transaction.stock_symbol, (Decimal('0.00'), Decimal('0.00')))
+        if transaction.transaction_type == 'BUY':
+            quantity += transaction.quantity
+            cost_basis += transaction.quantity * transaction.price_per_share
+        elif transaction.transaction_type == 'SELL' and quantity > 0:
+            # Cost basis shrinks in proportion to the shares sold, at most all of it
+            sell_ratio = min(transaction.quantity / quantity, 1)
+            cost_basis -= cost_basis * sell_ratio
+            quantity -= transaction.quantity
+        positions[transaction.stock_symbol] = (quantity, cost_basis)
+
+    return positions
+
+
+def populate_positions(apps, schema_editor):
+    """Build the initial position table by replaying each portfolio's ledger"""
+    Portfolio = apps.get_model('portfolio', 'Portfolio')
+    Position = apps.get_model('portfolio', 'Position')
+    Transaction = apps.get_model('portfolio', 'Transaction')
+
+    for portfolio in Portfolio.objects.all():
+        transactions = list(Transaction.objects.filter(portfolio=portfolio).order_by('transaction_date', 'id'))
+        last_ids = {transaction.stock_symbol: transaction.id for transaction in transactions}
+        positions = []
+        for symbol, (quantity, cost_basis) in replay_transactions(transactions).items():
+            positions.append(Position(
+                portfolio=portfolio,
+                symbol=symbol,
+                quantity=quantity.quantize(QUANTITY_PRECISION),
+                cost_basis=cost_basis.quantize(COST_BASIS_PRECISION),
+                last_transaction_id=last_ids[symbol],
+            ))
+        Position.objects.bulk_create(positions)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0003_remove_stock_current_price_remove_stock_day_change_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Position',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=10)),
+                ('quantity', models.DecimalField(decimal_places=4, default=Decimal('0.0000'), max_digits=19)),
+                ('cost_basis', models.DecimalField(decimal_places=6, default=Decimal('0.000000'), max_digits=24)),
+                ('last_transaction_id', models.BigIntegerField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('portfolio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='positions', to='portfolio.portfolio')),
+            ],
+            options={
+                'ordering': ['symbol'],
+                'unique_together': {('portfolio', 'symbol')},
+            },
+        ),
+        migrations.RunPython(populate_positions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0006_alter_importjob_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='bytes_processed',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='total_bytes',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -2,7 +2,9 @@ from django.db import models
 
 # Create your models here.
 from django.db import models
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.files.storage import FileSystemStorage
 from django.utils import timezone
 from decimal import Decimal
 
@@ -16,159 +18,44 @@ class Portfolio(models.Model):
     def __str__(self):
         return f"{self.name} - {self.user.username}"
     
+    def get_holdings_snapshot(self):
+        """
+        Get the holdings snapshot for this portfolio
+        The ledger is replayed once per instance and reused by every summary method
+        """
+        snapshot = getattr(self, '_holdings_snapshot', None)
+        if snapshot is None:
+            from portfolio.holdings import HoldingsSnapshot
+            snapshot = HoldingsSnapshot.for_portfolio(self)
+            self._holdings_snapshot = snapshot
+        return snapshot
+
+    def clear_holdings_snapshot(self):
+        """Drop the memoized holdings snapshot so the next read replays the ledger"""
+        self._holdings_snapshot = None
+
     def get_total_value(self):
         """Calculate the current total value of the portfolio"""
-        total = Decimal('0.00')
-        for holding in self.get_holdings():
-            total += holding['current_value']
-        return total
+        return self.get_holdings_snapshot().total_value
     
     def get_total_cost(self):
         """Calculate the total cost basis of the portfolio"""
-        total = Decimal('0.00')
-        for holding in self.get_holdings():
-            total += holding['cost_basis']
-        return total
+        return self.get_holdings_snapshot().total_cost
     
     def get_total_gain_loss(self):
         """Calculate the total gain/loss of the portfolio"""
-        return self.get_total_value() - self.get_total_cost()
+        return self.get_holdings_snapshot().total_gain_loss
     
     def get_total_gain_loss_percentage(self):
         """Calculate the total gain/loss percentage of the portfolio"""
-        cost = self.get_total_cost()
-        if cost == 0:
-            return Decimal('0.00')
-        return (self.get_total_gain_loss() / cost) * 100
+        return self.get_holdings_snapshot().total_gain_loss_percentage
     
     def get_holdings(self):
         """
         Calculate current holdings based on transactions
         Returns a list of dictionaries with stock holdings information
         """
-        from portfolio.services import StockDataService
-        stock_service = StockDataService()
-        
-        holdings = {}
-        
-        for transaction in self.transactions.all():
-            symbol = transaction.stock_symbol
-            
-            if symbol not in holdings:
-                holdings[symbol] = {
-                    'symbol': symbol,
-                    'quantity': Decimal('0.00'),
-                    'cost_basis': Decimal('0.00'),
-                }
-            
-            if transaction.transaction_type == 'BUY':
-                current_quantity = holdings[symbol]['quantity']
-                current_cost = holdings[symbol]['cost_basis']
-                
-                # Add shares and cost
-                holdings[symbol]['quantity'] += transaction.quantity
-                holdings[symbol]['cost_basis'] += transaction.quantity * transaction.price_per_share
-            
-            elif transaction.transaction_type == 'SELL':
-                # Reduce shares (cost basis will be adjusted proportionally)
-                if holdings[symbol]['quantity'] > 0:
-                    sell_ratio = transaction.quantity / holdings[symbol]['quantity']
-                    if sell_ratio > 1:
-                        sell_ratio = 1  # Can't sell more than 100% of holdings
-                    
-                    holdings[symbol]['cost_basis'] -= holdings[symbol]['cost_basis'] * sell_ratio
-                    holdings[symbol]['quantity'] -= transaction.quantity
-        
-        # Filter out positions with zero shares and calculate current values
-        result = []
-        total_portfolio_value = Decimal('0.00')
-        
-        # First pass: calculate total portfolio value for percentage calculations
-        for symbol, data in holdings.items():
-            if data['quantity'] > 0:
-                # Get stock data from cache or API
-                stock_data = stock_service.get_stock_data(symbol)
-                # Convert float to Decimal for calculations
-                current_price = Decimal(str(stock_data.get('current_price', 0.0)))
-                current_value = data['quantity'] * current_price
-                total_portfolio_value += current_value
-        
-        # Second pass: create holding entries with all data
-        for symbol, data in holdings.items():
-            if data['quantity'] > 0:
-                # Get stock data from cache or API
-                stock_data = stock_service.get_stock_data(symbol)
-                # Convert float to Decimal for calculations
-                current_price = Decimal(str(stock_data.get('current_price', 0.0)))
-                
-                # Calculate average cost per share
-                avg_cost = Decimal('0.00')
-                if data['quantity'] > 0:
-                    avg_cost = data['cost_basis'] / data['quantity']
-                
-                # Calculate current value and gain/loss
-                current_value = data['quantity'] * current_price
-                gain_loss = current_value - data['cost_basis']
-                gain_loss_percentage = Decimal('0.00')
-                
-                if data['cost_basis'] > 0:
-                    gain_loss_percentage = (gain_loss / data['cost_basis']) * 100
-                
-                # Calculate portfolio percentage
-                portfolio_percentage = Decimal('0.00')
-                if total_portfolio_value > 0:
-                    portfolio_percentage = (current_value / total_portfolio_value) * 100
-                
-                # Get other stock data, converting floats to Decimals
-                company_name = stock_data.get('company_name', symbol)
-                day_change = Decimal(str(stock_data.get('day_change', 0.0)))
-                day_change_percentage = Decimal(str(stock_data.get('day_change_percentage', 0.0)))
-                
-                # Convert other float values to Decimal if they exist
-                fifty_two_week_high = Decimal(str(stock_data.get('fifty_two_week_high'))) if stock_data.get('fifty_two_week_high') is not None else None
-                fifty_two_week_low = Decimal(str(stock_data.get('fifty_two_week_low'))) if stock_data.get('fifty_two_week_low') is not None else None
-                pe_ratio = Decimal(str(stock_data.get('pe_ratio'))) if stock_data.get('pe_ratio') is not None else None
-                dividend_yield = Decimal(str(stock_data.get('dividend_yield'))) if stock_data.get('dividend_yield') is not None else None
-                
-                # Calculate day's gain $ (day's change × quantity)
-                day_gain = day_change * data['quantity']
-                
-                # Calculate 52-week range deltas if available
-                delta_from_52w_low = None
-                delta_from_52w_high = None
-                
-                if fifty_two_week_low and current_price > 0:
-                    delta_from_52w_low = current_price - fifty_two_week_low
-                
-                if fifty_two_week_high and current_price > 0:
-                    delta_from_52w_high = fifty_two_week_high - current_price
-                
-                result.append({
-                    'symbol': symbol,
-                    'quantity': data['quantity'],
-                    'avg_cost': avg_cost,
-                    'cost_basis': data['cost_basis'],
-                    'current_price': current_price,
-                    'current_value': current_value,
-                    'gain_loss': gain_loss,
-                    'gain_loss_percentage': gain_loss_percentage,
-                    'company_name': company_name,
-                    'day_change_percentage': day_change_percentage,
-                    'day_change': day_change,
-                    'day_gain': day_gain,
-                    'fifty_two_week_high': fifty_two_week_high,
-                    'fifty_two_week_low': fifty_two_week_low,
-                    'delta_from_52w_low': delta_from_52w_low,
-                    'delta_from_52w_high': delta_from_52w_high,
-                    'pe_ratio': pe_ratio,
-                    'dividend_yield': dividend_yield,
-                    'portfolio_percentage': portfolio_percentage,
-                    'total_gain': gain_loss
-                })
-        
-        # Sort holdings by value (descending)
-        result.sort(key=lambda x: x['current_value'], reverse=True)
-        return result
+        return self.get_holdings_snapshot().holdings
 
 
 class Stock(models.Model):
@@ -207,4 +94,90 @@ class Transaction(models.Model):
         return self.quantity * self.price_per_share
     
     class Meta:
-        ordering = ['-transaction_date']
\ No newline at end of file
+        ordering = ['-transaction_date']
+
+class Position(models.Model):
+    """
+    Materialized per-symbol position for a portfolio
+    Maintained incrementally from Transaction writes so holdings don't replay the ledger
+    """
+    portfolio = models.ForeignKey(Portfolio, on_delete=models.CASCADE, related_name='positions')
+    symbol = models.CharField(max_length=10)
+    quantity = models.DecimalField(max_digits=19, decimal_places=4, default=Decimal('0.0000'))
+    cost_basis = models.DecimalField(max_digits=24, decimal_places=6, default=Decimal('0.000000'))
+    last_transaction_id = models.BigIntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.symbol} x {self.quantity} ({self.portfolio.name})"
+    
+    class Meta:
+        unique_together = ('portfolio', 'symbol')
+        ordering = ['symbol']
+
+
+def import_file_storage():
+    """
+    Private storage for uploaded transaction files, never served from MEDIA_URL
+    A private GCS bucket when IMPORT_FILE_BUCKET is set, otherwise a local directory
+    """
+    bucket_name = getattr(settings, 'IMPORT_FILE_BUCKET', None)
+    if bucket_name:
+        from storages.backends.gcloud import GoogleCloudStorage
+        return GoogleCloudStorage(bucket_name=bucket_name, default_acl='private', querystring_auth=True)
+    return FileSystemStorage(location=getattr(settings, 'IMPORT_FILE_ROOT', None), base_url=None)
+
+
+class ImportJob(models.Model):
+    """
+    A transaction file uploaded for import in the background
+    The file is stored privately, processed in chunks by a worker that records
+    its progress here, and deleted once the job has finished
+    """
+    STATUS_PENDING = 'PENDING'
+    STATUS_RUNNING = 'RUNNING'
+    STATUS_COMPLETED = 'COMPLETED'
+    STATUS_FAILED = 'FAILED'
+    STATUSES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    
+    portfolio = models.ForeignKey(Portfolio, on_delete=models.CASCADE, related_name='import_jobs')
+    file = models.FileField(upload_to='imports/%Y/%m/', storage=import_file_storage)
+    original_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=STATUSES, default=STATUS_PENDING, db_index=True)
+    total_rows = models.PositiveIntegerField(null=True, blank=True)  # Known once the whole file is read
+    rows_processed = models.PositiveIntegerField(default=0)
+    total_bytes = models.PositiveBigIntegerField(null=True, blank=True)  # CSV size, progress is measured in bytes read
+    bytes_processed = models.PositiveBigIntegerField(default=0)
+    success_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)  # First errors only, see MAX_STORED_IMPORT_ERRORS
+    message = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Import of {self.original_name} into {self.portfolio.name} ({self.status})"
+    
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_COMPLETED, self.STATUS_FAILED)
+    
+    @property
+    def progress_percentage(self):
+        """Share of the CSV read (or of the rows processed), or None while the total is unknown"""
+        if self.is_finished:
+            return 100
+        if self.total_bytes:
+            return min(100, int(self.bytes_processed * 100 / self.total_bytes))
+        if not self.total_rows:
+            return None
+        return min(100, int(self.rows_processed * 100 / self.total_rows))
+    
+    class Meta:
+        ordering = ['-created_at']
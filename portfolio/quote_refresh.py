@@ -0,0 +1,289 @@
+import logging
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django_redis import get_redis_connection
+import redis
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUEUED = 'QUEUED'
+STATUS_RUNNING = 'RUNNING'
+STATUS_COMPLETED = 'COMPLETED'
+STATUS_FAILED = 'FAILED'
+
+# How long a refresh's status stays readable after it was queued
+QUOTE_REFRESH_STATUS_TIMEOUT = getattr(settings, 'QUOTE_REFRESH_STATUS_TIMEOUT', 60 * 60)
+QUOTE_REFRESH_MAX_WORKERS = getattr(settings, 'QUOTE_REFRESH_MAX_WORKERS', 2)
+# Seconds between batched flushes of symbols scheduled from page views
+QUOTE_REFRESH_BATCH_INTERVAL = getattr(settings, 'QUOTE_REFRESH_BATCH_INTERVAL', 10)
+
+PENDING_SET_KEY = 'quote_refresh:pending'  # Symbols waiting for the next batch
+NEXT_BATCH_KEY = 'quote_refresh:next_batch'  # Refresh id of the batch they will join
+IN_FLIGHT_KEY = 'quote_refresh:in_flight'  # Symbols being fetched, scored by when the claim lapses
+
+# Add the symbols (ARGV[1..]) that are neither pending nor in flight; returns those added
+_ADD_PENDING_SCRIPT = """
+local now = tonumber(redis.call('time')[1])
+local added = {}
+for _, symbol in ipairs(ARGV) do
+    local claimed_until = redis.call('zscore', KEYS[2], symbol)
+    if not (claimed_until and tonumber(claimed_until) > now) then
+        if redis.call('sadd', KEYS[1], symbol) == 1 then
+            table.insert(added, symbol)
+        end
+    end
+end
+return added
+"""
+
+# Close the batch (if it is still the current one) and move every pending symbol in flight
+# for at most ARGV[2] seconds, so a crashed flush can't hold its symbols forever
+_TAKE_BATCH_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    redis.call('del', KEYS[1])
+end
+local now = tonumber(redis.call('time')[1])
+redis.call('zremrangebyscore', KEYS[3], '-inf', now)
+local symbols = redis.call('smembers', KEYS[2])
+for _, symbol in ipairs(symbols) do
+    redis.call('zadd', KEYS[3], now + tonumber(ARGV[2]), symbol)
+end
+redis.call('del', KEYS[2])
+return symbols
+"""
+
+# Refresh ids are uuid4 hex strings
+_REFRESH_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+_local_executor = None
+_local_executor_lock = threading.Lock()
+
+
+def is_refresh_id(value):
+    """Whether a value has the form of the ids enqueue and schedule hand out"""
+    return isinstance(value, str) and _REFRESH_ID_PATTERN.fullmatch(value) is not None
+
+
+def _status_key(refresh_id):
+    return f"quote_refresh:{refresh_id}"
+
+
+def _save_status(refresh_id, status):
+    try:
+        cache.set(_status_key(refresh_id), status, QUOTE_REFRESH_STATUS_TIMEOUT)
+    except (redis.exceptions.RedisError, Exception) as e:
+        logger.warning(f"Redis error saving quote refresh {refresh_id}: {str(e)}")
+
+
+def get_refresh_status(refresh_id):
+    """Return the status dictionary of a queued refresh, or None if unknown or expired"""
+    try:
+        return cache.get(_status_key(refresh_id))
+    except (redis.exceptions.RedisError, Exception) as e:
+        logger.warning(f"Redis error reading quote refresh {refresh_id}: {str(e)}")
+        return None
+
+
+def _new_status(symbols, user=None):
+    return {
+        'status': STATUS_QUEUED,
+        'symbols': symbols,
+        'user_id': user.pk if user is not None else None,
+        'updated': 0,
+        'errors': 0,
+        'failed_symbols': [],
+        'message': '',
+        'queued_at': time.time(),
+    }
+
+
+def _update_status(refresh_id, **fields):
+    if not refresh_id:
+        return
+    status = get_refresh_status(refresh_id)
+    if status is None:
+        return
+    status.update(fields)
+    _save_status(refresh_id, status)
+
+
+def run_quote_refresh(symbols, refresh_id=None):
+    """
+    Refresh quotes for the given symbols and record the outcome under refresh_id
+    Only stale tiers are fetched (see StockDataService.refresh_multiple_stocks)
+    Returns a dictionary mapping symbols to success/failure status
+    """
+    from .services import StockDataService
+
+    _update_status(refresh_id, status=STATUS_RUNNING, started_at=time.time())
+    try:
+        results = StockDataService().refresh_multiple_stocks(symbols)
+    except Exception as e:
+        logger.error(f"Quote refresh {refresh_id} failed: {str(e)}")
+        _update_status(refresh_id, status=STATUS_FAILED, message=str(e), finished_at=time.time())
+        raise
+
+    updated = sum(1 for result in results.values() if result)
+    _update_status(
+        refresh_id,
+        status=STATUS_COMPLETED,
+        updated=updated,
+        errors=len(results) - updated,
+        failed_symbols=sorted(symbol for symbol, result in results.items() if not result),
+        finished_at=time.time(),
+    )
+    logger.info(f"Quote refresh {refresh_id} complete. Updated: {updated}, Errors: {len(results) - updated}")
+    return results
+
+
+def _get_local_executor():
+    global _local_executor
+    with _local_executor_lock:
+        if _local_executor is None:
+            _local_executor = ThreadPoolExecutor(
+                max_workers=QUOTE_REFRESH_MAX_WORKERS, thread_name_prefix='quote-refresh'
+            )
+        return _local_executor
+
+
+def _run_quote_refresh_locally(symbols, refresh_id):
+    try:
+        run_quote_refresh(symbols, refresh_id)
+    except Exception:
+        pass  # Already logged and recorded in the status
+    finally:
+        close_old_connections()
+
+
+def _backend():
+    from .tasks import CLOUD_TASKS_PROJECT
+
+    return getattr(settings, 'QUOTE_REFRESH_BACKEND', None) or ('cloud_tasks' if CLOUD_TASKS_PROJECT else 'local')
+
+
+def enqueue_quote_refresh(symbols, user=None, delay_seconds=0):
+    """
+    Queue a quote refresh for the given symbols and return immediately
+    Uses Cloud Tasks when QUOTE_REFRESH_BACKEND is 'cloud_tasks' (the default
+    when a project is configured), otherwise an in-process worker pool
+    Returns the refresh id to poll with get_refresh_status, or None if there
+    was nothing to refresh
+    """
+    from .tasks import refresh_stock_data
+
+    symbols = sorted({symbol.upper() for symbol in symbols if symbol})
+    if not symbols:
+        return None
+
+    refresh_id = uuid.uuid4().hex
+    _save_status(refresh_id, _new_status(symbols, user))
+
+    if _backend() == 'cloud_tasks':
+        if refresh_stock_data(symbols, delay_seconds=delay_seconds, refresh_id=refresh_id):
+            return refresh_id
+        logger.warning(f"Could not queue quote refresh {refresh_id} as a Cloud Task, running it locally")
+
+    _get_local_executor().submit(_run_quote_refresh_locally, symbols, refresh_id)
+    return refresh_id
+
+
+def schedule_quote_refresh(symbols, user=None):
+    """
+    Add expired symbols to the next batched refresh and return that batch's refresh id
+    Only symbols whose price is past its cache TTL (STOCK_PRICE_CACHE_TIMEOUT)
+    are considered, and those already pending or being fetched are skipped, so
+    repeated page views add nothing new. The first symbol of a batch schedules
+    its flush QUOTE_REFRESH_BATCH_INTERVAL seconds out, so queued work scales
+    with distinct expired symbols rather than page views.
+    Returns None when there is nothing new to wait for. Without Redis the
+    expired symbols are queued directly
+    """
+    from .services import StockDataService
+
+    service = StockDataService()
+    stale = service.stale_symbols((symbol for symbol in symbols if symbol), max_age=service.price_cache_timeout)
+    if not stale:
+        return None
+    if not service.redis_available:
+        return enqueue_quote_refresh(stale, user=user)
+
+    try:
+        connection = get_redis_connection('default')
+        batch_key = cache.make_key(NEXT_BATCH_KEY)
+        added = connection.eval(
+            _ADD_PENDING_SCRIPT, 2, cache.make_key(PENDING_SET_KEY), cache.make_key(IN_FLIGHT_KEY), *stale
+        )
+        if not added and not connection.scard(cache.make_key(PENDING_SET_KEY)):
+            return None  # All being fetched already, and nothing is waiting for a batch
+
+        batch_id = uuid.uuid4().hex
+        # Outlives a few flush intervals so a lost flush can't hold the batch open for long
+        marker_timeout = max(60, QUOTE_REFRESH_BATCH_INTERVAL * 6)
+        if connection.set(batch_key, batch_id, nx=True, ex=marker_timeout):
+            _save_status(batch_id, _new_status([]))
+            _dispatch_flush(batch_id)
+            return batch_id
+
+        current = connection.get(batch_key)
+        # A batch that closed meanwhile has already taken our symbols
+        return current.decode() if current else None
+    except (redis.exceptions.RedisError, Exception) as e:
+        logger.warning(f"Redis error scheduling quote refresh: {str(e)}")
+        return enqueue_quote_refresh(stale, user=user)
+
+
+def _dispatch_flush(batch_id):
+    from .tasks import flush_quote_refreshes
+
+    if _backend() == 'cloud_tasks':
+        if flush_quote_refreshes(batch_id, delay_seconds=QUOTE_REFRESH_BATCH_INTERVAL):
+            return
+        logger.warning(f"Could not queue quote refresh flush {batch_id} as a Cloud Task, running it locally")
+
+    timer = threading.Timer(
+        QUOTE_REFRESH_BATCH_INTERVAL, lambda: _get_local_executor().submit(_flush_quote_refreshes_locally, batch_id)
+    )
+    timer.daemon = True
+    timer.start()
+
+
+def _flush_quote_refreshes_locally(batch_id):
+    try:
+        flush_quote_refreshes(batch_id)
+    except Exception:
+        pass  # Already logged and recorded in the status
+    finally:
+        close_old_connections()
+
+
+def flush_quote_refreshes(batch_id):
+    """
+    Refresh every pending symbol as one batch recorded under batch_id
+    Closing the batch and taking its symbols is one atomic step, so symbols
+    scheduled meanwhile go either into this batch or into the next one
+    """
+    connection = get_redis_connection('default')
+    in_flight_key = cache.make_key(IN_FLIGHT_KEY)
+    taken = connection.eval(
+        _TAKE_BATCH_SCRIPT, 3, cache.make_key(NEXT_BATCH_KEY), cache.make_key(PENDING_SET_KEY), in_flight_key,
+        batch_id, QUOTE_REFRESH_STATUS_TIMEOUT
+    )
+    symbols = sorted(symbol.decode() if isinstance(symbol, bytes) else symbol for symbol in taken)
+    logger.info(f"Flushing quote refresh batch {batch_id} with {len(symbols)} symbols")
+
+    _update_status(batch_id, symbols=symbols)
+    try:
+        return run_quote_refresh(symbols, batch_id)
+    finally:
+        if symbols:
+            try:
+                connection.zrem(in_flight_key, *symbols)
+            except (redis.exceptions.RedisError, Exception) as e:
+                logger.warning(f"Redis error releasing quote refresh batch {batch_id}: {str(e)}")
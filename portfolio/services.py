@@ -1,22 +1,49 @@
 import logging
-import json
+import time
 from decimal import Decimal
 from django.core.cache import cache
 from django.conf import settings
 import redis
 import datetime
-import time
-from functools import lru_cache
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.db import close_old_connections
+from django_redis import get_redis_connection
 
-from .api import fetch_stock_data, StockAPIError
+from .api import fetch_many, fetch_stock_quote, fetch_company_overview, StockAPIError, RateLimitDeadlineError
+from .codec import (
+    CodecError, encode_price, decode_price, encode_fundamentals, decode_fundamentals, record_timestamp
+)
 from .models import Stock
+from .freshness import FreshnessTracker
+from .memory_cache import LocalCache, FRESH, STALE
+from .singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
-# In-memory cache when Redis is unavailable
-MEMORY_CACHE = {}
-MEMORY_CACHE_TIMESTAMPS = {}
-MEMORY_CACHE_TIMEOUT = 60 * 15  # 15 minutes
+# Process-wide L1 cache in front of Redis, and the only cache when Redis is unavailable.
+# Expired entries stay servable for STOCK_LOCAL_CACHE_STALE_TTL while a background refresh runs.
+LOCAL_CACHE = LocalCache(
+    max_entries=getattr(settings, 'STOCK_LOCAL_CACHE_MAX_ENTRIES', 2048),
+    default_ttl=getattr(settings, 'STOCK_LOCAL_CACHE_TTL', 60),
+    stale_ttl=getattr(settings, 'STOCK_LOCAL_CACHE_STALE_TTL', 60 * 15),
+)
+
+# Background refreshes of entries served stale
+_revalidation_executor = None
+_revalidating = set()
+_revalidation_lock = threading.Lock()
+
+# Cache tiers, stored as fields of the Redis hash stock:{SYMBOL}
+# Prices change constantly; company name, 52-week range, P/E and yield change at most daily
+PRICE_TIER = 'price'
+FUNDAMENTALS_TIER = 'full'
+
+# Packed binary encoding of each tier's record (see portfolio.codec)
+TIER_CODECS = {
+    PRICE_TIER: (encode_price, decode_price),
+    FUNDAMENTALS_TIER: (encode_fundamentals, decode_fundamentals),
+}
 
 class StockDataService:
     """
@@ -27,9 +54,18 @@ class StockDataService:
     def __init__(self):
         self.price_cache_timeout = getattr(settings, 'STOCK_PRICE_CACHE_TIMEOUT', 60 * 15)  # 15 minutes default
         self.details_cache_timeout = getattr(settings, 'STOCK_DETAILS_CACHE_TIMEOUT', 60 * 60 * 24)  # 24 hours default
+        # Prices fetched within this many seconds are not re-fetched by refresh_multiple_stocks
+        self.price_freshness = getattr(settings, 'STOCK_PRICE_FRESHNESS', 60 * 5)
+        # Page views wait at most this many seconds for API rate limit slots, then serve cached or default data
+        self.fetch_deadline = getattr(settings, 'STOCK_FETCH_DEADLINE', 5)
         self.redis_available = self._check_redis_connection()
-        # Track which symbols we're currently fetching to prevent duplicate calls
-        self.currently_fetching = set()
+        self.freshness = FreshnessTracker(use_redis=self.redis_available, retention=self.details_cache_timeout)
+        # Coalesce concurrent fetches of the same symbol across threads, workers and instances
+        self.single_flight = SingleFlight(
+            use_redis=self.redis_available,
+            lock_timeout=getattr(settings, 'STOCK_FETCH_LOCK_TIMEOUT', 60),
+            wait_timeout=getattr(settings, 'STOCK_FETCH_WAIT_TIMEOUT', 10),
+        )
     
     def _check_redis_connection(self):
         """Check if Redis is available"""
@@ -44,64 +80,259 @@ class StockDataService:
         """Generate a consistent cache key for stock data"""
         return f"stock:{symbol.upper()}:{data_type}"
     
-    def _get_from_memory_cache(self, symbol):
-        """Get data from memory cache if valid"""
-        current_time = time.time()
-        timestamp = MEMORY_CACHE_TIMESTAMPS.get(symbol)
-        
-        if symbol in MEMORY_CACHE and timestamp and (current_time - timestamp) < MEMORY_CACHE_TIMEOUT:
-            logger.debug(f"Memory cache hit for {symbol}")
-            return MEMORY_CACHE.get(symbol)
-        return None
+    def get_hash_key(self, symbol):
+        """Generate the raw Redis key of the hash holding a symbol's tiers"""
+        return cache.make_key(f"stock:{symbol.upper()}")
+    
+    def _tier_timeout(self, tier):
+        """How long a tier's record stays valid after it was fetched"""
+        return self.price_cache_timeout if tier == PRICE_TIER else self.details_cache_timeout
+    
+    def _local_ttl(self, tier):
+        """
+        How long a tier stays fresh in the local cache
+        With Redis as the shared source of truth the local copy is kept short so
+        workers converge quickly; without Redis it lives as long as the tier
+        """
+        tier_timeout = self._tier_timeout(tier)
+        if not self.redis_available:
+            return tier_timeout
+        return min(LOCAL_CACHE.default_ttl, tier_timeout)
+    
+    def _get_from_memory_cache(self, key, allow_stale=False):
+        """Get data from the local cache if fresh (or stale, when allowed)"""
+        return LOCAL_CACHE.get(key, allow_stale=allow_stale)
         
-    def _set_in_memory_cache(self, symbol, data):
-        """Store data in memory cache with timestamp"""
-        MEMORY_CACHE[symbol] = data
-        MEMORY_CACHE_TIMESTAMPS[symbol] = time.time()
-        logger.debug(f"Stored {symbol} in memory cache")
+    def _set_in_memory_cache(self, key, data, tier):
+        """Store data in the local cache with the tier's local TTL"""
+        LOCAL_CACHE.set(key, data, self._local_ttl(tier))
+        logger.debug(f"Stored {key} in memory cache")
     
-    def get_stock_data(self, symbol):
+    def _get_tiers_from_cache(self, symbols, tiers=(PRICE_TIER, FUNDAMENTALS_TIER), allow_stale=True):
         """
-        Get stock data from cache or API
-        Returns a dictionary with stock information
+        Look up the price and fundamentals records of several symbols without calling the API
+        The local cache is checked first; whatever it doesn't hold fresh is read from
+        the Redis hashes in one pipelined round trip and copied into the local cache.
+        Only the requested tier fields are fetched, so price-only reads skip fundamentals.
+        Keys missing from Redis but still inside the local stale window are served
+        stale (if allow_stale) and refreshed in the background
+        Returns {symbol: {PRICE_TIER: record or None, FUNDAMENTALS_TIER: record or None}}
         """
-        symbol = symbol.upper()
+        requested_tiers = tiers
+        tiers = {symbol: {PRICE_TIER: None, FUNDAMENTALS_TIER: None} for symbol in symbols}
         
-        # Check if another thread/request is already fetching this symbol
-        if symbol in self.currently_fetching:
-            logger.info(f"Already fetching {symbol}, using default data")
-            # Return basic data while it's being fetched
-            return self._get_default_stock_data(symbol)
+        pending = {}
+        stale_records = {}
+        for symbol in symbols:
+            for tier in requested_tiers:
+                cache_key = self.get_cache_key(symbol, tier)
+                record, state = LOCAL_CACHE.lookup(cache_key)
+                if state == FRESH:
+                    tiers[symbol][tier] = record
+                    continue
+                pending[cache_key] = (symbol, tier)
+                if state == STALE:
+                    stale_records[cache_key] = record
         
-        # Try to get from Redis cache
-        if self.redis_available:
+        if self.redis_available and pending:
             try:
-                cache_key = self.get_cache_key(symbol)
-                cached_data = cache.get(cache_key)
-                if cached_data:
-                    logger.debug(f"Redis cache hit for {symbol}")
-                    return json.loads(cached_data)
-            except (redis.exceptions.RedisError, json.JSONDecodeError, Exception) as e:
-                logger.warning(f"Redis error when getting {symbol}: {str(e)}")
+                for cache_key, record in self._read_tier_records(pending.values()).items():
+                    symbol, tier = pending[cache_key]
+                    tiers[symbol][tier] = record
+                    # Read-through: keep a local copy for the next lookups
+                    self._set_in_memory_cache(cache_key, record, tier)
+            except (redis.exceptions.RedisError, Exception) as e:
+                logger.warning(f"Redis error when getting {len(symbols)} symbols: {str(e)}")
+        
+        if allow_stale:
+            # Stale-while-revalidate for whatever neither cache had fresh
+            revalidate = []
+            for cache_key, record in stale_records.items():
+                symbol, tier = pending[cache_key]
+                if tiers[symbol][tier] is None:
+                    tiers[symbol][tier] = record
+                    revalidate.append((symbol, tier))
+            if revalidate:
+                _schedule_revalidation(revalidate)
+        
+        return tiers
+    
+    def _read_tier_records(self, symbol_tiers):
+        """
+        Read (symbol, tier) records from the Redis hashes with one pipelined HMGET per symbol
+        Records older than their tier timeout, or that fail to decode, are treated as misses
+        Returns {cache key: record} for the hits
+        """
+        fields_by_symbol = {}
+        for symbol, tier in symbol_tiers:
+            fields_by_symbol.setdefault(symbol, []).append(tier)
+        
+        pipeline = get_redis_connection('default').pipeline(transaction=False)
+        for symbol, fields in fields_by_symbol.items():
+            pipeline.hmget(self.get_hash_key(symbol), fields)
+        
+        now = time.time()
+        records = {}
+        for (symbol, fields), payloads in zip(fields_by_symbol.items(), pipeline.execute()):
+            for tier, payload in zip(fields, payloads):
+                if payload is None:
+                    continue
+                try:
+                    record = TIER_CODECS[tier][1](payload)
+                except (CodecError, UnicodeDecodeError) as e:
+                    logger.warning(f"Invalid cached {tier} data for {symbol}: {str(e)}")
+                    continue
+                if now - record_timestamp(record) >= self._tier_timeout(tier):
+                    continue
+                records[self.get_cache_key(symbol, tier)] = record
         
-        # Try in-memory cache if Redis failed or is unavailable
-        memory_cached_data = self._get_from_memory_cache(symbol)
-        if memory_cached_data:
-            return memory_cached_data
+        logger.debug(f"Redis cache hits for {len(records)} of {len(symbol_tiers)} keys")
+        return records
+    
+    def _merge_tiers(self, symbol, price_record, fundamentals_record):
+        """Combine the two cached tiers into the flat stock data dictionary callers expect"""
+        stock_data = {
+            'symbol': symbol,
+            'company_name': symbol,
+            'current_price': 0.0,
+            'day_change': 0.0,
+            'day_change_percentage': 0.0,
+            'fifty_two_week_high': None,
+            'fifty_two_week_low': None,
+            'pe_ratio': None,
+            'dividend_yield': None,
+        }
+        stock_data.update(fundamentals_record or {})
+        # The price tier is fresher, so it wins over any price left in an older full record
+        stock_data.update(price_record or {})
+        return stock_data
+    
+    def _get_many_from_cache(self, symbols):
+        """
+        Look up several symbols in the caches without calling the API
+        Returns a dictionary mapping symbol to stock data for every symbol
+        whose price and fundamentals are both cached
+        """
+        tiers = self._get_tiers_from_cache(symbols)
+        return {
+            symbol: self._merge_tiers(symbol, records[PRICE_TIER], records[FUNDAMENTALS_TIER])
+            for symbol, records in tiers.items()
+            if records[PRICE_TIER] is not None and records[FUNDAMENTALS_TIER] is not None
+        }
+    
+    def _refresh_stale_tiers(self, stale_pairs, deadline=None):
+        """
+        Fetch the given (symbol, tier) pairs and nothing else
+        Prices and fundamentals are refreshed independently, so a symbol whose
+        fundamentals are still cached costs a single quote call.
+        Each (symbol, tier) is fetched under a single-flight lock: if another
+        thread, worker or instance is already fetching it, we wait for its
+        result instead of calling the API again. With a deadline (a
+        time.monotonic() value), calls that can't get a rate limit slot before
+        it are skipped and waits on other callers' fetches stop there, so both
+        fall back to cached or default data
+        Returns {symbol: {tier: record}} for the pairs that were fetched or waited for
+        """
+        fetched = {}
+        for tier, refresh in ((PRICE_TIER, self.refresh_price_data),
+                              (FUNDAMENTALS_TIER, self.refresh_fundamentals_data)):
+            stale = list(dict.fromkeys(symbol for symbol, stale_tier in stale_pairs if stale_tier == tier))
+            if not stale:
+                continue
             
-        # If we get here, need to fetch from API
-        logger.info(f"Getting data for {symbol} directly from API")
+            leaders = {}
+            followers = []
+            for symbol in stale:
+                token = self.single_flight.acquire(self.get_cache_key(symbol, tier))
+                if token:
+                    leaders[symbol] = token
+                else:
+                    followers.append(symbol)
+            
+            if leaders:
+                logger.info(f"Getting {tier} data for {', '.join(leaders)} directly from API")
+                lock_tokens = {self.get_cache_key(symbol, tier): token for symbol, token in leaders.items()}
+                try:
+                    # A rate-limited batch can outlast lock_timeout, so the locks are renewed until it ends
+                    with self.single_flight.keep_alive(lock_tokens):
+                        for symbol, record in refresh(list(leaders), deadline=deadline).items():
+                            fetched.setdefault(symbol, {})[tier] = record
+                finally:
+                    # Results are cached before the locks are released, so waiters find them
+                    for symbol, token in leaders.items():
+                        self.single_flight.release(self.get_cache_key(symbol, tier), token)
+            
+            if followers:
+                logger.info(f"Waiting for in-flight {tier} fetches of {', '.join(followers)}")
+                for symbol, record in self._wait_for_tier(followers, tier, deadline=deadline).items():
+                    fetched.setdefault(symbol, {})[tier] = record
         
-        # Add to currently fetching set
-        self.currently_fetching.add(symbol)
-        try:
-            return self.refresh_stock_data(symbol)
-        finally:
-            # Always remove from currently fetching set, even if an error occurred
-            self.currently_fetching.discard(symbol)
+        return fetched
     
-    def _get_default_stock_data(self, symbol):
-        """Return default stock data for a symbol"""
+    def _wait_for_tier(self, symbols, tier, deadline=None):
+        """
+        Wait for another caller's in-flight fetch of one tier to land in the cache
+        Gives up at `deadline` when one is given, like the rate-limited fetches
+        """
+        keys = {self.get_cache_key(symbol, tier): symbol for symbol in symbols}
+        
+        def lookup(pending_keys):
+            pending_symbols = [keys[key] for key in pending_keys]
+            found = self._get_tiers_from_cache(pending_symbols, tiers=(tier,), allow_stale=False)
+            return {
+                self.get_cache_key(symbol, tier): records[tier]
+                for symbol, records in found.items() if records[tier] is not None
+            }
+        
+        results = self.single_flight.wait(list(keys), lookup, deadline=deadline)
+        return {keys[key]: record for key, record in results.items()}
+    
+    def get_stock_data(self, symbol):
+        """
+        Get stock data from cache or API
+        Returns a dictionary with stock information
+        """
+        return self.get_stock_data_many([symbol])[symbol.upper()]
+    
+    def get_stock_data_many(self, symbols):
+        """
+        Get stock data for several symbols at once
+        Cached symbols cost one Redis round trip in total; only the tiers
+        missing from both caches are fetched from the API
+        Returns a dictionary mapping each (upper-cased) symbol to its stock data
+        """
+        # De-duplicate while keeping the caller's order
+        symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+        
+        # Serving a page must not queue behind the API rate limit for long
+        deadline = time.monotonic() + self.fetch_deadline
+        tiers = self._get_tiers_from_cache(symbols)
+        missing = [
+            (symbol, tier) for symbol, records in tiers.items()
+            for tier in (PRICE_TIER, FUNDAMENTALS_TIER) if records[tier] is None
+        ]
+        for symbol, records in self._refresh_stale_tiers(missing, deadline=deadline).items():
+            tiers[symbol].update(records)
+        
+        results = {}
+        for symbol in symbols:
+            fundamentals_record = tiers[symbol][FUNDAMENTALS_TIER]
+            if fundamentals_record is None:
+                fundamentals_record = self._get_default_fundamentals(symbol)
+            results[symbol] = self._merge_tiers(symbol, tiers[symbol][PRICE_TIER], fundamentals_record)
+        return results
+    
+    def _get_default_price(self):
+        """Return default price data for a symbol"""
+        return {
+            'current_price': 0.0,
+            'day_change': 0.0,
+            'day_change_percentage': 0.0,
+            'last_updated': str(int(datetime.datetime.now().timestamp()))
+        }
+    
+    def _get_default_fundamentals(self, symbol):
+        """Return default fundamentals for a symbol"""
         # Try to get stock from database for basic info
         stock = Stock.objects.filter(symbol=symbol).first()
         name = stock.name if stock else symbol
@@ -109,22 +340,84 @@ class StockDataService:
         return {
             'symbol': symbol,
             'company_name': name,
-            'current_price': 0.0,
-            'day_change': 0.0,
-            'day_change_percentage': 0.0,
-            'last_updated': str(int(datetime.datetime.now().timestamp()))
         }
     
+    def _get_default_stock_data(self, symbol):
+        """Return default stock data for a symbol"""
+        return self._merge_tiers(symbol, self._get_default_price(), self._get_default_fundamentals(symbol))
+    
     def refresh_stock_data(self, symbol):
         """
-        Fetch fresh stock data from the API and update cache
+        Fetch fresh stock data (price and fundamentals) from the API and update cache
         Returns the fetched data
         """
-        symbol = symbol.upper()
+        return self.refresh_many_stock_data([symbol], refresh_fundamentals=True)[symbol.upper()]
+    
+    def refresh_many_stock_data(self, symbols, refresh_fundamentals=False):
+        """
+        Fetch fresh prices for several symbols concurrently and update cache
+        Fundamentals are only re-fetched when their tier has expired, unless
+        refresh_fundamentals is set
+        Returns a dictionary mapping symbol to the merged stock data
+        """
+        symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
         
-        try:
-            # Fetch from API
-            price, company_name, additional_data = fetch_stock_data(symbol)
+        if refresh_fundamentals:
+            fundamentals = self.refresh_fundamentals_data(symbols)
+        else:
+            tiers = self._get_tiers_from_cache(symbols)
+            fundamentals = {symbol: records[FUNDAMENTALS_TIER] for symbol, records in tiers.items()}
+            stale = [symbol for symbol, record in fundamentals.items() if record is None]
+            fundamentals.update(self.refresh_fundamentals_data(stale))
+        prices = self.refresh_price_data(symbols)
+        
+        return {
+            symbol: self._merge_tiers(symbol, prices[symbol], fundamentals[symbol])
+            for symbol in symbols
+        }
+    
+    def refresh_price_data(self, symbols, deadline=None):
+        """
+        Fetch fresh quotes (one API call per symbol) and update the price tier
+        Returns a dictionary mapping symbol to its price record
+        """
+        records = {}
+        if not symbols:
+            return records
+        
+        fetched = {}
+        for symbol, outcome in fetch_many(fetch_stock_quote, symbols, deadline=deadline).items():
+            if isinstance(outcome, StockAPIError):
+                records[symbol] = self._handle_api_error(symbol, PRICE_TIER, outcome)
+                continue
+            
+            price, quote_data = outcome
+            records[symbol] = fetched[symbol] = {
+                'current_price': float(price),  # Convert Decimal to float for JSON serialization
+                'day_change': float(quote_data.get('day_change', 0)),
+                'day_change_percentage': float(quote_data.get('day_change_percentage', 0)),
+                'last_updated': str(int(datetime.datetime.now().timestamp()))
+            }
+        
+        self._store_tier(PRICE_TIER, fetched)
+        return records
+    
+    def refresh_fundamentals_data(self, symbols, deadline=None):
+        """
+        Fetch company overviews (one API call per symbol) and update the fundamentals tier
+        Returns a dictionary mapping symbol to its fundamentals record
+        """
+        records = {}
+        if not symbols:
+            return records
+        
+        fetched = {}
+        for symbol, outcome in fetch_many(fetch_company_overview, symbols, deadline=deadline).items():
+            if isinstance(outcome, StockAPIError):
+                records[symbol] = self._handle_api_error(symbol, FUNDAMENTALS_TIER, outcome)
+                continue
+            
+            company_name, fundamentals = outcome
             
             # Update or create the basic stock record in database
             stock, created = Stock.objects.get_or_create(symbol=symbol)
@@ -132,132 +425,125 @@ class StockDataService:
                 stock.name = company_name
                 stock.save()
             
-            # Prepare the full data
-            stock_data = {
+            records[symbol] = fetched[symbol] = {
                 'symbol': symbol,
                 'company_name': company_name,
-                'current_price': float(price),  # Convert Decimal to float for JSON serialization
-                'day_change': float(additional_data.get('day_change', 0)),
-                'day_change_percentage': float(additional_data.get('day_change_percentage', 0)),
-                'fifty_two_week_high': float(additional_data['fifty_two_week_high']) if additional_data.get('fifty_two_week_high') else None,
-                'fifty_two_week_low': float(additional_data['fifty_two_week_low']) if additional_data.get('fifty_two_week_low') else None,
-                'pe_ratio': float(additional_data['pe_ratio']) if additional_data.get('pe_ratio') else None,
-                'dividend_yield': float(additional_data['dividend_yield']) if additional_data.get('dividend_yield') else None,
-                'last_updated': str(int(datetime.datetime.now().timestamp()))
+                'fifty_two_week_high': float(fundamentals['fifty_two_week_high']) if fundamentals.get('fifty_two_week_high') else None,
+                'fifty_two_week_low': float(fundamentals['fifty_two_week_low']) if fundamentals.get('fifty_two_week_low') else None,
+                'pe_ratio': float(fundamentals['pe_ratio']) if fundamentals.get('pe_ratio') else None,
+                'dividend_yield': float(fundamentals['dividend_yield']) if fundamentals.get('dividend_yield') else None,
+                'fundamentals_updated': str(int(datetime.datetime.now().timestamp()))
             }
-            
-            # Store in memory cache
-            self._set_in_memory_cache(symbol, stock_data)
-            
-            # Cache the data if Redis is available
-            if self.redis_available:
-                try:
-                    cache_key = self.get_cache_key(symbol)
-                    price_key = self.get_cache_key(symbol, 'price')
-                    
-                    # Extract just the price for shorter cache time
-                    price_data = {
-                        'current_price': float(price),
-                        'day_change': float(additional_data.get('day_change', 0)),
-                        'day_change_percentage': float(additional_data.get('day_change_percentage', 0)),
-                    }
-                    
-                    # Cache the data
-                    cache.set(cache_key, json.dumps(stock_data), self.details_cache_timeout)
-                    cache.set(price_key, json.dumps(price_data), self.price_cache_timeout)
-                    logger.info(f"Updated Redis cache for {symbol}")
-                except (redis.exceptions.RedisError, Exception) as e:
-                    logger.warning(f"Failed to cache data in Redis for {symbol}: {str(e)}")
-            
-            return stock_data
-            
-        except StockAPIError as e:
-            logger.error(f"API error for {symbol}: {str(e)}")
-            
-            # Check if this is a rate limit error
-            if "rate limit" in str(e).lower():
-                logger.warning(f"Rate limit hit for {symbol}, using cached or default data")
-                
-                # Try Redis cache first (even if expired)
-                if self.redis_available:
-                    try:
-                        cache_key = self.get_cache_key(symbol)
-                        expired_data = cache.get(cache_key, None)
-                        if expired_data:
-                            logger.info(f"Using expired Redis data for {symbol}")
-                            return json.loads(expired_data)
-                    except (redis.exceptions.RedisError, json.JSONDecodeError, Exception) as e:
-                        logger.warning(f"Failed to get expired data from Redis for {symbol}: {str(e)}")
-                
-                # Then try memory cache
-                memory_cached_data = self._get_from_memory_cache(symbol)
-                if memory_cached_data:
-                    logger.info(f"Using memory cached data for {symbol}")
-                    return memory_cached_data
-            
-            # Return default data if all else fails
-            default_data = self._get_default_stock_data(symbol)
-            # Save to memory cache so we don't repeatedly hit the API
-            self._set_in_memory_cache(symbol, default_data)
-            return default_data
+        
+        self._store_tier(FUNDAMENTALS_TIER, fetched)
+        return records
     
-    # Add a cache decorator to prevent duplicate calls to the same symbols
-    @lru_cache(maxsize=100)
-    def refresh_multiple_stocks_cached(self, symbols_tuple):
-        """Cached version to prevent duplicate API calls for the same symbols"""
-        symbols = list(symbols_tuple)
-        results = {}
+    def _store_tier(self, tier, records):
+        """
+        Write freshly fetched records of one tier to the memory cache and Redis
+        Each record is packed into its symbol's hash; the hash lives as long as the
+        longest tier, and each record's own timestamp bounds how long it is served
+        """
+        if not records:
+            return
         
-        # First try to get from caches without API calls
-        for symbol in symbols:
-            symbol = symbol.upper()
-            # Skip if already being fetched
-            if symbol in self.currently_fetching:
-                logger.info(f"Skipping {symbol} as it's already being fetched")
-                results[symbol] = False
-                continue
-                
-            data = None
-            # Try Redis first
-            if self.redis_available:
-                try:
-                    cache_key = self.get_cache_key(symbol)
-                    cached_data = cache.get(cache_key)
-                    if cached_data:
-                        logger.debug(f"Using Redis cached data for {symbol}")
-                        data = json.loads(cached_data)
-                        results[symbol] = True
-                        continue
-                except Exception:
-                    pass
-                    
-            # Then try memory cache
-            memory_data = self._get_from_memory_cache(symbol)
-            if memory_data:
-                logger.debug(f"Using memory cached data for {symbol}")
-                results[symbol] = True
-                continue
-                
-            # If not cached, we need to fetch
+        mapping = {self.get_cache_key(symbol, tier): record for symbol, record in records.items()}
+        
+        # Write-through: local cache first, then Redis
+        for cache_key, record in mapping.items():
+            self._set_in_memory_cache(cache_key, record, tier)
+        
+        # Cache the data if Redis is available
+        if self.redis_available:
             try:
-                self.currently_fetching.add(symbol)
-                self.refresh_stock_data(symbol)
-                results[symbol] = True
-            except Exception as e:
-                logger.error(f"Error refreshing {symbol}: {str(e)}")
-                results[symbol] = False
-            finally:
-                self.currently_fetching.discard(symbol)
-                
-        return results
+                encode = TIER_CODECS[tier][0]
+                pipeline = get_redis_connection('default').pipeline(transaction=False)
+                for symbol, record in records.items():
+                    hash_key = self.get_hash_key(symbol)
+                    pipeline.hset(hash_key, tier, encode(record))
+                    pipeline.expire(hash_key, self.details_cache_timeout)
+                pipeline.execute()
+                logger.info(f"Updated Redis {tier} cache for {', '.join(records)}")
+            except (redis.exceptions.RedisError, Exception) as e:
+                logger.warning(f"Failed to cache {tier} data in Redis: {str(e)}")
+        
+        self.freshness.mark_fresh(records, tier)
+    
+    def _handle_api_error(self, symbol, tier, error):
+        """Fall back to cached or default data for one tier after an API error"""
+        logger.error(f"API error for {symbol} ({tier}): {str(error)}")
+        cache_key = self.get_cache_key(symbol, tier)
+        
+        # Check if this is a rate limit error
+        if "rate limit" in str(error).lower():
+            logger.warning(f"Rate limit hit for {symbol}, using cached or default data")
+            
+            memory_cached_data = self._get_from_memory_cache(cache_key, allow_stale=True)
+            if memory_cached_data:
+                logger.info(f"Using memory cached {tier} data for {symbol}")
+                return memory_cached_data
         
-    def refresh_multiple_stocks(self, symbols):
+        # Return default data if all else fails
+        if tier == PRICE_TIER:
+            default_data = self._get_default_price()
+        else:
+            default_data = self._get_default_fundamentals(symbol)
+        # Save to memory cache so we don't repeatedly hit the API; a call skipped
+        # at its deadline never reached the API, so the next request may try again
+        if not isinstance(error, RateLimitDeadlineError):
+            self._set_in_memory_cache(cache_key, default_data, tier)
+        return default_data
+    
+    def _freshness_thresholds(self, max_age=None):
+        """Seconds after which each tier counts as stale"""
+        return {
+            PRICE_TIER: self.price_freshness if max_age is None else max_age,
+            FUNDAMENTALS_TIER: self.details_cache_timeout,
+        }
+    
+    def stale_symbols(self, symbols, max_age=None):
+        """Return the symbols with any tier older than its freshness threshold, in input order"""
+        symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+        stale = set()
+        for tier, threshold in self._freshness_thresholds(max_age).items():
+            stale.update(self.freshness.stale_symbols(symbols, tier, threshold))
+        return [symbol for symbol in symbols if symbol in stale]
+    
+    def refresh_multiple_stocks(self, symbols, max_age=None):
         """
         Refresh data for multiple stocks
+        Only tiers last fetched longer ago than their freshness threshold are
+        re-fetched (max_age overrides the price threshold), however the symbols
+        are grouped or ordered across requests
         Returns a dictionary mapping symbols to success/failure status
         """
-        # Convert list to tuple for caching
-        return self.refresh_multiple_stocks_cached(tuple(symbols))
+        symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+        if not symbols:
+            return {}
+        
+        thresholds = self._freshness_thresholds(max_age)
+        stale = {
+            tier: self.freshness.stale_symbols(symbols, tier, max_age)
+            for tier, max_age in thresholds.items()
+        }
+        
+        # Fetch only the stale tiers, concurrently and within the API rate limit;
+        # symbols another caller is already fetching are waited for, not re-fetched
+        stale_pairs = [(symbol, tier) for tier, stale_symbols in stale.items() for symbol in stale_symbols]
+        if stale_pairs:
+            logger.info(f"Refreshing {len(stale_pairs)} stale tiers for {len(symbols)} symbols")
+            try:
+                self._refresh_stale_tiers(stale_pairs)
+            except Exception as e:
+                logger.error(f"Error refreshing {len(stale_pairs)} stale tiers: {str(e)}")
+        
+        # A symbol succeeded if all its tiers are fresh now, whoever fetched them
+        failed = set()
+        for tier, stale_symbols in stale.items():
+            if stale_symbols:
+                failed.update(self.freshness.stale_symbols(stale_symbols, tier, thresholds[tier]))
+        
+        return {symbol: symbol not in failed for symbol in symbols}
     
     def clear_cache(self, symbol=None):
         """
@@ -266,14 +552,11 @@ class StockDataService:
         # Clear memory cache
         if symbol:
             symbol = symbol.upper()
-            if symbol in MEMORY_CACHE:
-                del MEMORY_CACHE[symbol]
-                if symbol in MEMORY_CACHE_TIMESTAMPS:
-                    del MEMORY_CACHE_TIMESTAMPS[symbol]
-                logger.info(f"Cleared memory cache for {symbol}")
+            for tier in (PRICE_TIER, FUNDAMENTALS_TIER):
+                LOCAL_CACHE.delete(self.get_cache_key(symbol, tier))
+            logger.info(f"Cleared memory cache for {symbol}")
         else:
-            MEMORY_CACHE.clear()
-            MEMORY_CACHE_TIMESTAMPS.clear()
+            LOCAL_CACHE.clear()
             logger.info("Cleared all memory cache")
             
         # Clear Redis cache if available
@@ -281,8 +564,7 @@ class StockDataService:
             try:
                 if symbol:
                     symbol = symbol.upper()
-                    cache.delete(self.get_cache_key(symbol))
-                    cache.delete(self.get_cache_key(symbol, 'price'))
+                    get_redis_connection('default').delete(self.get_hash_key(symbol))
                     logger.info(f"Cleared Redis cache for {symbol}")
                 else:
                     # This is a simplistic approach. In production, you'd want a more targeted way
@@ -292,5 +574,46 @@ class StockDataService:
             except (redis.exceptions.RedisError, Exception) as e:
                 logger.warning(f"Error clearing Redis cache: {str(e)}")
                 
-        # Clear the function cache
-        self.refresh_multiple_stocks_cached.cache_clear() 
\ No newline at end of file
+        # Forget refresh times so the next refresh re-fetches
+        if symbol:
+            self.freshness.clear([symbol], (PRICE_TIER, FUNDAMENTALS_TIER))
+        else:
+            self.freshness.clear_local()
+    
+    def get_cache_stats(self):
+        """Return local cache hit/miss/eviction statistics and the Redis status"""
+        stats = LOCAL_CACHE.stats()
+        stats['redis_available'] = self.redis_available
+        return stats
+
+
+def _get_revalidation_executor():
+    global _revalidation_executor
+    with _revalidation_lock:
+        if _revalidation_executor is None:
+            _revalidation_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='stock-revalidate')
+        return _revalidation_executor
+
+
+def _schedule_revalidation(stale_tiers):
+    """Queue a background refresh of (symbol, tier) pairs that were served stale"""
+    with _revalidation_lock:
+        queued = [key for key in stale_tiers if key not in _revalidating]
+        _revalidating.update(queued)
+    if queued:
+        logger.info(f"Serving stale data, revalidating {len(queued)} cache entries in the background")
+        _get_revalidation_executor().submit(_revalidate, queued)
+
+
+def _revalidate(stale_tiers):
+    """Refresh the given (symbol, tier) pairs; runs on the revalidation thread"""
+    try:
+        service = StockDataService()
+        service._refresh_stale_tiers(stale_tiers)
+    except Exception as e:
+        logger.error(f"Background revalidation failed: {str(e)}")
+    finally:
+        with _revalidation_lock:
+            _revalidating.difference_update(stale_tiers)
+        close_old_connections()
+ 
\ No newline at end of file
@@ -0,0 +1,58 @@
+# In portfolio/signals.py
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import Transaction
+from .holdings import record_transaction, rebuild_symbol_position
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _clear_cached_snapshot(instance):
+    """Drop the holdings snapshot of the portfolio cached on this transaction, if any"""
+    if Transaction.portfolio.is_cached(instance):
+        instance.portfolio.clear_holdings_snapshot()
+
+
+@receiver(pre_save, sender=Transaction)
+def remember_previous_position(sender, instance, raw=False, **kwargs):
+    """
+    Remember which position an edited transaction belonged to before the save,
+    so a changed symbol or portfolio also rebuilds the position it moved out of
+    """
+    instance._previous_position_key = None
+    if raw or not instance.pk:
+        return
+    instance._previous_position_key = Transaction.objects.filter(pk=instance.pk).values_list(
+        'portfolio_id', 'stock_symbol'
+    ).first()
+
+
+@receiver(post_save, sender=Transaction)
+def update_position_on_save(sender, instance, created, raw=False, **kwargs):
+    """Keep the materialized Position table in step with Transaction writes"""
+    # Bulk writers (e.g. imports) set this flag and rebuild the positions once at the end
+    if raw or getattr(instance, '_skip_position_update', False):
+        return
+
+    if created:
+        record_transaction(instance)
+    else:
+        # Edits can change quantity, price or date, so replay that symbol's ledger
+        rebuild_symbol_position(instance.portfolio_id, instance.stock_symbol)
+        previous_key = getattr(instance, '_previous_position_key', None)
+        if previous_key and previous_key != (instance.portfolio_id, instance.stock_symbol):
+            logger.debug(f"Transaction {instance.pk} moved from {previous_key}, rebuilding old position")
+            rebuild_symbol_position(*previous_key)
+
+    _clear_cached_snapshot(instance)
+
+
+@receiver(post_delete, sender=Transaction)
+def update_position_on_delete(sender, instance, **kwargs):
+    """Remove a deleted transaction's effect by replaying the rest of that symbol's ledger"""
+    if getattr(instance, '_skip_position_update', False):
+        return
+
+    rebuild_symbol_position(instance.portfolio_id, instance.stock_symbol)
+    _clear_cached_snapshot(instance)
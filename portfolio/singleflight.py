@@ -0,0 +1,203 @@
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from django.core.cache import cache
+from django_redis import get_redis_connection
+import redis
+
+logger = logging.getLogger(__name__)
+
+# Process-local locks, used when Redis is unavailable
+_local_locks = {}
+_local_locks_guard = threading.Lock()
+
+# Delete a lock only while it still holds our token
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Push back the expiry of each lock (KEYS[i]) that still holds its token (ARGV[i + 1])
+_EXTEND_SCRIPT = """
+local extended = 0
+for i, key in ipairs(KEYS) do
+    if redis.call('get', key) == ARGV[i + 1] then
+        redis.call('pexpire', key, ARGV[1])
+        extended = extended + 1
+    end
+end
+return extended
+"""
+
+
+class SingleFlight:
+    """
+    Cross-process "single flight" guard for expensive fetches
+    The first caller to acquire a key's lock does the work; everyone else
+    waits for the result to appear instead of making the same upstream call.
+    Locks are Redis keys set with NX and an expiry, so a crashed worker can't
+    hold one forever; a fetch that may outlast the expiry renews its locks
+    with keep_alive(). Without Redis the guard falls back to a per-process
+    lock table.
+    """
+
+    def __init__(self, use_redis=True, lock_timeout=60, wait_timeout=10, poll_interval=0.1):
+        self.use_redis = use_redis
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+
+    def get_lock_key(self, key):
+        """Generate the lock key guarding a result key"""
+        return f"{key}:lock"
+
+    def _redis_lock_key(self, key):
+        return cache.make_key(self.get_lock_key(key))
+
+    def acquire(self, key):
+        """
+        Try to become the fetcher for a key
+        Returns a token to pass to release(), or None if someone else holds the lock
+        """
+        token = uuid.uuid4().hex
+        lock_key = self.get_lock_key(key)
+
+        if self.use_redis:
+            try:
+                acquired = get_redis_connection('default').set(
+                    self._redis_lock_key(key), token, nx=True, px=int(self.lock_timeout * 1000)
+                )
+                return token if acquired else None
+            except (redis.exceptions.RedisError, Exception) as e:
+                logger.warning(f"Redis error acquiring {lock_key}, using local lock: {str(e)}")
+
+        with _local_locks_guard:
+            current = _local_locks.get(lock_key)
+            if current and current[1] > time.monotonic():
+                return None
+            _local_locks[lock_key] = (token, time.monotonic() + self.lock_timeout)
+            return token
+
+    def release(self, key, token):
+        """Release a lock, but only if it is still ours (it may have expired and been re-taken)"""
+        lock_key = self.get_lock_key(key)
+
+        if self.use_redis:
+            try:
+                get_redis_connection('default').eval(_RELEASE_SCRIPT, 1, self._redis_lock_key(key), token)
+                return
+            except (redis.exceptions.RedisError, Exception) as e:
+                logger.warning(f"Redis error releasing {lock_key}: {str(e)}")
+
+        with _local_locks_guard:
+            current = _local_locks.get(lock_key)
+            if current and current[0] == token:
+                del _local_locks[lock_key]
+
+    def extend(self, tokens):
+        """Restart the expiry of each {key: token} lock that is still ours"""
+        if not tokens:
+            return
+        keys = list(tokens)
+
+        if self.use_redis:
+            try:
+                get_redis_connection('default').eval(
+                    _EXTEND_SCRIPT, len(keys), *[self._redis_lock_key(key) for key in keys],
+                    int(self.lock_timeout * 1000), *[tokens[key] for key in keys]
+                )
+                return
+            except (redis.exceptions.RedisError, Exception) as e:
+                logger.warning(f"Redis error extending {len(keys)} locks: {str(e)}")
+
+        expires_at = time.monotonic() + self.lock_timeout
+        with _local_locks_guard:
+            for key in keys:
+                lock_key = self.get_lock_key(key)
+                current = _local_locks.get(lock_key)
+                if current and current[0] == tokens[key]:
+                    _local_locks[lock_key] = (current[0], expires_at)
+
+    @contextmanager
+    def keep_alive(self, tokens):
+        """
+        Hold the given {key: token} locks for as long as the block runs
+        A background thread renews them every third of lock_timeout, so a slow,
+        rate-limited fetch keeps its locks; if the process dies they still expire
+        """
+        stop = threading.Event()
+
+        def renew():
+            while not stop.wait(self.lock_timeout / 3):
+                self.extend(tokens)
+
+        renewer = threading.Thread(target=renew, name='single-flight-renew', daemon=True)
+        renewer.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            renewer.join()
+
+    def locked_keys(self, keys):
+        """Return the subset of keys whose lock is currently held"""
+        lock_keys = {self.get_lock_key(key): key for key in keys}
+
+        if self.use_redis:
+            try:
+                keys = list(keys)
+                values = get_redis_connection('default').mget([self._redis_lock_key(key) for key in keys])
+                return {key for key, value in zip(keys, values) if value is not None}
+            except (redis.exceptions.RedisError, Exception) as e:
+                logger.warning(f"Redis error checking locks: {str(e)}")
+
+        now = time.monotonic()
+        with _local_locks_guard:
+            return {
+                key for lock_key, key in lock_keys.items()
+                if lock_key in _local_locks and _local_locks[lock_key][1] > now
+            }
+
+    def wait(self, keys, lookup, deadline=None):
+        """
+        Wait for other callers to publish results for the given keys
+        `lookup(pending_keys)` returns a {key: result} dict of whatever is available.
+        Stops early for a key once its lock is released without a result (the
+        fetcher failed). Returns the results found before wait_timeout, or before
+        `deadline` (a time.monotonic() value) if that comes first.
+        """
+        results = {}
+        pending = set(keys)
+        stop_at = time.monotonic() + self.wait_timeout
+        if deadline is not None:
+            stop_at = min(stop_at, deadline)
+
+        while pending:
+            found = lookup(list(pending))
+            results.update(found)
+            pending.difference_update(found)
+            if not pending:
+                break
+
+            # Keys nobody is fetching any more won't get a result by waiting
+            abandoned = pending - self.locked_keys(pending)
+            if abandoned:
+                # The fetcher may have published just before releasing, so look once more
+                found = lookup(list(abandoned))
+                results.update(found)
+                pending.difference_update(abandoned)
+                if len(found) < len(abandoned):
+                    logger.info(f"Fetch finished without a result for {len(abandoned) - len(found)} keys")
+
+            remaining = stop_at - time.monotonic()
+            if not pending or remaining <= 0:
+                break
+            time.sleep(min(self.poll_interval, remaining))
+
+        if pending:
+            logger.warning(f"Timed out waiting for in-flight fetches of {', '.join(sorted(pending))}")
+        return results
@@ -16,6 +16,19 @@ CLOUD_TASKS_QUEUE = os.environ.get('CLOUD_TASKS_QUEUE', 'stock-updates')
 CLOUD_TASKS_PROJECT = os.environ.get('PROJECT_ID', settings.PROJECT_ID if hasattr(settings, 'PROJECT_ID') else None)
 SERVICE_URL = os.environ.get('CLOUDRUN_SERVICE_URL', settings.CLOUDRUN_SERVICE_URL if hasattr(settings, 'CLOUDRUN_SERVICE_URL') else 'http://localhost:8000')
 
+_client = None
+
+
+def get_tasks_client():
+    """
+    Return the process-wide Cloud Tasks client
+    Creating a client sets up a new gRPC channel, so it is built once and reused
+    """
+    global _client
+    if _client is None:
+        _client = tasks_v2.CloudTasksClient()
+    return _client
+
 
 def create_cloud_task(relative_uri, payload, delay_seconds=0, task_name=None):
     """
@@ -25,7 +38,7 @@ def create_cloud_task(relative_uri, payload, delay_seconds=0, task_name=None):
         logger.error("No PROJECT_ID configured for Cloud Tasks")
         return None
 
-    client = tasks_v2.CloudTasksClient()
+    client = get_tasks_client()
     parent = client.queue_path(CLOUD_TASKS_PROJECT, CLOUD_TASKS_LOCATION, CLOUD_TASKS_QUEUE)
     
     # Construct the request body
@@ -66,9 +79,10 @@ def create_cloud_task(relative_uri, payload, delay_seconds=0, task_name=None):
         return None
 
 
-def refresh_stock_data(symbols, delay_seconds=0):
+def refresh_stock_data(symbols, delay_seconds=0, refresh_id=None):
     """
     Create a Cloud Task to refresh stock data for the given symbols
+    refresh_id, when given, is the quote refresh whose status the task records
     """
     if not symbols:
         logger.warning("No symbols provided to refresh_stock_data")
@@ -80,6 +94,8 @@ def refresh_stock_data(symbols, delay_seconds=0):
     payload = {
         "symbols": symbols
     }
+    if refresh_id:
+        payload["refresh_id"] = refresh_id
     
     # Create a task with a unique name based on symbols
     symbols_hash = hash(''.join(sorted(symbols))) % 10000000
@@ -93,6 +109,34 @@ def refresh_stock_data(symbols, delay_seconds=0):
     )
 
 
+def flush_quote_refreshes(batch_id, delay_seconds=0):
+    """
+    Create a Cloud Task to flush the pending quote refresh batch
+    The task is named after the batch, so a batch is flushed at most once
+    """
+    logger.info(f"Scheduling quote refresh flush {batch_id} in {delay_seconds}s")
+    
+    return create_cloud_task(
+        relative_uri="portfolio/api/flush-quote-refreshes/",
+        payload={"batch_id": batch_id},
+        delay_seconds=delay_seconds,
+        task_name=f"flush-quote-refresh-{batch_id}"
+    )
+
+
+def process_import_job(job_id):
+    """
+    Create a Cloud Task to process an uploaded transaction import
+    """
+    logger.info(f"Scheduling import job {job_id}")
+    
+    return create_cloud_task(
+        relative_uri="portfolio/api/process-import-job/",
+        payload={"job_id": job_id},
+        task_name=f"import-job-{job_id}"
+    )
+
+
 def update_all_stocks_daily():
     """
     Create a Cloud Task to update all stocks in the database
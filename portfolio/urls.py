@@ -23,13 +23,18 @@ urlpatterns = [
     path('import-transactions/', views.import_transactions, name='import_transactions'),
     path('import-transactions/<int:portfolio_pk>/', views.import_transactions, name='import_transactions_portfolio'),
     path('download-template/', views.download_template, name='download_template'),
+    path('import-jobs/<int:job_pk>/', views.import_job_detail, name='import_job_detail'),
+    path('import-jobs/<int:job_pk>/status/', views.import_job_status, name='import_job_status'),
     
     # Stock price refresh
     path('portfolios/<int:portfolio_pk>/refresh/', views.refresh_stock_prices, name='refresh_stock_prices'),
+    path('quote-refreshes/<str:refresh_id>/status/', views.quote_refresh_status, name='quote_refresh_status'),
     
     # Cloud Tasks API endpoints
     path('api/refresh-stocks/', api.refresh_stocks, name='api_refresh_stocks'),
     path('api/refresh-all-stocks/', api.refresh_all_stocks, name='api_refresh_all_stocks'),
+    path('api/flush-quote-refreshes/', api.flush_quote_refreshes, name='api_flush_quote_refreshes'),
+    path('api/process-import-job/', api.process_import_job, name='api_process_import_job'),
     
     # Debug view
     path('debug/api/', views.debug_api, name='debug_api'),
@@ -4,17 +4,17 @@ from django.contrib import messages
 from django.utils import timezone
 from django.http import JsonResponse, HttpResponse
 from django.db.models import Sum
-from decimal import Decimal
-import pandas as pd
 import io
 import logging
 from django.urls import reverse
 
-from .models import Portfolio, Transaction, Stock
+from .models import Portfolio, Transaction, Stock, ImportJob
 from .forms import PortfolioForm, TransactionForm, TransactionImportForm
-from .api import update_stock_info, StockAPIError, fetch_stock_data, get_api_key
-from .tasks import refresh_stock_data, update_all_stocks_daily
-from .services import StockDataService
+from .api import StockAPIError, fetch_stock_data, get_api_key
+from .tasks import update_all_stocks_daily
+from .quote_refresh import enqueue_quote_refresh, schedule_quote_refresh, get_refresh_status, is_refresh_id
+from .holdings import prime_holdings_snapshots, UserHoldingsSummary
+from .importer import dispatch_import_job, fail_stale_job, IMPORT_MAX_CSV_SIZE, IMPORT_MAX_EXCEL_SIZE
 
 logger = logging.getLogger(__name__)
 
@@ -22,25 +22,15 @@ logger = logging.getLogger(__name__)
 @login_required
 def dashboard(request):
     """Main dashboard view showing all portfolios summary"""
-    portfolios = Portfolio.objects.filter(user=request.user)
-    
-    # Calculate total portfolio value across all portfolios
-    total_value = sum(portfolio.get_total_value() for portfolio in portfolios)
-    total_cost = sum(portfolio.get_total_cost() for portfolio in portfolios)
-    total_gain_loss = total_value - total_cost
-    
-    # Calculate total gain/loss percentage
-    if total_cost > 0:
-        total_gain_loss_percentage = (total_gain_loss / total_cost) * 100
-    else:
-        total_gain_loss_percentage = Decimal('0.00')
+    # Price every portfolio from one batched quote lookup and total them together
+    summary = UserHoldingsSummary.for_user(request.user)
     
     context = {
-        'portfolios': portfolios,
-        'total_value': total_value,
-        'total_cost': total_cost,
-        'total_gain_loss': total_gain_loss,
-        'total_gain_loss_percentage': total_gain_loss_percentage,
+        'portfolios': summary.portfolios,
+        'total_value': summary.total_value,
+        'total_cost': summary.total_cost,
+        'total_gain_loss': summary.total_gain_loss,
+        'total_gain_loss_percentage': summary.total_gain_loss_percentage,
     }
     
     return render(request, 'portfolio/portfolio_dashboard.html', context)
@@ -49,7 +39,7 @@ def dashboard(request):
 @login_required
 def portfolio_list(request):
     """View to list all portfolios belonging to the user"""
-    portfolios = Portfolio.objects.filter(user=request.user)
+    portfolios = prime_holdings_snapshots(Portfolio.objects.filter(user=request.user))
     
     # Handle new portfolio creation
     if request.method == 'POST':
@@ -76,19 +66,20 @@ def portfolio_detail(request, pk):
     """View to show details of a specific portfolio"""
     portfolio = get_object_or_404(Portfolio, pk=pk, user=request.user)
     
-    # Get the holdings data
-    holdings = portfolio.get_holdings()
+    # Replay the ledger once; holdings and summary totals all come from this snapshot
+    snapshot = portfolio.get_holdings_snapshot()
+    holdings = snapshot.holdings
     
-    # Trigger refresh of stock data for all stocks in this portfolio
-    # This is done asynchronously using Google Cloud Tasks
-    symbols = set(holding['symbol'] for holding in holdings)
-    refresh_stock_data(list(symbols))
+    # Add stale quotes to the next batched background refresh; the page polls its status
+    refresh_id = request.GET.get('refresh')
+    if not is_refresh_id(refresh_id):
+        refresh_id = schedule_quote_refresh(snapshot.symbols, user=request.user)
     
     # Calculate portfolio summary
-    total_value = portfolio.get_total_value()
-    total_cost = portfolio.get_total_cost()
-    total_gain_loss = portfolio.get_total_gain_loss()
-    total_gain_loss_percentage = portfolio.get_total_gain_loss_percentage()
+    total_value = snapshot.total_value
+    total_cost = snapshot.total_cost
+    total_gain_loss = snapshot.total_gain_loss
+    total_gain_loss_percentage = snapshot.total_gain_loss_percentage
     
     # Get recent transactions
     recent_transactions = Transaction.objects.filter(portfolio=portfolio).order_by('-transaction_date')[:10]
@@ -101,6 +92,7 @@ def portfolio_detail(request, pk):
         'total_gain_loss': total_gain_loss,
         'total_gain_loss_percentage': total_gain_loss_percentage,
         'recent_transactions': recent_transactions,
+        'refresh_id': refresh_id,
     }
     
     return render(request, 'portfolio/portfolio_detail.html', context)
@@ -132,12 +124,11 @@ def add_transaction(request, portfolio_pk):
             transaction.portfolio = portfolio
             transaction.save()
             
-            # Create or update the Stock record
-            stock, created = Stock.objects.get_or_create(symbol=transaction.stock_symbol)
+            # Create the Stock record if needed
+            Stock.objects.get_or_create(symbol=transaction.stock_symbol)
             
-            # If this is a new stock or the price is stale, fetch updated data
-            if created or stock.is_price_stale():
-                update_stock_info(stock)
+            # Fetch the quote in the background; only stale data is re-fetched
+            enqueue_quote_refresh([transaction.stock_symbol], user=request.user)
             
             messages.success(request, 'Transaction added successfully!')
             return redirect('portfolio:portfolio_detail', pk=portfolio_pk)
@@ -223,23 +214,31 @@ def refresh_stock_prices(request, portfolio_pk):
         messages.info(request, "No stocks in portfolio to refresh.")
         return redirect('portfolio:portfolio_detail', pk=portfolio_pk)
     
-    # Use the stock service to refresh prices
-    stock_service = StockDataService()
-    results = stock_service.refresh_multiple_stocks(stock_symbols)
-    
-    # Count successes and failures
-    success_count = sum(1 for result in results.values() if result)
-    error_count = len(results) - success_count
-    
-    if error_count > 0:
-        messages.warning(
-            request, 
-            f"Refreshed {success_count} stocks. Unable to refresh {error_count} stocks due to API errors."
-        )
-    else:
-        messages.success(request, f"Successfully refreshed prices for {success_count} stocks.")
+    # Queue the refresh and let the portfolio page poll its progress
+    refresh_id = enqueue_quote_refresh(stock_symbols, user=request.user)
+    messages.info(request, f"Refreshing prices for {len(stock_symbols)} stocks in the background.")
     
-    return redirect('portfolio:portfolio_detail', pk=portfolio_pk)
+    return redirect(f"{reverse('portfolio:portfolio_detail', kwargs={'pk': portfolio_pk})}?refresh={refresh_id}")
+
+
+@login_required
+def quote_refresh_status(request, refresh_id):
+    """JSON status of a queued quote refresh, polled by the portfolio page"""
+    status = get_refresh_status(refresh_id) if is_refresh_id(refresh_id) else None
+    if status is None or status.get('user_id') not in (None, request.user.pk):
+        return JsonResponse({'status': 'UNKNOWN', 'finished': True}, status=404)
+    
+    # Batches from page views mix every user's symbols, so only their owner sees which ones failed
+    own = status.get('user_id') == request.user.pk
+    return JsonResponse({
+        'status': status['status'],
+        'symbols': len(status['symbols']),
+        'updated': status['updated'],
+        'errors': status['errors'],
+        'failed_symbols': status['failed_symbols'] if own else [],
+        'message': status['message'] if own else '',
+        'finished': status['status'] in ('COMPLETED', 'FAILED'),
+    })
 
 
 @login_required
@@ -318,85 +317,24 @@ def import_transactions(request, portfolio_pk=None):
             portfolio = form.cleaned_data['portfolio']
             file = request.FILES['file']
             
-            # Check file size (5MB limit)
-            if file.size > 5 * 1024 * 1024:
-                messages.error(request, 'File too large. Maximum size is 5MB.')
+            # CSVs are streamed in chunks; Excel workbooks have to be loaded whole
+            is_csv = file.name.lower().endswith('.csv')
+            max_size = IMPORT_MAX_CSV_SIZE if is_csv else IMPORT_MAX_EXCEL_SIZE
+            if file.size > max_size:
+                messages.error(request, f'File too large. Maximum size is {max_size // (1024 * 1024)}MB.')
                 return redirect('portfolio:import_transactions')
             
-            # Determine file type and parse
+            # Store the upload and process it in the background
             try:
-                if file.name.endswith('.csv'):
-                    df = pd.read_csv(file)
-                else:  # Excel file
-                    df = pd.read_excel(file)
-                
-                # Validate required columns
-                required_columns = ['symbol', 'quantity', 'price_per_share']
-                missing_columns = [col for col in required_columns if col not in df.columns]
-                
-                if missing_columns:
-                    messages.error(request, f"Missing required columns: {', '.join(missing_columns)}. " 
-                                          f"Required columns are: {', '.join(required_columns)}.")
-                    return redirect('portfolio:import_transactions')
-                
-                # Optional columns
-                if 'transaction_date' not in df.columns:
-                    df['transaction_date'] = timezone.now()
-                
-                if 'transaction_type' not in df.columns:
-                    df['transaction_type'] = 'BUY'  # Default to BUY
-                
-                # Process each row and create transactions
-                success_count = 0
-                error_count = 0
-                errors = []
-                
-                for index, row in df.iterrows():
-                    try:
-                        # Validate transaction type
-                        if row['transaction_type'].upper() not in ['BUY', 'SELL']:
-                            error_count += 1
-                            errors.append(f"Row {index+1}: Invalid transaction type. Must be 'BUY' or 'SELL'.")
-                            continue
-                        
-                        # Create the transaction
-                        transaction = Transaction(
-                            portfolio=portfolio,
-                            stock_symbol=row['symbol'].upper().strip(),
-                            transaction_type=row['transaction_type'].upper(),
-                            quantity=row['quantity'],
-                            price_per_share=row['price_per_share'],
-                            transaction_date=row['transaction_date'],
-                        )
-                        transaction.save()
-                        
-                        # Update stock info
-                        stock, created = Stock.objects.get_or_create(symbol=transaction.stock_symbol)
-                        if created or stock.is_price_stale():
-                            update_stock_info(stock)
-                        
-                        success_count += 1
-                    except Exception as e:
-                        error_count += 1
-                        errors.append(f"Row {index+1}: {str(e)}")
-                
-                # Show results
-                if success_count > 0:
-                    messages.success(request, f"Successfully imported {success_count} transactions.")
-                
-                if error_count > 0:
-                    messages.warning(request, f"Encountered {error_count} errors during import.")
-                    for error in errors[:10]:  # Show first 10 errors
-                        messages.warning(request, error)
-                    
-                    if len(errors) > 10:
-                        messages.warning(request, f"... and {len(errors) - 10} more errors.")
-                
-                return redirect('portfolio:portfolio_detail', pk=portfolio.pk)
-                
+                job = ImportJob.objects.create(portfolio=portfolio, file=file, original_name=file.name)
+                dispatch_import_job(job)
             except Exception as e:
+                logger.error(f"Error starting import of {file.name}: {str(e)}")
                 messages.error(request, f"Error processing file: {str(e)}")
                 return redirect('portfolio:import_transactions')
+            
+            messages.info(request, f"Importing {file.name} in the background.")
+            return redirect('portfolio:import_job_detail', job_pk=job.pk)
     else:
         form = TransactionImportForm(request.user, initial=initial)
     
@@ -407,6 +345,40 @@ def import_transactions(request, portfolio_pk=None):
     return render(request, 'portfolio/import_transactions.html', context)
 
 
+@login_required
+def import_job_detail(request, job_pk):
+    """View showing the progress of a background import"""
+    job = get_object_or_404(ImportJob.objects.select_related('portfolio'), pk=job_pk, portfolio__user=request.user)
+    
+    context = {
+        'job': job,
+    }
+    
+    return render(request, 'portfolio/import_job_detail.html', context)
+
+
+@login_required
+def import_job_status(request, job_pk):
+    """JSON progress of a background import, polled by the import job page"""
+    job = get_object_or_404(ImportJob, pk=job_pk, portfolio__user=request.user)
+    # A job whose worker died would otherwise show as running forever
+    if job.status == ImportJob.STATUS_RUNNING and fail_stale_job(job.pk):
+        job.refresh_from_db()
+    
+    return JsonResponse({
+        'id': job.pk,
+        'status': job.status,
+        'finished': job.is_finished,
+        'total_rows': job.total_rows,
+        'rows_processed': job.rows_processed,
+        'progress_percentage': job.progress_percentage,
+        'success_count': job.success_count,
+        'error_count': job.error_count,
+        'errors': job.errors[:10],
+        'message': job.message,
+    })
+
+
 def download_template(request):
     """View to download a CSV template for transaction import"""
     response = HttpResponse(content_type='text/csv')
@@ -79,6 +79,9 @@ CACHES = {
 STOCK_PRICE_CACHE_TIMEOUT = 60 * 15  # 15 minutes
 STOCK_DETAILS_CACHE_TIMEOUT = 60 * 60 * 24  # 24 hours
 
+# S&P return page results; invalidated whenever spinfo changes
+SPRETURN_CACHE_TIMEOUT = 60 * 60 * 24  # 24 hours
+
 try:
     credentials, project = google.auth.default()
     logger.info(f"Google Cloud project: {project}")
@@ -353,6 +356,36 @@ SOCIAL_AUTH_GOOGLE_OAUTH2_SCOPE = [
 
 # Alpha Vantage API key for stock data
 ALPHA_VANTAGE_API_KEY = env('ALPHA_VANTAGE_API_KEY', default=None)
+# Alpha Vantage request budget, shared through Redis by every thread, worker and instance
+ALPHA_VANTAGE_CALLS_PER_MINUTE = env.int('ALPHA_VANTAGE_CALLS_PER_MINUTE', default=5)
+ALPHA_VANTAGE_MAX_WORKERS = env.int('ALPHA_VANTAGE_MAX_WORKERS', default=4)
+# Seconds a page view waits for rate limit slots or in-flight fetches before serving cached or default data
+STOCK_FETCH_DEADLINE = env.int('STOCK_FETCH_DEADLINE', default=5)
+# Single-flight quote fetching: how long a fetch lock lives and how long other callers wait on it
+STOCK_FETCH_LOCK_TIMEOUT = env.int('STOCK_FETCH_LOCK_TIMEOUT', default=60)
+STOCK_FETCH_WAIT_TIMEOUT = env.int('STOCK_FETCH_WAIT_TIMEOUT', default=10)
+# Prices refreshed within this many seconds are skipped by refresh requests
+STOCK_PRICE_FRESHNESS = env.int('STOCK_PRICE_FRESHNESS', default=60 * 5)
+# In-process L1 stock cache in front of Redis: size bound, fresh TTL and stale-while-revalidate window (seconds)
+STOCK_LOCAL_CACHE_MAX_ENTRIES = env.int('STOCK_LOCAL_CACHE_MAX_ENTRIES', default=2048)
+STOCK_LOCAL_CACHE_TTL = env.int('STOCK_LOCAL_CACHE_TTL', default=60)
+STOCK_LOCAL_CACHE_STALE_TTL = env.int('STOCK_LOCAL_CACHE_STALE_TTL', default=60 * 15)
+# Background transaction imports: rows per bulk insert, upload limits and worker backend ('cloud_tasks' or 'local')
+IMPORT_CHUNK_SIZE = env.int('IMPORT_CHUNK_SIZE', default=5000)
+# Uploads arrive in one request, and Cloud Run caps request bodies at 32MiB
+IMPORT_MAX_CSV_SIZE = env.int('IMPORT_MAX_CSV_SIZE', default=30 * 1024 * 1024)
+IMPORT_MAX_EXCEL_SIZE = env.int('IMPORT_MAX_EXCEL_SIZE', default=20 * 1024 * 1024)
+IMPORT_JOB_BACKEND = env('IMPORT_JOB_BACKEND', default=None)
+# A running import not finished after this many seconds is taken to have died with its worker
+IMPORT_JOB_TIMEOUT = env.int('IMPORT_JOB_TIMEOUT', default=60 * 30)
+# Uploaded files are kept out of public media: a private GCS bucket, or else a local directory
+IMPORT_FILE_BUCKET = env('IMPORT_FILE_BUCKET', default=None)
+IMPORT_FILE_ROOT = env('IMPORT_FILE_ROOT', default=str(BASE_DIR / 'private' / 'imports'))
+# Background quote refreshes: worker backend ('cloud_tasks' or 'local'), local pool size and status lifetime
+QUOTE_REFRESH_BACKEND = env('QUOTE_REFRESH_BACKEND', default=None)
+QUOTE_REFRESH_MAX_WORKERS = env.int('QUOTE_REFRESH_MAX_WORKERS', default=2)
+QUOTE_REFRESH_STATUS_TIMEOUT = env.int('QUOTE_REFRESH_STATUS_TIMEOUT', default=60 * 60)
+QUOTE_REFRESH_BATCH_INTERVAL = env.int('QUOTE_REFRESH_BATCH_INTERVAL', default=10)  # Seconds between batched page-view refreshes
 
 SOCIAL_AUTH_GOOGLE_OAUTH2_AUTH_EXTRA_ARGUMENTS = {
     'access_type': 'offline',
@@ -388,6 +421,9 @@ MICROSOFT_AUTH = {
     'SCOPE': ['Tasks.Read']
 }
 
+# Task sync: remote lists fetched concurrently per sync (provider rate limits live in core.http_client)
+TASK_SYNC_MAX_WORKERS = env.int('TASK_SYNC_MAX_WORKERS', default=8)
+
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
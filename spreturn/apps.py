@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SpreturnConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'spreturn'
+
+    def ready(self):
+        import spreturn.signals  # Import signals to register them
@@ -17,3 +17,21 @@ class SPReturnForm(forms.Form):
     )
     startingInvest = forms.DecimalField(initial=1.0, label="Starting Investment")
     reccuringDepositAmount = forms.DecimalField(initial=1.0, label="Recurring Amount")
+    inflationAdjusted = forms.ChoiceField(
+        choices=[('Yes', 'Yes'), ('No', 'No')],
+        initial='No',
+        label="Adjust for Inflation"
+    )
+
+
+class SPSimulationForm(forms.Form):
+    numYears = forms.IntegerField(initial=30, min_value=1, max_value=60, label="Number of Years")
+    numPaths = forms.IntegerField(initial=10000, min_value=100, max_value=100000, label="Simulated Paths")
+    blockSize = forms.IntegerField(initial=5, min_value=1, max_value=20, label="Block Size (Years)")
+    startingInvest = forms.DecimalField(initial=1.0, min_value=0, label="Starting Investment")
+    reccuringDepositAmount = forms.DecimalField(initial=0.0, min_value=0, label="Yearly Deposit")
+    adjustInflation = forms.ChoiceField(
+        choices=[('Yes', 'Yes'), ('No', 'No')],
+        initial='Yes',
+        label="Adjust for Inflation"
+    )
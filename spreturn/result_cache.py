@@ -0,0 +1,76 @@
+import logging
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+import redis
+
+logger = logging.getLogger(__name__)
+
+DATA_VERSION_KEY = 'spreturn:data_version'
+RESULT_CACHE_TIMEOUT = getattr(settings, 'SPRETURN_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def get_data_version():
+    """
+    Return the current version token of the spinfo data, or None if the cache is unavailable
+    Tokens are random rather than counters, so a version key lost from Redis can
+    never bring back results computed from older data
+    """
+    try:
+        version = cache.get(DATA_VERSION_KEY)
+        if version is None:
+            cache.add(DATA_VERSION_KEY, uuid.uuid4().hex, None)
+            version = cache.get(DATA_VERSION_KEY)
+        return version
+    except (redis.exceptions.RedisError, Exception) as e:
+        logger.warning(f"Redis error reading spreturn data version: {str(e)}")
+        return None
+
+
+def bump_data_version():
+    """Start a new data version; results cached under the old one are never read again"""
+    try:
+        cache.set(DATA_VERSION_KEY, uuid.uuid4().hex, None)
+    except (redis.exceptions.RedisError, Exception) as e:
+        logger.warning(f"Redis error bumping spreturn data version: {str(e)}")
+
+
+def _normalize(value):
+    if isinstance(value, (Decimal, float)):
+        # 1, 1.0 and 1.00 are the same input
+        return format(Decimal(str(value)).normalize(), 'f')
+    return str(value)
+
+
+def make_result_key(name, version, inputs):
+    """Cache key for a view result: view name, data version and the normalized inputs"""
+    parts = [f"{field}={_normalize(inputs[field])}" for field in sorted(inputs)]
+    return f"spreturn:{name}:{version}:{':'.join(parts)}"
+
+
+def cached_result(name, inputs, compute):
+    """
+    Return compute(version) from the cache, computing and storing it on a miss
+    Falls back to computing directly when the cache is unavailable
+    """
+    version = get_data_version()
+    if version is None:
+        return compute(None)
+
+    key = make_result_key(name, version, inputs)
+    try:
+        result = cache.get(key)
+        if result is not None:
+            logger.debug(f"spreturn cache hit for {key}")
+            return result
+    except (redis.exceptions.RedisError, Exception) as e:
+        logger.warning(f"Redis error reading {key}: {str(e)}")
+
+    result = compute(version)
+    try:
+        cache.set(key, result, RESULT_CACHE_TIMEOUT)
+    except (redis.exceptions.RedisError, Exception) as e:
+        logger.warning(f"Redis error caching {key}: {str(e)}")
+    return result
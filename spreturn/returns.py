@@ -0,0 +1,240 @@
+import logging
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_table = None
+_table_version = None
+_table_lock = threading.Lock()
+
+
+class ReturnTable:
+    """
+    Prefix tables over the yearly S&P returns in spinfo
+    Growth over any window is a ratio of prefix products (kept as cumulative
+    log returns), so a (start_year, period) terminal value or CAGR is an O(1)
+    lookup and every window of a period is one array operation.
+    Real values are nominal values divided by cumulative CPI over the same
+    years (a prefix table too), so they are in dollars of the window's start
+    year; recurring deposits stay fixed in nominal dollars either way.
+    """
+
+    def __init__(self, years, sp_returns, dividend_returns, inflation):
+        self.years = np.asarray(years, dtype=np.int64)
+        self.year_index = {int(year): index for index, year in enumerate(self.years)}
+        # Yearly figures in percent
+        self.sp_returns = np.asarray(sp_returns, dtype=np.float64)
+        self.dividend_returns = np.asarray(dividend_returns, dtype=np.float64)
+        self.inflation = np.asarray(inflation, dtype=np.float64)
+        self._log_cpi = np.concatenate(([0.0], np.cumsum(np.log1p(self.inflation / 100))))
+        self._prefixes = {
+            dividends: self._build_prefixes(np.log1p(returns_percent / 100))
+            for dividends, returns_percent in ((False, self.sp_returns), (True, self.dividend_returns))
+        }
+        self._period_summaries = {}
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from (year, spreturn, return_divident, inflation) rows; a repeated year keeps its last row"""
+        by_year = {row[0]: row for row in rows}
+        years = sorted(by_year)
+        return cls(
+            years,
+            [float(by_year[year][1]) for year in years],
+            [float(by_year[year][2]) for year in years],
+            [float(by_year[year][3]) for year in years],
+        )
+
+    @classmethod
+    def load(cls):
+        """Build from the spinfo table with one query"""
+        from spreturn.models import spinfo
+
+        return cls.from_rows(spinfo.objects.values_list('year', 'spreturn', 'return_divident', 'inflation'))
+
+    @staticmethod
+    def _build_prefixes(log_growth):
+        """
+        Returns (log_prefix, prefix, inverse_prefix_sum), each of length N + 1
+        prefix[j] is the growth of 1 over the first j years; inverse_prefix_sum[j]
+        is the sum of 1 / prefix[k] for k = 1..j, used for recurring deposits
+        """
+        log_prefix = np.concatenate(([0.0], np.cumsum(log_growth)))
+        prefix = np.exp(log_prefix)
+        inverse_prefix_sum = np.concatenate(([0.0], np.cumsum(1 / prefix[1:])))
+        return log_prefix, prefix, inverse_prefix_sum
+
+    @property
+    def is_empty(self):
+        return len(self.years) == 0
+
+    @property
+    def first_year(self):
+        return int(self.years[0])
+
+    @property
+    def last_year(self):
+        return int(self.years[-1])
+
+    @property
+    def max_period(self):
+        return self.last_year - self.first_year + 1 if len(self.years) else 0
+
+    def window_starts(self, period):
+        """Indices of every start year whose window of `period` consecutive years is fully present"""
+        count = len(self.years) - period + 1
+        if period < 1 or count < 1:
+            return np.empty(0, dtype=np.int64)
+        # Years are sorted and unique, so a window is gap-free exactly when it spans period - 1 years
+        complete = (self.years[period - 1:] - self.years[:count]) == period - 1
+        return np.flatnonzero(complete)
+
+    def _window_values(self, starts, ends, starting, deposit, dividends, real):
+        log_prefix, prefix, inverse_prefix_sum = self._prefixes[dividends]
+        values = starting * np.exp(log_prefix[ends] - log_prefix[starts])
+        if deposit:
+            # Each deposit grows over the years left after it: prefix[end] / prefix[k]
+            values = values + deposit * prefix[ends] * (inverse_prefix_sum[ends] - inverse_prefix_sum[starts])
+        if real:
+            values = values / np.exp(self._log_cpi[ends] - self._log_cpi[starts])
+        return values
+
+    def terminal_values(self, period, starting=1.0, deposit=0.0, dividends=False, starts=None, real=False):
+        """
+        Value at the end of every complete window of `period` years
+        A recurring deposit is added at the end of each year, after that year's return.
+        With real=True values are deflated by CPI into dollars of the window's start year
+        Returns (start_years, values)
+        """
+        starts = self.window_starts(period) if starts is None else starts
+        values = self._window_values(starts, starts + period, starting, deposit, dividends, real)
+        return self.years[starts], values
+
+    def terminal_value(self, start_year, period, starting=1.0, deposit=0.0, dividends=False, real=False):
+        """Value at the end of one window, or None if any of its years is missing"""
+        start = self.year_index.get(start_year)
+        end_year = start_year + period - 1
+        if start is None or self.year_index.get(end_year) != start + period - 1:
+            return None
+        _, values = self.terminal_values(period, starting, deposit, dividends, starts=np.array([start]), real=real)
+        return float(values[0])
+
+    def all_windows(self, starting=1.0, deposit=0.0, dividends=False, real=False):
+        """
+        Value at the end of every complete window of every period length, in one pass
+        Returns (start_years, periods, values), ordered by start year then period
+        """
+        starts, ends = np.triu_indices(len(self.years) + 1, k=1)
+        periods = ends - starts
+        complete = (self.years[ends - 1] - self.years[starts]) == periods - 1
+        starts, ends, periods = starts[complete], ends[complete], periods[complete]
+        values = self._window_values(starts, ends, starting, deposit, dividends, real)
+        return self.years[starts], periods, values
+
+    def deposit_schedule(self, period, deposit, real=False, starts=None):
+        """
+        Every window's deposits at the end of years 1..period, shape (windows, period)
+        Deposits are fixed in nominal dollars; with real=True each is deflated into
+        dollars of the window's start year, like terminal_values
+        """
+        starts = self.window_starts(period) if starts is None else starts
+        schedule = np.full((len(starts), period), float(deposit))
+        if real:
+            ends = starts[:, None] + np.arange(1, period + 1)
+            schedule = schedule / np.exp(self._log_cpi[ends] - self._log_cpi[starts][:, None])
+        return schedule
+
+    @staticmethod
+    def cagr(values, starting, period):
+        """Compound annual growth rate of ending values over `period` years"""
+        return (np.asarray(values) / starting) ** (1 / period) - 1
+
+    @staticmethod
+    def money_weighted_return(values, starting, deposit, periods, iterations=64):
+        """
+        Money-weighted return (IRR) of each window: the constant yearly rate r with
+        starting * (1 + r)^n + deposit * sum((1 + r)^k, k = 0..n-1) = value
+        deposit may instead be a deposit_schedule (then periods is its width), so
+        real values are matched with deposits deflated the same way.
+        The left side rises with r, so every window is bisected at once; 64 halvings
+        of [-99.99%, 1000%] are far below the 2dp shown. Equals cagr when deposit is 0
+        """
+        values = np.asarray(values, dtype=np.float64)
+        periods = np.broadcast_to(np.asarray(periods, dtype=np.float64), values.shape)
+        schedule = np.asarray(deposit, dtype=np.float64) if np.ndim(deposit) == 2 else None
+        if schedule is not None:
+            # Years each deposit grows: n - 1 for the first, down to 0 for the last
+            years_left = np.arange(schedule.shape[1] - 1, -1, -1)
+        low = np.full(values.shape, 1e-4)
+        high = np.full(values.shape, 11.0)
+
+        for _ in range(iterations):
+            growth = (low + high) / 2
+            compounded = growth ** periods
+            if schedule is not None:
+                deposits_value = (schedule * growth[:, None] ** years_left).sum(axis=1)
+            else:
+                # Sum of growth^k for k < n; the limit n where growth is 1
+                deposits_value = deposit * np.where(
+                    np.abs(growth - 1) < 1e-12, periods, (compounded - 1) / np.where(growth == 1, 1, growth - 1)
+                )
+            too_high = starting * compounded + deposits_value > values
+            high = np.where(too_high, growth, high)
+            low = np.where(too_high, low, growth)
+
+        return (low + high) / 2 - 1
+
+    def period_summary(self, dividends=True, real=False):
+        """
+        Min, average and max ending value of 1 invested, for every period length
+        All windows are valued in one pass and grouped by period; the result is memoized
+        Returns {period: {'min', 'avg', 'max'}}, skipping periods without a complete window
+        """
+        if (dividends, real) not in self._period_summaries:
+            _, periods, values = self.all_windows(dividends=dividends, real=real)
+            values = np.round(values, 2)
+            size = self.max_period + 1
+            counts = np.bincount(periods, minlength=size)
+            totals = np.bincount(periods, weights=values, minlength=size)
+            minimums = np.full(size, np.inf)
+            maximums = np.full(size, -np.inf)
+            np.minimum.at(minimums, periods, values)
+            np.maximum.at(maximums, periods, values)
+
+            self._period_summaries[dividends, real] = {
+                period: {
+                    'min': float(minimums[period]),
+                    'avg': round(float(totals[period] / counts[period]), 2),
+                    'max': float(maximums[period]),
+                }
+                for period in np.flatnonzero(counts).tolist()
+            }
+        return self._period_summaries[dividends, real]
+
+
+def get_return_table(version=None):
+    """
+    Return the process-wide ReturnTable, building it from spinfo on first use
+    When a data version is given, a table built for another version is rebuilt,
+    so changes saved in other processes are picked up too
+    """
+    global _table, _table_version
+    table = _table
+    if table is None or (version is not None and _table_version != version):
+        with _table_lock:
+            if _table is None or (version is not None and _table_version != version):
+                _table = ReturnTable.load()
+                _table_version = version
+                logger.info(f"Built S&P return table for {len(_table.years)} years")
+            table = _table
+    return table
+
+
+def clear_return_table():
+    """Drop the cached table so the next request rebuilds it from spinfo"""
+    global _table, _table_version
+    with _table_lock:
+        _table = None
+        _table_version = None
@@ -0,0 +1,20 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import spinfo
+from .result_cache import bump_data_version
+from .returns import clear_return_table
+
+
+def _invalidate():
+    clear_return_table()
+    bump_data_version()
+
+
+@receiver(post_save, sender=spinfo)
+@receiver(post_delete, sender=spinfo)
+def spinfo_changed(sender, instance, **kwargs):
+    """Invalidate the return table and every cached result after any change to the yearly data"""
+    # Wait for the commit so no other process rebuilds from the old rows under the new version
+    transaction.on_commit(_invalidate)
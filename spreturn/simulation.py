@@ -0,0 +1,75 @@
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def bootstrap_indices(rng, history_length, horizon, paths, block_size):
+    """
+    Draw year indices for every path with a circular block bootstrap
+    Paths are built from runs of block_size consecutive historical years, so
+    multi-year streaks (crashes, recoveries) survive resampling
+    Returns an int array of shape (paths, horizon)
+    """
+    block_size = max(1, min(block_size, history_length))
+    blocks = -(-horizon // block_size)  # Ceiling division
+    starts = rng.integers(0, history_length, size=(paths, blocks, 1))
+    offsets = np.arange(block_size)
+    indices = (starts + offsets) % history_length
+    return indices.reshape(paths, blocks * block_size)[:, :horizon]
+
+
+def simulate_growth(yearly_returns, horizon, paths=10000, block_size=5, starting=1.0, deposit=0.0,
+                    inflation=None, seed=None, percentiles=PERCENTILES):
+    """
+    Simulate portfolio values over `horizon` years by resampling historical years
+    yearly_returns and inflation are in percent. With inflation given, each
+    sampled year is deflated by that same year's inflation, so results are in
+    today's dollars (and the recurring deposit is constant in today's dollars).
+    A recurring deposit is added at the end of each year, after that year's return.
+    Returns a dictionary of percentile bands per year and at the horizon
+    """
+    yearly_returns = np.asarray(yearly_returns, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    indices = bootstrap_indices(rng, len(yearly_returns), horizon, paths, block_size)
+
+    growth = 1 + yearly_returns / 100
+    if inflation is not None:
+        growth = growth / (1 + np.asarray(inflation, dtype=np.float64) / 100)
+    sampled_growth = growth[indices]
+
+    # One vector step per year across all paths
+    values = np.empty((horizon, paths))
+    current = np.full(paths, float(starting))
+    for year in range(horizon):
+        current = current * sampled_growth[:, year] + deposit
+        values[year] = current
+
+    bands = np.percentile(values, percentiles, axis=1)
+    final = values[-1]
+    contributed = starting + deposit * horizon
+
+    return {
+        'years': list(range(1, horizon + 1)),
+        'bands': {f"p{percentile}": np.round(band, 2).tolist() for percentile, band in zip(percentiles, bands)},
+        'final': {f"p{percentile}": round(float(band[-1]), 2) for percentile, band in zip(percentiles, bands)},
+        'contributed': round(contributed, 2),
+        'loss_probability': round(float((final < contributed).mean()) * 100, 2),
+        'paths': paths,
+        'block_size': block_size,
+        'real': inflation is not None,
+    }
+
+
+def simulate_table(table, horizon, paths=10000, block_size=5, starting=1.0, deposit=0.0,
+                   adjust_for_inflation=False, seed=None):
+    """Run simulate_growth over the dividend-inclusive returns of a ReturnTable"""
+    inflation = table.inflation if adjust_for_inflation else None
+    logger.debug(f"Simulating {paths} paths of {horizon} years from {len(table.years)} historical years")
+    return simulate_growth(
+        table.dividend_returns, horizon, paths=paths, block_size=block_size, starting=starting,
+        deposit=deposit, inflation=inflation, seed=seed
+    )
@@ -8,5 +8,6 @@ app_name = 'spreturn'
 urlpatterns = [
     path('', views.spreturn, name='spreturn'),
     path('sp-insights/', views.spreturn_insights, name='spreturn_insights'),
+    path('simulation/', views.spreturn_simulation, name='spreturn_simulation'),
     path('add-sp-info/', views.add_sp_info, name='add-sp-info'),
 ]
\ No newline at end of file
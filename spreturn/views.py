@@ -1,267 +1,150 @@
 
 from django.http import HttpResponse
 from .models import spinfo
-import pandas as pd
+import numpy as np
 from django.shortcuts import render, redirect
 from django.forms import modelformset_factory
-from .forms import SPInfoForm, SPReturnForm
+from .forms import SPInfoForm, SPReturnForm, SPSimulationForm
 from django.contrib import messages
-from decimal import Decimal, getcontext
+from .result_cache import cached_result
+from .returns import get_return_table
+from .simulation import simulate_table
 import logging
 import json
 
 # Configure logging
 logger = logging.getLogger(__name__)
-getcontext().prec = 10
 
 
-# Create your views here.
-def spreturn(request):
-    
-    initial_values = {
-        'numYears': 30,
-        'reccuringDeposit': 'No',
-        'startingInvest': 1.0,
-        'reccuringDepositAmount': 1.0
-    }
+INITIAL_VALUES = {
+    'numYears': 30,
+    'reccuringDeposit': 'No',
+    'startingInvest': 1.0,
+    'reccuringDepositAmount': 1.0,
+    'inflationAdjusted': 'No',
+}
 
-    categories = []
-    series_sp = []
-    series_sp_DD = []
-    form_values = {}
-    history_begin_year = 1928
+SIMULATION_INITIAL_VALUES = {
+    'numYears': 30,
+    'numPaths': 10000,
+    'blockSize': 5,
+    'startingInvest': 1.0,
+    'reccuringDepositAmount': 0.0,
+    'adjustInflation': 'Yes',
+}
+# Fixed so the same inputs always give the same (cacheable) bands
+SIMULATION_SEED = 1928
 
-    ReturnInfo = {}
-    SP500_dividend = {}
-    SP500 = {}
 
+# Create your views here.
+def spreturn(request):
+    
     if (request.method == "POST"):
-
-        print("This is POST Request")
         form = SPReturnForm(request.POST)  # Create an instance of your form
-        if form.is_valid():
-            print("Form is Valid")
-            number_of_year = form.cleaned_data.get('numYears')
-            recurring_deposit = form.cleaned_data.get('reccuringDeposit')
-            starting_investment = form.cleaned_data.get('startingInvest')
-            recurring_deposit_amount = form.cleaned_data.get('reccuringDepositAmount')
-
-    else:
-        print("This is GET Request")
-        form = SPReturnForm(initial=initial_values)  # This will initialize the form with the initial values
-        number_of_year = initial_values["numYears"]
-        recurring_deposit = initial_values["reccuringDeposit"]
-        starting_investment = initial_values["startingInvest"]
-        recurring_deposit_amount = initial_values["reccuringDepositAmount"]
-        
-    print("Number of Years : " + str(number_of_year))
-    print("Starting Investment : " + str(starting_investment))
-    print("Recurring Deposit : " + str(recurring_deposit))
-    print("Recurring Deposit Amount : " + str(recurring_deposit_amount))
-
-    spreturninfo90years = spinfo.objects.all()
-    spreturn_data = spinfo.objects.values_list('year', 'spreturn', 'return_divident', named=True)
-
-        # Checking if the data is being fetched
-    if not spreturninfo90years:
-        print("No data found in spreturninfo90years table.")
-    else:
-        print(f"Retrieved {len(spreturninfo90years)} records.")
-
-        # Checking if the data is being fetched
-    if not spreturn_data:
-        print("No data found in spinfo table.")
+        inputs = form.cleaned_data if form.is_valid() else INITIAL_VALUES
     else:
-        print(f"Retrieved {len(spreturn_data)} records.")
-
-    
-    # Creating dictionaries from the queryset
-    SP500 = {data.year: data.spreturn for data in spreturn_data}
-    SP500_dividend = {data.year: data.return_divident for data in spreturn_data}
-    print("SP500 Data :" )
-    print(SP500)
-    print("SP500 Dividend Data :" )
-    print( SP500_dividend)
+        form = SPReturnForm(initial=INITIAL_VALUES)  # This will initialize the form with the initial values
+        inputs = INITIAL_VALUES
     
+    inputs = {
+        'numYears': inputs['numYears'],
+        'reccuringDeposit': inputs['reccuringDeposit'],
+        'startingInvest': inputs['startingInvest'],
+        # The amount only matters when deposits are on
+        'reccuringDepositAmount': inputs['reccuringDepositAmount'] if inputs['reccuringDeposit'] == 'Yes' else 0,
+        'inflationAdjusted': inputs['inflationAdjusted'],
+    }
+    logger.debug(f"S&P returns for {inputs}")
 
+    # Results depend only on spinfo and the inputs, so repeat views are one cache read
+    results = cached_result('spreturn', inputs, lambda version: _compute_spreturn(version, inputs))
 
-    for start_year  in range(history_begin_year, 2024 - number_of_year):
-        print("Starting Year : " + str(start_year))
-        
-        # totalReturnPercent = 0)
-        yearly_return_DD = Decimal(starting_investment)
-        yearly_return_SP = Decimal(starting_investment)
-        principal = Decimal(starting_investment)
-        recurring_deposit_amount = Decimal(recurring_deposit_amount)
-
+    context = {
+        **results,
+        'number_of_year': inputs['numYears'],
+        'form': form,
+    }
 
-        for year_offset in range(0, number_of_year):
-    
-            current_year = start_year + year_offset
-            sp_return_DD = Decimal(SP500_dividend[current_year])
-            sp_return = Decimal(SP500[current_year])
-
-            if (recurring_deposit == 'Yes'):  # if reccurant deposit is true
-               
-                yearly_return_DD += (yearly_return_DD * sp_return_DD / Decimal(100)) + recurring_deposit_amount
-                yearly_return_SP += (yearly_return_SP * sp_return / Decimal(100)) + recurring_deposit_amount
-                principal += recurring_deposit_amount
-
-            else:                
-                yearly_return_DD += yearly_return_DD * sp_return_DD / Decimal(100)
-                yearly_return_SP += yearly_return_SP * sp_return / Decimal(100)
-
-        end_year = start_year + number_of_year - 1
-        CGAR_DD = ((yearly_return_DD / Decimal(starting_investment)) ** (Decimal(1) / Decimal(number_of_year)) - Decimal(1))
-        CGAR_SP = ((yearly_return_SP / Decimal(starting_investment)) ** (Decimal(1) / Decimal(number_of_year)) - Decimal(1))
-                           
-        ReturnInfo[start_year] = [end_year, round(yearly_return_SP, 2), round(yearly_return_DD, 2), round(CGAR_SP * 100, 2), round(CGAR_DD * 100, 2)]
-        categories.append(start_year)
-        series_sp.append(round(float(yearly_return_SP), 2))
-        series_sp_DD.append(round(float(yearly_return_DD), 2))
-
-
-    print("Categories")
-    print(categories)
-    print("Series SP")
-    print(series_sp)
-    print("Series SP DD")
-    print(series_sp_DD)
+    return render(request, 'spreturn/spreturn.html', context)
 
-    
-    sp_df = pd.DataFrame.from_dict(ReturnInfo, orient='index',
-                                   columns=['End_Year', 'SP_Return', 'SP_Return_Dividend', 'CGAR', 'CGAR_Dividend'])    
 
+def _compute_spreturn(version, inputs):
+    """
+    Every window of the chosen length, looked up in the precomputed prefix table
+    With inflation adjustment, values and rates are real (in start-year dollars)
+    """
+    number_of_year = inputs['numYears']
+    starting_investment = float(inputs['startingInvest'])
+    deposit = float(inputs['reccuringDepositAmount'])
+    real = inputs['inflationAdjusted'] == 'Yes'
+
+    table = get_return_table(version)
+    if table.is_empty:
+        logger.error("No data found in spinfo table.")
+
+    start_years, values_sp = table.terminal_values(number_of_year, starting_investment, deposit, real=real)
+    _, values_dd = table.terminal_values(number_of_year, starting_investment, deposit, dividends=True, real=real)
+    cagr_sp = table.cagr(values_sp, starting_investment, number_of_year)
+    cagr_dd = table.cagr(values_dd, starting_investment, number_of_year)
+    # Money-weighted returns count the deposits as invested money; CAGR only the starting amount
+    # Real values are matched with deposits deflated the same way
+    deposits = table.deposit_schedule(number_of_year, deposit, real=real) if real else deposit
+    irr_sp = table.money_weighted_return(values_sp, starting_investment, deposits, number_of_year)
+    irr_dd = table.money_weighted_return(values_dd, starting_investment, deposits, number_of_year)
+
+    categories = start_years.tolist()
+    series_sp = np.round(values_sp, 2).tolist()
+    series_sp_DD = np.round(values_dd, 2).tolist()
+    ReturnInfo = {
+        start_year: [start_year + number_of_year - 1, sp, dd, *rates]
+        for start_year, sp, dd, *rates in zip(
+            categories, series_sp, series_sp_DD,
+            np.round(cagr_sp * 100, 2).tolist(), np.round(cagr_dd * 100, 2).tolist(),
+            np.round(irr_sp * 100, 2).tolist(), np.round(irr_dd * 100, 2).tolist()
+        )
+    }
 
     # Calculate statistics
     sp_return_stats = {
-        'sp_min': sp_df["SP_Return"].min(),
-        'sp_max': sp_df["SP_Return"].max(),
-        'sp_mean': round(sp_df["SP_Return"].mean(), 2),
-        'sp_div_min': sp_df["SP_Return_Dividend"].min(),
-        'sp_div_max': sp_df["SP_Return_Dividend"].max(),
-        'sp_div_mean': round(sp_df["SP_Return_Dividend"].mean(), 2)
+        'sp_min': min(series_sp, default=None),
+        'sp_max': max(series_sp, default=None),
+        'sp_mean': round(sum(series_sp) / len(series_sp), 2) if series_sp else None,
+        'sp_div_min': min(series_sp_DD, default=None),
+        'sp_div_max': max(series_sp_DD, default=None),
+        'sp_div_mean': round(sum(series_sp_DD) / len(series_sp_DD), 2) if series_sp_DD else None
     }
 
-    context = {
+    return {
         'Returndict': ReturnInfo,
         'categories': categories,
         'SP': series_sp,
         'SP_DD': series_sp_DD,
-        'number_of_year': number_of_year,
-        'form': SPReturnForm,
+        'real': real,
         **sp_return_stats  # Merge dictionaries
     }
 
-    return render(request, 'spreturn/spreturn.html', context)
-
 def spreturn_insights(request):
-    starting_investment = 1.0  # Initialize as float
+    context = cached_result('spreturn_insights', {}, _compute_insights)
+    return render(request, 'spreturn/sp_insights.html', context)
 
-    # Fetch all SP500 return information from the database, ordered by year
-    sp_info_queryset = spinfo.objects.all().order_by('year')
 
-    # Convert queryset to DataFrame for efficient processing
-    sp_info_df = pd.DataFrame(list(sp_info_queryset.values('year', 'return_divident', 'spreturn')))
+def _compute_insights(version):
+    # Fetch all SP500 return information as a prefix table
+    table = get_return_table(version)
 
-    if sp_info_df.empty:
+    if table.is_empty:
         logger.error("No S&P return data available.")
-        context = {
+        return {
             'error': "No S&P return data available."
         }
-        return render(request, 'spreturn/sp_insights.html', context)
-
-    # Ensure that 'year' is sorted
-    sp_info_df.sort_values('year', inplace=True)
-    sp_info_df.reset_index(drop=True, inplace=True)
-
-    # Determine the available year range dynamically
-    min_year = sp_info_df['year'].min()
-    max_year = sp_info_df['year'].max()
-    total_years = max_year - min_year + 1
-
-    # Check for consecutive years; handle missing years
-    expected_years = set(range(min_year, max_year + 1))
-    actual_years = set(sp_info_df['year'])
-    missing_years = expected_years - actual_years
 
+    missing_years = set(range(table.first_year, table.last_year + 1)) - set(table.year_index)
     if missing_years:
+        # Periods spanning a missing year are skipped
         logger.warning(f"Missing data for years: {sorted(missing_years)}")
-        # Decide how to handle missing years; for simplicity, skip incomplete periods
-
-    # Convert 'return_divident' and 'spreturn' to float to ensure consistency
-    sp_dividend_dict = sp_info_df.set_index('year')['return_divident'].apply(float).to_dict()
-    sp_return_dict = sp_info_df.set_index('year')['spreturn'].apply(float).to_dict()
-
-    spreturn_summary = {}
-
-    # Iterate over each possible investment period
-    for period in range(1, total_years + 1):
-        returns = []
-
-        # Iterate over possible starting years
-        for start_year in range(min_year, max_year - period + 2):
-            end_year = start_year + period - 1
-
-            # Check if all years in the period are present
-            period_years = range(start_year, end_year + 1)
-            if not set(period_years).issubset(actual_years):
-                logger.debug(f"Skipping period {start_year}-{end_year} due to missing data.")
-                continue  # Skip periods with missing data
-
-            # Initialize investment amounts as float
-            investment_sp = starting_investment
-            investment_sp_div = starting_investment
-
-            # Calculate compounded returns over the period
-            for year in period_years:
-                return_sp = sp_return_dict.get(year, 0.0)          # float
-                return_sp_div = sp_dividend_dict.get(year, 0.0)    # float
-
-                investment_sp *= (1 + return_sp / 100)            # float *= float
-                investment_sp_div *= (1 + return_sp_div / 100)    # float *= float
-
-            # Calculate CAGR (Compound Annual Growth Rate)
-            try:
-                cagr_sp = (investment_sp / starting_investment) ** (1 / period) - 1
-                cagr_sp_div = (investment_sp_div / starting_investment) ** (1 / period) - 1
-            except (ArithmeticError, ZeroDivisionError) as e:
-                logger.error(f"Error calculating CAGR for period {period} years: {e}")
-                continue  # Skip this period if there's an error
-
-            # Append the results
-            returns.append({
-                'End_Year': end_year,
-                'SP_Return': round(investment_sp, 2),
-                'SP_Return_Dividend': round(investment_sp_div, 2),
-                'CAGR_SP': round(cagr_sp * 100, 2),
-                'CAGR_SP_Dividend': round(cagr_sp_div * 100, 2)
-            })
-
-        if not returns:
-            logger.debug(f"No valid data for investment period: {period} years.")
-            continue  # Skip if no returns calculated for this period
-
-        # Convert to DataFrame for statistical calculations
-        returns_df = pd.DataFrame(returns)
-
-        # Calculate min, avg, max for SP_Return_Dividend
-        min_return = returns_df['SP_Return_Dividend'].min()
-        avg_return = round(returns_df['SP_Return_Dividend'].mean(), 2)
-        max_return = returns_df['SP_Return_Dividend'].max()
-
-        # Log the calculated statistics
-        logger.debug(f"Period: {period} years")
-        logger.debug(f"Min SP Dividend Return: {min_return}")
-        logger.debug(f"Max SP Dividend Return: {max_return}")
-        logger.debug(f"Avg SP Dividend Return: {avg_return}")
-
-        # Store summary statistics
-        spreturn_summary[period] = {
-            'min': min_return,
-            'avg': avg_return,
-            'max': max_return
-        }
+
+    # Min, avg and max ending value of 1 invested (with dividends) for every period length
+    spreturn_summary = table.period_summary(dividends=True)
 
     # Prepare data for the template
     years_invest = list(spreturn_summary.keys())
@@ -275,16 +158,63 @@ def spreturn_insights(request):
     series_avg_json = json.dumps(series_avg)
     series_max_json = json.dumps(series_max)
 
-    context = {
+    return {
         'SPReturnSummary': spreturn_summary,
         'years_invest': years_invest_json,
         'series_min': series_min_json,
         'series_avg': series_avg_json,
         'series_max': series_max_json,
-        'max_investment_period': total_years,
+        'max_investment_period': table.max_period,
     }
 
-    return render(request, 'spreturn/sp_insights.html', context)
+def spreturn_simulation(request):
+    if request.method == "POST":
+        form = SPSimulationForm(request.POST)
+        inputs = form.cleaned_data if form.is_valid() else SIMULATION_INITIAL_VALUES
+    else:
+        form = SPSimulationForm(initial=SIMULATION_INITIAL_VALUES)
+        inputs = SIMULATION_INITIAL_VALUES
+
+    inputs = {field: inputs[field] for field in SIMULATION_INITIAL_VALUES}
+    logger.debug(f"S&P simulation for {inputs}")
+
+    results = cached_result('spreturn_simulation', inputs, lambda version: _compute_simulation(version, inputs))
+
+    context = {
+        **results,
+        'number_of_year': inputs['numYears'],
+        'form': form,
+    }
+    return render(request, 'spreturn/sp_simulation.html', context)
+
+
+def _compute_simulation(version, inputs):
+    """Percentile bands of block-bootstrapped paths over the dividend returns"""
+    table = get_return_table(version)
+    if table.is_empty:
+        logger.error("No S&P return data available.")
+        return {
+            'error': "No S&P return data available."
+        }
+
+    simulation = simulate_table(
+        table,
+        inputs['numYears'],
+        paths=inputs['numPaths'],
+        block_size=inputs['blockSize'],
+        starting=float(inputs['startingInvest']),
+        deposit=float(inputs['reccuringDepositAmount']),
+        adjust_for_inflation=inputs['adjustInflation'] == 'Yes',
+        seed=SIMULATION_SEED,
+    )
+
+    return {
+        'simulation': simulation,
+        'years': json.dumps(simulation['years']),
+        'bands': json.dumps(simulation['bands']),
+        'first_year': table.first_year,
+        'last_year': table.last_year,
+    }
 
 def add_sp_info(request):
     SPInfoFormSet = modelformset_factory(spinfo, form=SPInfoForm, extra=5)
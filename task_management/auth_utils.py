@@ -4,19 +4,25 @@ from django.conf import settings
 from django.shortcuts import redirect, HttpResponse
 from django.utils import timezone
 from core.models import UserToken
+from core.http_client import get_session
 import logging
 from django.contrib.auth.decorators import login_required
 
 logger = logging.getLogger(__name__)
 
-# Microsoft OAuth handlers (unchanged)
-@login_required
-def connect_microsoft(request):
-    msal_app = msal.ConfidentialClientApplication(
+def get_msal_app():
+    """Build the MSAL client on the shared Microsoft session so token calls reuse pooled connections"""
+    return msal.ConfidentialClientApplication(
         client_id=settings.MICROSOFT_AUTH['CLIENT_ID'],
         client_credential=settings.MICROSOFT_AUTH['CLIENT_SECRET'],
-        authority=settings.MICROSOFT_AUTH['AUTHORITY']
+        authority=settings.MICROSOFT_AUTH['AUTHORITY'],
+        http_client=get_session('microsoft')
     )
+
+# Microsoft OAuth handlers (unchanged)
+@login_required
+def connect_microsoft(request):
+    msal_app = get_msal_app()
     auth_url = msal_app.get_authorization_request_url(
         scopes=settings.MICROSOFT_AUTH['SCOPE'],
         redirect_uri=settings.MICROSOFT_AUTH['REDIRECT_URI'],
@@ -33,11 +39,7 @@ def microsoft_callback(request):
         logger.error(f"Microsoft callback error: {error} - {error_description}")
         return HttpResponse(f"Authentication failed: {error_description}", status=400)
 
-    msal_app = msal.ConfidentialClientApplication(
-        client_id=settings.MICROSOFT_AUTH['CLIENT_ID'],
-        client_credential=settings.MICROSOFT_AUTH['CLIENT_SECRET'],
-        authority=settings.MICROSOFT_AUTH['AUTHORITY']
-    )
+    msal_app = get_msal_app()
     result = msal_app.acquire_token_by_authorization_code(
         code=code, scopes=settings.MICROSOFT_AUTH["SCOPE"],
         redirect_uri=settings.MICROSOFT_AUTH["REDIRECT_URI"]
@@ -67,11 +69,7 @@ def refresh_microsoft_token(user_token):
     Updates the UserToken model with the new access token and expiry.
     Returns the new access token or None if refresh fails.
     """
-    msal_app = msal.ConfidentialClientApplication(
-        client_id=settings.MICROSOFT_AUTH['CLIENT_ID'],
-        client_credential=settings.MICROSOFT_AUTH['CLIENT_SECRET'],
-        authority=settings.MICROSOFT_AUTH['AUTHORITY']
-    )
+    msal_app = get_msal_app()
 
     result = msal_app.acquire_token_by_refresh_token(
         refresh_token=user_token.refresh_token,
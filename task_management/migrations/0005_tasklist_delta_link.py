@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task_management', '0004_remove_task_task_manage_source_13f0ef_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tasklist',
+            name='delta_link',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
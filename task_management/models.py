@@ -16,6 +16,8 @@ class TaskList(models.Model):
     list_code = models.CharField(max_length=500, null=True)
     list_type = models.CharField(max_length=20, choices=LIST_TYPE_CHOICES, default='normal')  # Replace special_list
     list_source = models.CharField(max_length=50, null=True, blank=True)
+    # Microsoft Graph delta link the next sync of this list starts from
+    delta_link = models.TextField(null=True, blank=True)
 
     def __str__(self):
         return self.list_name
@@ -65,6 +67,7 @@ class Task(models.Model):
         unique_together = ('source', 'source_id')
         indexes = [
             models.Index(fields=['user', 'task_completed', 'due_date']),
+            models.Index(fields=['user', 'source', 'source_id']),
         ]
         
 class Image(models.Model):
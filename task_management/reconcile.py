@@ -0,0 +1,136 @@
+# reconcile.py
+from django.db import transaction
+from django.utils import timezone
+from .models import Task
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Report label of each task source
+PROVIDER_NAMES = {
+    'google': 'Google Tasks',
+    'microsoft': 'Microsoft To Do',
+}
+
+# Task fields a sync may change on an existing task
+SYNCED_TASK_FIELDS = ['task_name', 'task_description', 'task_completed', 'due_date', 'last_update_date']
+SYNC_BATCH_SIZE = 500
+
+
+def load_existing_tasks(user, source):
+    """Every task the user has from a source, in one query, keyed by source_id"""
+    existing_tasks = {
+        task.source_id: task
+        for task in Task.objects.filter(user=user, source=source).select_related('list_name')
+    }
+    logger.info(f"Loaded {len(existing_tasks)} existing {source} tasks for {user.username}")
+    return existing_tasks
+
+
+def reconcile_tasks(user, source, task_list, records, existing_tasks):
+    """
+    Diff normalized remote task records against the user's tasks and write the result
+    Each record holds source_id plus the SYNCED_TASK_FIELDS values from the
+    provider (task_name, task_description, task_completed, due_date).
+    existing_tasks comes from load_existing_tasks and is updated with the new
+    tasks, so a task seen twice in one sync is created once. All writes for the
+    list are one bulk_create and one bulk_update in a single transaction; bulk
+    writes don't send post_save, so synced changes are never pushed back out
+    Returns the list of report entries
+    """
+    provider = PROVIDER_NAMES[source]
+    updates = []
+    new_tasks = []
+    changed_tasks = {}  # By primary key, so a task changed twice is written once
+    now = timezone.now()
+
+    for record in records:
+        fields = dict(record)
+        source_id = fields.pop('source_id')
+        existing_task = existing_tasks.get(source_id)
+
+        if existing_task is None:
+            logger.info(f"Creating new {provider} task '{fields['task_name']}' with completed={fields['task_completed']}")
+            new_task = Task(
+                user=user,
+                list_name=task_list,
+                source=source,
+                source_id=source_id,
+                creation_date=now,
+                last_update_date=now,
+                **fields
+            )
+            new_tasks.append(new_task)
+            existing_tasks[source_id] = new_task
+            updates.append({
+                'provider': provider,
+                'task_name': fields['task_name'],
+                'action': 'Created',
+                'timestamp': now,
+                'list_name': task_list.list_name
+            })
+            continue
+
+        # Compare field by field so the report lists exactly what changed
+        updated_fields = {}
+        for field, value in fields.items():
+            if getattr(existing_task, field) != value:
+                setattr(existing_task, field, value)
+                updated_fields[field] = value
+
+        if not updated_fields:
+            continue
+        if 'due_date' in updated_fields:
+            due_date = updated_fields['due_date']
+            updated_fields['due_date'] = due_date.strftime('%Y-%m-%d') if due_date else None
+        if 'task_completed' in updated_fields:
+            logger.info(f"Updating completion status for '{fields['task_name']}' to {fields['task_completed']}")
+
+        existing_task.last_update_date = now
+        if existing_task.pk is not None:
+            changed_tasks[existing_task.pk] = existing_task
+        logger.info(f"Updated {provider} task '{fields['task_name']}' with changes: {', '.join(updated_fields.keys())}")
+        updates.append({
+            'provider': provider,
+            'task_name': fields['task_name'],
+            'action': 'Updated',
+            'timestamp': now,
+            'list_name': existing_task.list_name.list_name,
+            'updated_fields': updated_fields
+        })
+
+    with transaction.atomic():
+        if new_tasks:
+            Task.objects.bulk_create(new_tasks, batch_size=SYNC_BATCH_SIZE)
+        if changed_tasks:
+            Task.objects.bulk_update(list(changed_tasks.values()), SYNCED_TASK_FIELDS, batch_size=SYNC_BATCH_SIZE)
+
+    logger.info(f"Reconciled '{task_list.list_name}': {len(new_tasks)} created, {len(changed_tasks)} updated")
+    return updates
+
+
+def mark_deleted(source, tasks):
+    """
+    Mark tasks removed at the source as completed, with one bulk update
+    Tasks already completed are left alone. Returns the list of report entries
+    """
+    provider = PROVIDER_NAMES[source]
+    now = timezone.now()
+    deleted_tasks = [task for task in tasks if task.pk is not None and not task.task_completed]
+
+    updates = []
+    for deleted_task in deleted_tasks:
+        deleted_task.task_completed = True
+        deleted_task.last_update_date = now
+        logger.info(f"Marked task '{deleted_task.task_name}' as completed (deleted from {provider})")
+        updates.append({
+            'provider': provider,
+            'task_name': deleted_task.task_name,
+            'action': f"Marked as Completed (deleted from {provider.split()[0]})",
+            'timestamp': now,
+            'list_name': deleted_task.list_name.list_name
+        })
+
+    if deleted_tasks:
+        Task.objects.bulk_update(deleted_tasks, ['task_completed', 'last_update_date'], batch_size=SYNC_BATCH_SIZE)
+    return updates
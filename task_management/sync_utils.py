@@ -2,6 +2,7 @@
 from django.conf import settings
 from django.utils import timezone
 from .models import Task, TaskList,  TaskSyncStatus
+from .reconcile import load_existing_tasks, reconcile_tasks, mark_deleted
 from core.models import UserToken
 from .utils import get_google_service, get_ms_access_token, generate_sync_report
 from googleapiclient.discovery import build
@@ -12,12 +13,15 @@ import requests
 import json
 import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from google.cloud import tasks_v2
 from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.models import User
 from datetime import datetime
 from core.utils import send_email
+from core.http_client import get_session, get_rate_limiter
 from .auth_utils import is_token_expired, refresh_microsoft_token    
 
 
@@ -25,6 +29,271 @@ from .auth_utils import is_token_expired, refresh_microsoft_token
 
 logger = logging.getLogger(__name__)
 
+MS_TODO_LISTS_URL = "https://graph.microsoft.com/v1.0/me/todo/lists"
+
+# Lists fetched at once per sync; provider rate limits are shared across workers
+TASK_SYNC_MAX_WORKERS = getattr(settings, 'TASK_SYNC_MAX_WORKERS', 8)
+
+# Google API clients aren't thread-safe, so each fetch worker builds its own
+_google_clients = threading.local()
+
+
+def _fetch_concurrently(fetch_list, task_lists, provider):
+    """
+    Run fetch_list for every remote list on a bounded thread pool
+    Only network calls run in the workers; results come back in list order
+    for the caller to reconcile on its own thread
+    """
+    if not task_lists:
+        return []
+    
+    max_workers = max(1, min(TASK_SYNC_MAX_WORKERS, len(task_lists)))
+    logger.info(f"Fetching {len(task_lists)} {provider} lists with {max_workers} workers")
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f'{provider}-sync') as executor:
+        return list(executor.map(fetch_list, task_lists))
+
+
+def _thread_google_service(creds):
+    """Google Tasks client for the current thread, built once per thread and credentials"""
+    if getattr(_google_clients, 'creds', None) is not creds:
+        _google_clients.service = build('tasks', 'v1', credentials=creds, cache=None)
+        _google_clients.creds = creds
+    return _google_clients.service
+
+
+def _list_google_pages(service, list_title, request_params, raise_errors=False):
+    """
+    Every item of a paginated tasks().list call
+    Stops at the first failed page, or re-raises its error with raise_errors
+    """
+    limiter = get_rate_limiter('google_tasks')
+    request_params = dict(request_params)
+    items = []
+    page_count = 0
+    
+    while True:
+        page_count += 1
+        if limiter:
+            limiter.acquire()
+        try:
+            result = service.tasks().list(**request_params).execute()
+        except Exception as e:
+            logger.error(f"Error fetching tasks from list '{list_title}': {e}")
+            if raise_errors:
+                raise
+            break
+        
+        page_items = result.get('items', [])
+        items.extend(page_items)
+        logger.info(f"Retrieved page {page_count} with {len(page_items)} tasks from '{list_title}'")
+        
+        # Check if there are more pages
+        request_params['pageToken'] = result.get('nextPageToken')
+        if not request_params['pageToken']:
+            break
+    
+    return items
+
+
+def _fetch_google_list(creds, task_list, last_synced_at):
+    """
+    Fetch one Google list's tasks changed since the last sync, deletions included
+    Deleted tasks come back as tombstones in the same pages (showDeleted), so
+    one pass sees every edit and removal. Returns (tasks, deleted_ids)
+    """
+    service = _thread_google_service(creds)
+    list_title = task_list.get('title', 'Unnamed List')
+    
+    # Build the request parameters
+    request_params = {
+        'tasklist': task_list.get('id'),
+        'showCompleted': True,
+        'showHidden': True,
+        'showDeleted': True,
+        'maxResults': 100
+    }
+    
+    # Add updatedMin parameter if we have a last sync time
+    if last_synced_at:
+        request_params['updatedMin'] = last_synced_at.isoformat()
+        logger.info(f"Fetching tasks from '{list_title}' updated since: {request_params['updatedMin']}")
+    
+    tasks = []
+    deleted_ids = set()
+    for item in _list_google_pages(service, list_title, request_params):
+        if item.get('deleted'):
+            deleted_ids.add(item['id'])
+        else:
+            tasks.append(item)
+    logger.info(f"Total updated tasks found in '{list_title}': {len(tasks)}, deleted: {len(deleted_ids)}")
+    
+    return tasks, deleted_ids
+
+
+def _list_google_task_ids(creds, task_list):
+    """Every live task ID in one Google list, requesting nothing but the IDs"""
+    service = _thread_google_service(creds)
+    items = _list_google_pages(service, task_list.get('title', 'Unnamed List'), {
+        'tasklist': task_list.get('id'),
+        'showCompleted': True,
+        'showHidden': True,
+        'maxResults': 100,
+        'fields': 'items(id),nextPageToken'  # Only request IDs to minimize data transfer
+    }, raise_errors=True)  # A partial listing would read as deletions
+    return {item['id'] for item in items}
+
+
+def _get_microsoft_task_list(user, ms_list):
+    """Create or get the TaskList mirroring a Microsoft To Do list"""
+    list_display_name = ms_list.get("displayName", "Unnamed List")
+    list_id = str(ms_list["id"])
+    
+    if list_display_name == "Tasks":
+        ms_task_list, created = TaskList.objects.get_or_create(
+            user=user,
+            list_code=list_id,
+            defaults={
+                'list_name': "MS Tasks",
+                'list_type': 'microsoft_primary',
+                'list_source': 'Microsoft'
+            }
+        )
+    else:
+        ms_task_list, created = TaskList.objects.get_or_create(
+            user=user,
+            list_code=list_id,
+            defaults={
+                'list_name': f"MS {list_display_name}",
+                'list_type': 'normal',
+                'list_source': 'Microsoft'
+            }
+        )
+    return ms_task_list
+
+
+def _fetch_microsoft_list(headers, ms_list, delta_link):
+    """
+    Fetch one Microsoft list's changes through its Graph delta query
+    Starts from the list's saved delta link, or enumerates the whole list when
+    there is none (or Graph has expired it). Returns a dictionary with the
+    changed items, the IDs removed, the link to start from next time (None if
+    the fetch failed) and whether the list was fully enumerated in this fetch
+    """
+    list_display_name = ms_list.get("displayName", "Unnamed List")
+    list_id = str(ms_list["id"])
+    limiter = get_rate_limiter('microsoft')
+    
+    initial_link = f"{MS_TODO_LISTS_URL}/{list_id}/tasks/delta"
+    next_link = delta_link or initial_link
+    full = delta_link is None
+    items = []
+    removed_ids = set()
+    page_count = 0
+    max_pages = getattr(settings, 'MS_SYNC_MAX_PAGES', 30)
+    
+    def result(resume_link, complete):
+        return {
+            'items': items,
+            'removed_ids': removed_ids,
+            'resume_link': resume_link,
+            'full': full and complete,
+        }
+    
+    while next_link and page_count < max_pages:
+        page_count += 1
+        if limiter:
+            limiter.acquire()
+        try:
+            tasks_response = get_session('microsoft').get(next_link, headers=headers, timeout=30)
+            if tasks_response.status_code == 410 and not full:
+                # Graph no longer holds the saved sync state; enumerate the list again
+                logger.warning(f"Delta link for '{list_display_name}' expired, re-enumerating the list")
+                next_link, full = initial_link, True
+                items, removed_ids = [], set()
+                continue
+            tasks_response.raise_for_status()
+            tasks_data = tasks_response.json()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error fetching tasks from list '{list_display_name}': {e}")
+            return result(None, False)
+        
+        for task_item in tasks_data.get("value", []):
+            if "@removed" in task_item:
+                removed_ids.add(task_item["id"])
+            else:
+                items.append(task_item)
+        logger.info(f"Retrieved delta page {page_count} from '{list_display_name}'")
+        
+        if "@odata.deltaLink" in tasks_data:
+            logger.info(
+                f"Delta for '{list_display_name}': {len(items)} changed, {len(removed_ids)} removed"
+            )
+            return result(tasks_data["@odata.deltaLink"], True)
+        next_link = tasks_data.get("@odata.nextLink")
+    
+    # Page limit reached: the next sync carries on from this page
+    logger.info(f"Reached page limit ({max_pages}) for '{list_display_name}', resuming next sync")
+    return result(next_link, False)
+
+
+def _parse_google_task(task):
+    """Normalize a Google Tasks item into a reconcile record"""
+    task_title = task.get('title', 'No Title')
+    
+    # Google uses 'status' field with values 'needsAction' or 'completed'
+    raw_status = task.get('status', 'needsAction')
+    is_completed = raw_status == 'completed'
+    logger.debug(f"Task '{task_title}' status from Google: {raw_status}, interpreted as completed={is_completed}")
+    
+    due_date_raw = task.get('due')
+    due_date = None
+    if due_date_raw:
+        try:
+            due_date = datetime.fromisoformat(due_date_raw.replace('Z', '+00:00'))
+        except Exception as e:
+            logger.warning(f"Failed to parse due date for task '{task_title}': {e}")
+    
+    return {
+        'source_id': task.get('id'),
+        'task_name': task_title,
+        'task_description': task.get('notes', ''),
+        'task_completed': is_completed,
+        'due_date': due_date,
+    }
+
+
+def _parse_microsoft_task(task_item):
+    """Normalize a Microsoft To Do item into a reconcile record"""
+    title = task_item.get("title", "Untitled")
+    
+    # Microsoft uses 'status' field with 'completed' for completed tasks
+    raw_status = task_item.get("status", "notStarted")
+    is_completed = raw_status == 'completed'
+    logger.debug(f"Task '{title}' status from Microsoft: {raw_status}, interpreted as completed={is_completed}")
+    
+    # Handle due date
+    due_date_raw = task_item.get("dueDateTime")
+    due_date = None
+    if due_date_raw and "dateTime" in due_date_raw:
+        try:
+            naive_due_date = date_parser.parse(due_date_raw["dateTime"])
+            due_date = timezone.make_aware(naive_due_date, timezone.get_default_timezone())
+        except Exception as e:
+            logger.warning(f"Failed to parse due date for task '{title}': {e}")
+    
+    # Get task notes/description
+    task_notes = ""
+    if task_item.get("body") and task_item["body"].get("content"):
+        task_notes = task_item["body"]["content"]
+    
+    return {
+        'source_id': task_item["id"],
+        'task_name': title,
+        'task_description': task_notes,
+        'task_completed': is_completed,
+        'due_date': due_date,
+    }
+
 
 # Fetch and save Google Tasks
 def fetch_google_tasks_and_save(user, creds):
@@ -47,10 +316,19 @@ def fetch_google_tasks_and_save(user, creds):
             logger.error(f"Error fetching Google task lists: {e}")
             return [{'provider': 'Google Tasks', 'error': str(e), 'action': 'Error', 'timestamp': timezone.now()}]
         
-        # Track all task IDs processed in this sync
+        # Track all task IDs processed in this sync, and the tombstones seen alongside them
         all_synced_task_ids = set()
+        all_deleted_ids = set()
+        
+        # Every Google task the user has, in one query; each list is diffed against it in memory
+        existing_tasks = load_existing_tasks(user, 'google')
+        
+        # Fetch every list concurrently, then reconcile them here one by one
+        fetched = _fetch_concurrently(
+            lambda task_list: _fetch_google_list(creds, task_list, last_synced_at), task_lists, 'google'
+        )
         
-        for task_list in task_lists:
+        for task_list, (all_tasks, deleted_ids) in zip(task_lists, fetched):
             list_title = task_list.get('title', 'Unnamed List')
             list_id = task_list.get('id')
             
@@ -88,205 +366,31 @@ def fetch_google_tasks_and_save(user, creds):
                 else:
                     logger.info(f"Using existing Google list '{google_task_list.list_name}'")
             
-            # Build the request parameters
-            request_params = {
-                'tasklist': list_id,
-                'showCompleted': True,
-                'showHidden': True,
-                'maxResults': 100
-            }
-            
-            # Add updatedMin parameter if we have a last sync time
-            if last_synced_at:
-                updated_min = last_synced_at.isoformat()
-                request_params['updatedMin'] = updated_min
-                logger.info(f"Fetching tasks updated since: {updated_min}")
-            
-            # Get tasks that have been updated since last sync
-            all_tasks = []
-            
-            # Handle pagination for tasks
-            page_token = None
-            page_count = 0
-            
-            while True:
-                page_count += 1
-                if page_token:
-                    request_params['pageToken'] = page_token
-                
-                try:
-                    tasks_results = service.tasks().list(**request_params).execute()
-                    items = tasks_results.get('items', [])
-                    all_tasks.extend(items)
-                    
-                    logger.info(f"Retrieved page {page_count} with {len(items)} tasks from '{list_title}'")
-                    
-                    # Debug each task status
-                    for task in items:
-                        logger.debug(f"Task '{task.get('title', 'No Title')}' status: {task.get('status')}")
-                    
-                    # Check if there are more pages
-                    page_token = tasks_results.get('nextPageToken')
-                    if not page_token:
-                        break
-                except Exception as e:
-                    logger.error(f"Error fetching tasks from list '{list_title}': {e}")
-                    break
-            
-            logger.info(f"Total updated tasks found in '{list_title}': {len(all_tasks)}")
-            
-            # Process the tasks
+            # Diff and write this list's tasks in bulk
+            records = []
             for task in all_tasks:
                 if not task.get('title'):
                     logger.warning("Skipping task without title")
                     continue
-                    
-                google_task_id = task.get('id')
-                all_synced_task_ids.add(google_task_id)
-                
-                task_title = task.get('title', 'No Title')
-                
-                # Google uses 'status' field with values 'needsAction' or 'completed'
-                raw_status = task.get('status', 'needsAction')
-                is_completed = raw_status == 'completed'
-                logger.debug(f"Task '{task_title}' status from Google: {raw_status}, interpreted as completed={is_completed}")
-                
-                task_notes = task.get('notes', '')
-                
-                due_date_raw = task.get('due')
-                due_date = None
-                if due_date_raw:
-                    try:
-                        due_date = datetime.fromisoformat(due_date_raw.replace('Z', '+00:00'))
-                    except Exception as e:
-                        logger.warning(f"Failed to parse due date for task '{task_title}': {e}")
-                
-                existing_task = Task.objects.filter(user=user, source_id=google_task_id, source='google').first()
-                if existing_task:
-                    # Update existing task
-                    updated = False
-                    updated_fields = {}
-                    
-                    if existing_task.task_name != task_title:
-                        updated_fields['task_name'] = task_title
-                        existing_task.task_name = task_title
-                        updated = True
-                    
-                    if existing_task.task_description != task_notes:
-                        updated_fields['task_description'] = task_notes
-                        existing_task.task_description = task_notes
-                        updated = True
-                    
-                    # Explicitly log the completion status comparison
-                    logger.debug(f"Task '{task_title}': DB status={existing_task.task_completed}, Google status={is_completed}")
-                    if existing_task.task_completed != is_completed:
-                        updated_fields['task_completed'] = is_completed
-                        existing_task.task_completed = is_completed
-                        updated = True
-                        logger.info(f"Updating completion status for '{task_title}' to {is_completed}")
-                    
-                    if existing_task.due_date != due_date:
-                        updated_fields['due_date'] = due_date.strftime('%Y-%m-%d') if due_date else None
-                        existing_task.due_date = due_date
-                        updated = True
-                    
-                    if updated:
-                        existing_task.last_update_date = timezone.now()
-                        existing_task.save()
-                        logger.info(f"Updated Google task '{task_title}' with changes: {', '.join(updated_fields.keys())}")
-                        updates.append({
-                            'provider': 'Google Tasks',
-                            'task_name': task_title,
-                            'action': 'Updated',
-                            'timestamp': timezone.now(),
-                            'list_name': existing_task.list_name.list_name,
-                            'updated_fields': updated_fields
-                        })
-                else:
-                    # Create new task
-                    logger.info(f"Creating new Google task '{task_title}' with completed={is_completed}")
-                    new_task = Task.objects.create(
-                        user=user, 
-                        task_name=task_title, 
-                        task_completed=is_completed,
-                        task_description=task_notes,
-                        due_date=due_date,
-                        list_name=google_task_list, 
-                        source_id=google_task_id, 
-                        source='google',
-                        creation_date=timezone.now(), 
-                        last_update_date=timezone.now()
-                    )
-                    updates.append({
-                        'provider': 'Google Tasks',
-                        'task_name': task_title,
-                        'action': 'Created',
-                        'timestamp': timezone.now(),
-                        'list_name': google_task_list.list_name
-                    })
-            
-            # If this is the first sync (no last_synced_at), we need to get a complete picture
-            # to properly handle deletions
-            if not last_synced_at:
-                logger.info("First sync detected - getting all task IDs to establish baseline")
-                
-                # Get all task IDs from this list to establish a baseline
-                all_task_ids_request = {
-                    'tasklist': list_id,
-                    'showCompleted': True,
-                    'showHidden': True,
-                    'maxResults': 100,
-                    'fields': 'items(id)'  # Only request ID field to minimize data transfer
-                }
-                
-                # Handle pagination
-                all_google_task_ids = set()
-                next_page_token = None
-                
-                while True:
-                    if next_page_token:
-                        all_task_ids_request['pageToken'] = next_page_token
-                    
-                    try:
-                        result = service.tasks().list(**all_task_ids_request).execute()
-                        for task in result.get('items', []):
-                            all_google_task_ids.add(task['id'])
-                        
-                        next_page_token = result.get('nextPageToken')
-                        if not next_page_token:
-                            break
-                    except Exception as e:
-                        logger.error(f"Error fetching all task IDs from list '{list_title}': {e}")
-                        break
-                
-                # Update our tracking set with ALL task IDs from this list
-                all_synced_task_ids.update(all_google_task_ids)
-                logger.info(f"Total task IDs found in list '{list_title}': {len(all_google_task_ids)}")
-        
-        # Only check for deletions if this is the first sync or explicitly requested
-        # Otherwise, we can skip the deletion check as we're only processing modifications
-        if not last_synced_at:
-            # Now detect deletions - find tasks in DB that weren't in the API response
-            deleted_tasks = Task.objects.filter(
-                user=user, source='google'
-            ).exclude(source_id__in=all_synced_task_ids)
-            
-            logger.info(f"Found {deleted_tasks.count()} tasks to mark as deleted (completed)")
+                all_synced_task_ids.add(task.get('id'))
+                records.append(_parse_google_task(task))
             
-            # Handle the deleted tasks
-            for deleted_task in deleted_tasks:
-                # Only mark as completed if not already completed
-                if not deleted_task.task_completed:
-                    deleted_task.task_completed = True
-                    deleted_task.save()
-                    logger.info(f"Marked task '{deleted_task.task_name}' as completed (deleted from Google)")
-                    updates.append({
-                        'provider': 'Google Tasks',
-                        'task_name': deleted_task.task_name,
-                        'action': 'Marked as Completed (deleted from Google)',
-                        'timestamp': timezone.now(),
-                        'list_name': deleted_task.list_name.list_name
-                    })
+            updates.extend(reconcile_tasks(user, 'google', google_task_list, records, existing_tasks))
+            all_deleted_ids.update(deleted_ids)
+        
+        if last_synced_at:
+            # Tombstones from the changed-since pages; a task moved to another list is live there
+            deleted_tasks = [
+                existing_tasks[source_id] for source_id in all_deleted_ids - all_synced_task_ids
+                if source_id in existing_tasks
+            ]
+        else:
+            # A first sync returned every live task, so anything else we hold is gone
+            deleted_tasks = [
+                task for source_id, task in existing_tasks.items() if source_id not in all_synced_task_ids
+            ]
+        logger.info(f"Found {len(deleted_tasks)} Google tasks no longer at the source")
+        updates.extend(mark_deleted('google', deleted_tasks))
         
         # Update last_synced_at timestamp
         token_record.last_synced_at = datetime.now(timezone.utc)
@@ -303,6 +407,43 @@ def fetch_google_tasks_and_save(user, creds):
         return [{'provider': 'Google Tasks', 'error': str(e), 'action': 'Error', 'timestamp': timezone.now()}]
 
 # Fetch and save Microsoft Tasks
+def reconcile_google_deletions(user, creds):
+    """
+    Catch Google deletions the incremental sync missed, e.g. tombstones that
+    expired before the next sync. Lists only task IDs from Google and diffs
+    them as a set against the user's open Google tasks
+    Returns the list of report entries
+    """
+    logger.info(f"Starting Google Tasks deletion reconcile for user: {user.username}")
+    service = build('tasks', 'v1', credentials=creds, cache=None)
+    
+    # Every list must be seen, or its tasks would read as deleted
+    task_lists = []
+    request_params = {'maxResults': 100}
+    while True:
+        result = service.tasklists().list(**request_params).execute()
+        task_lists.extend(result.get('items', []))
+        request_params['pageToken'] = result.get('nextPageToken')
+        if not request_params['pageToken']:
+            break
+    
+    fetched = _fetch_concurrently(lambda task_list: _list_google_task_ids(creds, task_list), task_lists, 'google')
+    remote_ids = set().union(*fetched)
+    
+    local_ids = set(
+        Task.objects.filter(user=user, source='google', task_completed=False).values_list('source_id', flat=True)
+    )
+    missing_ids = local_ids - remote_ids
+    logger.info(f"Found {len(missing_ids)} of {len(local_ids)} open Google tasks no longer at the source")
+    if not missing_ids:
+        return []
+    
+    deleted_tasks = Task.objects.filter(
+        user=user, source='google', source_id__in=missing_ids
+    ).select_related('list_name')
+    return mark_deleted('google', deleted_tasks)
+
+
 def fetch_microsoft_tasks_and_save(user, access_token):
     updates = []
     logger.info(f"Starting Microsoft Tasks sync for user: {user.username}")
@@ -316,10 +457,8 @@ def fetch_microsoft_tasks_and_save(user, access_token):
         
         # Step 1: Get all Microsoft task lists
         logger.info("Fetching Microsoft To Do lists")
-        todo_lists_url = "https://graph.microsoft.com/v1.0/me/todo/lists"
-        
         try:
-            response = requests.get(todo_lists_url, headers=headers, timeout=30)
+            response = get_session('microsoft').get(MS_TODO_LISTS_URL, headers=headers, timeout=30)
             response.raise_for_status()
             microsoft_lists = response.json().get("value", [])
             logger.info(f"Found {len(microsoft_lists)} Microsoft To Do lists")
@@ -330,168 +469,60 @@ def fetch_microsoft_tasks_and_save(user, access_token):
         # Track all task IDs processed in this sync
         all_synced_task_ids = set()
         
-        # Process each task list
-        for ms_list in microsoft_lists:
+        # Every Microsoft task the user has, in one query; each list is diffed against it in memory
+        existing_tasks = load_existing_tasks(user, 'microsoft')
+        
+        # Lists first, so every fetch can start from its list's saved delta link
+        ms_task_lists = [_get_microsoft_task_list(user, ms_list) for ms_list in microsoft_lists]
+        
+        # Fetch every list concurrently, then reconcile them here one by one
+        fetched = _fetch_concurrently(
+            lambda pair: _fetch_microsoft_list(headers, pair[0], pair[1].delta_link),
+            list(zip(microsoft_lists, ms_task_lists)),
+            'microsoft'
+        )
+        removed_ids = set()
+        
+        for ms_list, ms_task_list, delta in zip(microsoft_lists, ms_task_lists, fetched):
             list_display_name = ms_list.get("displayName", "Unnamed List")
-            list_id = str(ms_list["id"])
-            
-            logger.info(f"Processing Microsoft list: '{list_display_name}' (ID: {list_id})")
+            logger.info(f"Processing Microsoft list: '{list_display_name}' (ID: {ms_task_list.list_code})")
             
-            # Create or get the appropriate TaskList in the database
-            if list_display_name == "Tasks":
-                ms_task_list, created = TaskList.objects.get_or_create(
-                    user=user,
-                    list_code=list_id,
-                    defaults={
-                        'list_name': "MS Tasks",
-                        'list_type': 'microsoft_primary',
-                        'list_source': 'Microsoft'
-                    }
-                )
-            else:
-                ms_task_list, created = TaskList.objects.get_or_create(
-                    user=user,
-                    list_code=list_id,
-                    defaults={
-                        'list_name': f"MS {list_display_name}",
-                        'list_type': 'normal',
-                        'list_source': 'Microsoft'
-                    }
-                )
-            
-            # Build the filter query using last_synced_at
-            filter_query = ""
-            if last_synced_at:
-                # Format the date according to Microsoft Graph API requirements
-                last_sync_str = last_synced_at.replace(microsecond=0).isoformat().replace('+00:00', 'Z')
-                filter_query = f"?$filter=lastModifiedDateTime ge {last_sync_str}"
-                logger.info(f"Filtering tasks modified since: {last_sync_str}")
-            
-            # Fetch tasks that have been changed since last sync
-            tasks_url = f"https://graph.microsoft.com/v1.0/me/todo/lists/{list_id}/tasks{filter_query}"
-            
-            # Use pagination to get all modified tasks, with page limit
-            all_ms_tasks = []
-            next_link = tasks_url
-            page_count = 0
-            max_pages = getattr(settings, 'MS_SYNC_MAX_PAGES', 30)
-            
-            while next_link and page_count < max_pages:
-                page_count += 1
-                try:
-                    tasks_response = requests.get(next_link, headers=headers, timeout=30)
-                    tasks_response.raise_for_status()
-                    tasks_data = tasks_response.json()
-                    
-                    page_tasks = tasks_data.get("value", [])
-                    all_ms_tasks.extend(page_tasks)
-                    logger.info(f"Retrieved page {page_count} with {len(page_tasks)} tasks from '{list_display_name}'")
-                    
-                    next_link = tasks_data.get("@odata.nextLink")
-                except requests.exceptions.RequestException as e:
-                    logger.error(f"Error fetching tasks from list '{list_display_name}': {e}")
-                    break
-            
-            if next_link and page_count >= max_pages:
-                logger.warning(f"Reached maximum page limit ({max_pages}) when fetching MS tasks. Some tasks may not be synced.")
-                
-            logger.info(f"Total modified tasks found in '{list_display_name}': {len(all_ms_tasks)}")
-            
-            # Process tasks with more controlled error handling
-            for task_item in all_ms_tasks:
+            # Diff and write this list's tasks in bulk
+            records = []
+            for task_item in delta['items']:
                 try:
-                    ms_task_id = task_item["id"]
-                    all_synced_task_ids.add(ms_task_id)
-                    
-                    title = task_item.get("title", "Untitled")
-                    
-                    # Microsoft uses 'status' field with 'completed' for completed tasks
-                    raw_status = task_item.get("status", "notStarted")
-                    is_completed = raw_status == 'completed'
-                    
-                    # Handle due date
-                    due_date_raw = task_item.get("dueDateTime")
-                    due_date = None
-                    if due_date_raw and "dateTime" in due_date_raw:
-                        try:
-                            naive_due_date = date_parser.parse(due_date_raw["dateTime"])
-                            due_date = timezone.make_aware(naive_due_date, timezone.get_default_timezone())
-                        except Exception as e:
-                            logger.warning(f"Failed to parse due date for task '{title}': {e}")
-                    
-                    # Get task notes/description (ensure it's not too long)
-                    task_notes = ""
-                    if task_item.get("body") and task_item["body"].get("content"):
-                        task_notes = task_item["body"]["content"]
-                    
-                    # Check if task already exists
-                    existing_task = Task.objects.filter(user=user, source_id=ms_task_id, source='microsoft').first()
-                    
-                    if existing_task:
-                        # Update existing task logic
-                        updated = False
-                        updated_fields = {}
-                        
-                        if existing_task.task_name != title:
-                            existing_task.task_name = title
-                            updated_fields['task_name'] = title
-                            updated = True
-                        
-                        if existing_task.task_description != task_notes:
-                            existing_task.task_description = task_notes
-                            updated_fields['task_description'] = task_notes
-                            updated = True
-                        
-                        if existing_task.task_completed != is_completed:
-                            existing_task.task_completed = is_completed
-                            updated_fields['task_completed'] = is_completed
-                            updated = True
-                            logger.info(f"Updating completion status for '{title}' to: {is_completed}")
-                        
-                        if existing_task.due_date != due_date:
-                            existing_task.due_date = due_date
-                            updated_fields['due_date'] = due_date.strftime('%Y-%m-%d') if due_date else None
-                            updated = True
-                        
-                        if updated:
-                            existing_task.last_update_date = timezone.now()
-                            existing_task.save()
-                            logger.info(f"Updated Microsoft task '{title}' with changes: {', '.join(updated_fields.keys())}")
-                            updates.append({
-                                'provider': 'Microsoft To Do',
-                                'task_name': title,
-                                'action': 'Updated',
-                                'timestamp': timezone.now(),
-                                'list_name': ms_task_list.list_name,
-                                'updated_fields': updated_fields
-                            })
-                    else:
-                        # Create new task individually
-                        logger.info(f"Creating new Microsoft task '{title}' with completed={is_completed}")
-                        new_task = Task(
-                            user=user, 
-                            task_name=title, 
-                            task_completed=is_completed, 
-                            task_description=task_notes,
-                            due_date=due_date,
-                            list_name=ms_task_list, 
-                            source='microsoft', 
-                            source_id=ms_task_id,
-                            creation_date=timezone.now(), 
-                            last_update_date=timezone.now()
-                        )
-                        new_task.save()
-                        logger.info(f"Successfully created Microsoft task: {title} with ID: {ms_task_id}")
-                        updates.append({
-                            'provider': 'Microsoft To Do',
-                            'task_name': title,
-                            'action': 'Created',
-                            'timestamp': timezone.now(),
-                            'list_name': ms_task_list.list_name
-                        })
+                    records.append(_parse_microsoft_task(task_item))
+                    all_synced_task_ids.add(task_item["id"])
                 except Exception as e:
-                    logger.error(f"Error processing Microsoft task '{title if 'title' in locals() else 'unknown'}': {e}", exc_info=True)
+                    logger.error(f"Error parsing Microsoft task '{task_item.get('title', 'unknown')}': {e}", exc_info=True)
                     # Continue with next task
+            
+            try:
+                updates.extend(reconcile_tasks(user, 'microsoft', ms_task_list, records, existing_tasks))
+            except Exception as e:
+                # The list's writes were rolled back together; carry on with the next list
+                logger.error(f"Error saving Microsoft tasks for list '{list_display_name}': {e}", exc_info=True)
+                continue
+            
+            removed_ids.update(delta['removed_ids'])
+            if delta['full']:
+                # A full enumeration returns everything in the list, so anything else we hold for it is gone
+                returned_ids = {task_item["id"] for task_item in delta['items']}
+                removed_ids.update(
+                    source_id for source_id, task in existing_tasks.items()
+                    if task.list_name_id == ms_task_list.pk and source_id not in returned_ids
+                )
+            
+            # Only advance once the changes are saved; a failed fetch repeats from the old link
+            if delta['resume_link']:
+                ms_task_list.delta_link = delta['resume_link']
+                ms_task_list.save(update_fields=['delta_link'])
+        
+        # A task removed from one list and returned by another has moved, not been deleted
+        removed_ids -= all_synced_task_ids
+        logger.info(f"Found {len(removed_ids)} Microsoft tasks removed at the source")
+        removed_tasks = [existing_tasks[source_id] for source_id in removed_ids if source_id in existing_tasks]
+        updates.extend(mark_deleted('microsoft', removed_tasks))
         
         # End of sync process - update timestamp
         old_timestamp = token_record.last_synced_at if token_record.last_synced_at else "None"
@@ -509,143 +540,29 @@ def fetch_microsoft_tasks_and_save(user, access_token):
         logger.error(f"Unexpected error during Microsoft sync for user {user.username}: {e}", exc_info=True)
         return [{'provider': 'Microsoft To Do', 'error': str(e), 'action': 'Error', 'timestamp': timezone.now()}]
 
-def process_ms_tasks(user, ms_task_list, ms_tasks, headers):
-    updates = []
-    new_tasks = []
-    existing_tasks_to_update = []
-    task_ids = set()
-    
-    logger.info(f"Processing {len(ms_tasks)} Microsoft tasks for list '{ms_task_list.list_name}'")
-    
-    for task_item in ms_tasks:
-        ms_task_id = task_item["id"]
-        task_ids.add(ms_task_id)
-        
-        title = task_item.get("title", "Untitled")
-        
-        # Microsoft uses 'status' field with 'completed' for completed tasks
-        raw_status = task_item.get("status", "notStarted")
-        is_completed = raw_status == 'completed'
-        logger.debug(f"Task '{title}' status from Microsoft: {raw_status}, interpreted as completed={is_completed}")
-        
-        # Handle due date
-        due_date_raw = task_item.get("dueDateTime")
-        due_date = None
-        if due_date_raw and "dateTime" in due_date_raw:
-            try:
-                naive_due_date = date_parser.parse(due_date_raw["dateTime"])
-                due_date = timezone.make_aware(naive_due_date, timezone.get_default_timezone())
-            except Exception as e:
-                logger.warning(f"Failed to parse due date for task '{title}': {e}")
-        
-        # Get task notes/description
-        task_notes = ""
-        if task_item.get("body") and task_item["body"].get("content"):
-            task_notes = task_item["body"]["content"]
-        
-        # Check if task already exists in database
-        existing_task = Task.objects.filter(user=user, source_id=ms_task_id, source='microsoft').first()
-        
-        if existing_task:
-            # Update existing task
-            updated = False
-            updated_fields = {}
-            
-            if existing_task.task_name != title:
-                existing_task.task_name = title
-                updated_fields['task_name'] = title
-                updated = True
-            
-            if existing_task.task_description != task_notes:
-                existing_task.task_description = task_notes
-                updated_fields['task_description'] = task_notes
-                updated = True
-            
-            # Explicitly log the completion status comparison
-            logger.debug(f"Task '{title}': DB status={existing_task.task_completed}, MS status={is_completed}")
-            if existing_task.task_completed != is_completed:
-                existing_task.task_completed = is_completed
-                updated_fields['task_completed'] = is_completed
-                updated = True
-                logger.info(f"Updating completion status for '{title}' to: {is_completed}")
-            
-            if existing_task.due_date != due_date:
-                existing_task.due_date = due_date
-                updated_fields['due_date'] = due_date.strftime('%Y-%m-%d') if due_date else None
-                updated = True
-            
-            if updated:
-                existing_task.last_update_date = timezone.now()
-                existing_tasks_to_update.append(existing_task)
-                logger.info(f"Updated Microsoft task '{title}' with changes: {', '.join(updated_fields.keys())}")
-                updates.append({
-                    'provider': 'Microsoft To Do',
-                    'task_name': title,
-                    'action': 'Updated',
-                    'timestamp': timezone.now(),
-                    'list_name': ms_task_list.list_name,
-                    'updated_fields': updated_fields
-                })
-        else:
-            # Create new task
-            logger.info(f"Creating new Microsoft task '{title}' with completed={is_completed}")
-            new_task = Task(
-                user=user, 
-                task_name=title, 
-                task_completed=is_completed, 
-                task_description=task_notes,
-                due_date=due_date,
-                list_name=ms_task_list, 
-                source='microsoft', 
-                source_id=ms_task_id,
-                creation_date=timezone.now(), 
-                last_update_date=timezone.now()
-            )
-            new_tasks.append(new_task)
-            updates.append({
-                'provider': 'Microsoft To Do',
-                'task_name': title,
-                'action': 'Created',
-                'timestamp': timezone.now(),
-                'list_name': ms_task_list.list_name
-            })
-    
-    # Bulk create and update operations for efficiency
-    if new_tasks:
-        for task in new_tasks:
-            try:
-                task.save()
-                logger.info(f"Successfully created Microsoft task: {task.task_name}")
-            except Exception as e:
-                logger.error(f"Failed to create Microsoft task '{task.task_name}': {e}")
-    
-    if existing_tasks_to_update:
-        logger.info(f"Bulk updating {len(existing_tasks_to_update)} existing Microsoft tasks")
-        Task.objects.bulk_update(
-            existing_tasks_to_update, 
-            ['task_name', 'task_description', 'task_completed', 'due_date', 'last_update_date']
-        )
-    
-    return updates, task_ids
-
 # Reusable sync function for both UI and background tasks
+def _google_credentials(user):
+    """Google credentials from the user's stored token, refreshed if expired"""
+    google_token = UserToken.objects.get(user=user, provider='google')
+    creds = Credentials(
+        token=google_token.access_token, refresh_token=google_token.refresh_token,
+        token_uri='https://oauth2.googleapis.com/token', client_id=settings.SOCIAL_AUTH_GOOGLE_OAUTH2_KEY,
+        client_secret=settings.SOCIAL_AUTH_GOOGLE_OAUTH2_SECRET,
+        scopes=['https://www.googleapis.com/auth/tasks'],
+    )
+    if creds.expired and creds.refresh_token:
+        creds.refresh(Request())
+        google_token.access_token = creds.token
+        google_token.save()
+    return creds
+
+
 def sync_user_tasks(user, provider):
     try:
         logger.info(f"Starting sync for user: {user.username} with provider: {provider}")
         updates = []
         if provider == 'google':
-            google_token = UserToken.objects.get(user=user, provider='google')
-            creds = Credentials(
-                token=google_token.access_token, refresh_token=google_token.refresh_token,
-                token_uri='https://oauth2.googleapis.com/token', client_id=settings.SOCIAL_AUTH_GOOGLE_OAUTH2_KEY,
-                client_secret=settings.SOCIAL_AUTH_GOOGLE_OAUTH2_SECRET,
-                scopes=['https://www.googleapis.com/auth/tasks'],
-            )
-            if creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-                google_token.access_token = creds.token
-                google_token.save()
-            updates = fetch_google_tasks_and_save(user, creds)
+            updates = fetch_google_tasks_and_save(user, _google_credentials(user))
         elif provider == 'microsoft':
             ms_token = UserToken.objects.get(user=user, provider='microsoft')
             access_token = ms_token.access_token if not is_token_expired(ms_token) else refresh_microsoft_token(ms_token)
@@ -682,14 +599,8 @@ def sync_user_tasks(user, provider):
         logger.error(f"Error syncing {provider} tasks for user {user.username}: {e}")
         raise
 
-@csrf_exempt
-def trigger_background_sync(request):
-    """Endpoint triggered by Cloud Scheduler to enqueue sync tasks."""
-    logger.info("Triggering background sync")
-    if request.method != 'POST':
-        logger.warning("Method not allowed: %s", request.method)
-        return HttpResponse("Method not allowed", status=405)
-    
+def _enqueue_user_jobs(path, providers):
+    """Enqueue a POST to path for every user holding a token of each provider"""
     # Local testing override
     if settings.ENVIRONMENT == 'development':
         from django.test import Client
@@ -707,13 +618,13 @@ def trigger_background_sync(request):
     for user_dict in users:
         user_id = user_dict['user']
         logger.info("Processing user ID: %s", user_id)
-        for provider in ['google', 'microsoft']:
+        for provider in providers:
             if UserToken.objects.filter(user_id=user_id, provider=provider).exists():
                 logger.info("User ID %s has provider %s", user_id, provider)
                 if settings.ENVIRONMENT == 'development':
                     # Simulate Cloud Tasks locally
                     logger.info("Simulating Cloud Tasks locally for user ID %s and provider %s", user_id, provider)
-                    client_http.post('/task_management/process_sync_task/',
+                    client_http.post(path,
                                      f'{{"user_id": {user_id}, "provider": "{provider}"}}',
                                      content_type='application/json')
                 else:
@@ -721,17 +632,74 @@ def trigger_background_sync(request):
                     task = {
                         'http_request': {
                             'http_method': tasks_v2.HttpMethod.POST,
-                            'url': f'{settings.BASE_URL}/task_management/process_sync_task/',
+                            'url': f'{settings.BASE_URL}{path}',
                             'body': f'{{"user_id": {user_id}, "provider": "{provider}"}}'.encode(),
                             'headers': {'Content-Type': 'application/json'},
                         }
                     }
                     client.create_task(request={'parent': parent, 'task': task})
-                    logger.info("Enqueued %s sync task for user %s", provider, user_id)
+                    logger.info("Enqueued %s task to %s for user %s", provider, path, user_id)
+
+
+@csrf_exempt
+def trigger_background_sync(request):
+    """Endpoint triggered by Cloud Scheduler to enqueue sync tasks."""
+    logger.info("Triggering background sync")
+    if request.method != 'POST':
+        logger.warning("Method not allowed: %s", request.method)
+        return HttpResponse("Method not allowed", status=405)
+    
+    _enqueue_user_jobs('/task_management/process_sync_task/', ['google', 'microsoft'])
     
     logger.info("Sync tasks enqueued successfully")
     return HttpResponse("Sync tasks enqueued", status=200)
 
+
+@csrf_exempt
+def trigger_deletion_reconcile(request):
+    """
+    Endpoint triggered by its own Cloud Scheduler job to enqueue ID-only
+    deletion reconciles; run it far less often than the regular sync
+    """
+    logger.info("Triggering deletion reconcile")
+    if request.method != 'POST':
+        logger.warning("Method not allowed: %s", request.method)
+        return HttpResponse("Method not allowed", status=405)
+    
+    # Microsoft delta queries already report every removal
+    _enqueue_user_jobs('/task_management/process_reconcile_task/', ['google'])
+    
+    logger.info("Deletion reconcile tasks enqueued successfully")
+    return HttpResponse("Deletion reconcile tasks enqueued", status=200)
+
+
+@csrf_exempt
+def process_reconcile_task(request):
+    """Endpoint to process an individual deletion reconcile."""
+    logger.info("Processing deletion reconcile task")
+    if request.method != 'POST':
+        logger.warning("Method not allowed: %s", request.method)
+        return HttpResponse("Method not allowed", status=405)
+    
+    user_id = None
+    try:
+        data = json.loads(request.body.decode('utf-8'))
+        user_id = data.get('user_id')
+        
+        if not user_id:
+            return JsonResponse({'error': 'user_id is required'}, status=400)
+        
+        user = User.objects.get(id=user_id)
+        updates = reconcile_google_deletions(user, _google_credentials(user))
+        logger.info(f"Google deletion reconcile completed for user ID: {user_id} with {len(updates)} updates")
+        return HttpResponse(f"Google deletion reconcile completed for user {user_id}", status=200)
+    except User.DoesNotExist:
+        logger.error(f"User not found for ID: {user_id}")
+        return HttpResponse(f"User not found: {user_id}", status=404)
+    except Exception as e:
+        logger.error(f"Error processing deletion reconcile for user ID: {user_id}, Error: {e}", exc_info=True)
+        return HttpResponse(f"Error processing deletion reconcile: {e}", status=500)
+
 @csrf_exempt
 def process_sync_task(request):
     """Endpoint to process an individual sync task."""
@@ -884,7 +852,7 @@ def update_ms_task(user, task):
     logger.info(f"Updating Microsoft task: {task.task_name} (ID: {task.source_id})")
     
     try:
-        response = requests.get(
+        response = get_session('microsoft').get(
             f'https://graph.microsoft.com/v1.0/me/todo/lists/{list_id}/tasks/{task.source_id}',
             headers=headers,
             timeout=10
@@ -952,7 +920,7 @@ def update_ms_task(user, task):
             
         # Update the Microsoft task
         logger.info(f"Sending PATCH request to Microsoft for task: {task.task_name}")
-        response = requests.patch(
+        response = get_session('microsoft').patch(
             f'https://graph.microsoft.com/v1.0/me/todo/lists/{list_id}/tasks/{task.source_id}',
             headers=headers,
             json=ms_task,
@@ -29,6 +29,8 @@ urlpatterns = [
     path('sync_microsoft_tasks/', views.sync_microsoft_tasks, name='sync_microsoft_tasks'),    
     path('sync_tasks/', sync_utils.trigger_background_sync, name='trigger_background_sync'),
     path('process_sync_task/', sync_utils.process_sync_task, name='process_sync_task'),
+    path('reconcile_deletions/', sync_utils.trigger_deletion_reconcile, name='trigger_deletion_reconcile'),
+    path('process_reconcile_task/', sync_utils.process_reconcile_task, name='process_reconcile_task'),
     path('trigger_user_sync/', views.trigger_user_sync, name='trigger_user_sync'),
     path('get_task_counts/', views.get_task_counts, name='get_task_counts'),
     path('process_ms_task_update/', sync_utils.process_ms_task_update, name='process_ms_task_update'),